@@ -0,0 +1,384 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+BOM对比性能基准测试
+
+生成可复现的合成BOM（可设置行数、每行位号数、替代料密度、范围写法比例、
+A/B之间的变更比例），写出为.xlsx/.xls/.csv/.tsv/.parquet文件，分阶段计时load_bom和compare，
+记录峰值内存，结果保存为JSON，可与之前的结果对比以发现性能回退。
+
+用法示例:
+    python bom_benchmark.py --rows 1000 10000 --formats xlsx csv --output bench.json
+    python bom_benchmark.py --rows 10000 --baseline bench_old.json --threshold 0.2
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import importlib.util
+import contextlib
+from datetime import datetime
+
+import pandas as pd
+
+from bom_comparer import BOMComparer, PartNumberPool, APP_VERSION, EXPLODED_BYTES_PER_REF, estimate_ref_count
+
+# 位号前缀及其权重（电阻电容占多数）
+REFERENCE_PREFIXES = [('R', 40), ('C', 35), ('L', 5), ('U', 8), ('D', 5), ('Q', 4), ('J', 3)]
+
+# 各文件格式写出时需要的库
+FORMAT_WRITERS = {
+    'xlsx': 'openpyxl',
+    'xls': 'xlwt',
+    'csv': None,
+    'tsv': None,
+    'parquet': 'pyarrow'
+}
+
+def generate_bom(rows, refs_per_row=4, alt_density=0.05, range_ratio=0.0, seed=0):
+    """生成合成BOM
+
+    Args:
+        rows: 主料行数
+        refs_per_row: 每行平均位号数
+        alt_density: 带替代料的主料比例，替代料行使用'主序号.n'形式的Item
+        range_ratio: 位号使用范围写法（如R1-R4）的行比例
+        seed: 随机种子，相同参数和种子生成的BOM完全相同
+
+    Returns:
+        DataFrame: 列为Item、P/N、Reference、Description、MPN
+    """
+    rng = random.Random(seed)
+    prefixes = [prefix for prefix, _ in REFERENCE_PREFIXES]
+    weights = [weight for _, weight in REFERENCE_PREFIXES]
+    next_number = {prefix: 1 for prefix in prefixes}
+
+    records = []
+    for item in range(1, rows + 1):
+        prefix = rng.choices(prefixes, weights)[0]
+        count = max(1, int(rng.expovariate(1.0 / refs_per_row)) + 1)
+        start = next_number[prefix]
+        next_number[prefix] += count
+        refs = [f"{prefix}{n}" for n in range(start, start + count)]
+
+        if count > 2 and rng.random() < range_ratio:
+            reference = f"{refs[0]}-{refs[-1]}"
+        else:
+            reference = rng.choice([',', ', ', ' ']).join(refs)
+
+        pn = f"{prefix}{item:06d}-{rng.randint(0, 99):02d}"
+        has_alternates = rng.random() < alt_density
+        records.append({
+            'Item': f"{item}.1" if has_alternates else str(item),
+            'P/N': pn,
+            'Reference': reference,
+            'Description': f"{prefix} part {rng.randint(1, 500)}",
+            'MPN': f"MPN-{pn}"
+        })
+
+        if has_alternates:
+            for alt_idx in range(2, rng.randint(2, 3) + 1):
+                alt_pn = f"{pn}-A{alt_idx}"
+                records.append({
+                    'Item': f"{item}.{alt_idx}",
+                    'P/N': alt_pn,
+                    'Reference': reference,
+                    'Description': f"{prefix} alternate",
+                    'MPN': f"MPN-{alt_pn}"
+                })
+
+    return pd.DataFrame(records, columns=['Item', 'P/N', 'Reference', 'Description', 'MPN'])
+
+def mutate_bom(bom_df, change_pct=5.0, seed=0):
+    """在BOM基础上生成修改后的版本
+
+    按change_pct百分比随机选择行，执行以下变更之一：更换料号、删除位号、
+    增加位号、删除整行，并追加相同数量的新物料行。
+
+    Returns:
+        DataFrame: 修改后的BOM
+    """
+    rng = random.Random(seed + 1)
+    bom_b = bom_df.copy()
+    change_count = int(len(bom_b) * change_pct / 100)
+    if change_count == 0:
+        return bom_b
+
+    changed_rows = rng.sample(range(len(bom_b)), change_count)
+    dropped_rows = []
+    for row_idx in changed_rows:
+        action = rng.choice(['replace', 'remove_ref', 'add_ref', 'drop'])
+        reference = bom_b.at[row_idx, 'Reference']
+        if action == 'replace':
+            new_pn = f"{bom_b.at[row_idx, 'P/N']}-N"
+            bom_b.at[row_idx, 'P/N'] = new_pn
+            bom_b.at[row_idx, 'MPN'] = f"MPN-{new_pn}"
+        elif action == 'remove_ref' and ',' in reference:
+            bom_b.at[row_idx, 'Reference'] = reference.rsplit(',', 1)[0]
+        elif action == 'add_ref':
+            bom_b.at[row_idx, 'Reference'] = f"{reference},X{row_idx}"
+        else:
+            dropped_rows.append(row_idx)
+
+    bom_b = bom_b.drop(index=dropped_rows)
+
+    new_rows = [{
+        'Item': f"N{idx}",
+        'P/N': f"NEW{idx:06d}",
+        'Reference': f"TP{idx}",
+        'Description': "new part",
+        'MPN': f"MPN-NEW{idx:06d}"
+    } for idx in range(change_count)]
+
+    return pd.concat([bom_b, pd.DataFrame(new_rows)], ignore_index=True)
+
+def write_bom(bom_df, path, file_format):
+    """按格式写出BOM文件"""
+    if file_format == 'csv':
+        bom_df.to_csv(path, index=False, encoding='utf-8-sig')
+    elif file_format == 'tsv':
+        bom_df.to_csv(path, index=False, sep='\t', encoding='utf-8')
+    elif file_format == 'parquet':
+        bom_df.to_parquet(path, index=False)
+    else:
+        bom_df.to_excel(path, index=False)
+
+def format_available(file_format):
+    """检查写出该格式所需的库是否已安装"""
+    module = FORMAT_WRITERS.get(file_format)
+    return module is None or importlib.util.find_spec(module) is not None
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽被测代码的控制台输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def run_stages(comparer, path_a, path_b):
+    """依次执行load_bom和compare各阶段，返回各阶段耗时（秒）和比较结果"""
+    timings = {}
+    comparer.stage_timer.reset()
+
+    start = time.perf_counter()
+    bom_a = comparer.load_bom(path_a, projection=True)
+    timings['load_a'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bom_b = comparer.load_bom(path_b, projection=True)
+    timings['load_b'] = time.perf_counter() - start
+
+    # load_bom内部各阶段（A和B累加）
+    for stage, seconds in comparer.stage_timer.snapshot().items():
+        timings[f"load.{stage}"] = seconds
+
+    pool = PartNumberPool()
+    start = time.perf_counter()
+    exploded_a = comparer.explode_bom(bom_a, pool)
+    exploded_b = comparer.explode_bom(bom_b, pool)
+    timings['explode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    diff = comparer.diff_exploded(exploded_a, exploded_b)
+    timings['diff'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    report = comparer.render_report(exploded_a, exploded_b, diff)
+    timings['render'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    comparer.compare(bom_a, bom_b, is_dataframe=True)
+    timings['compare_total'] = time.perf_counter() - start
+
+    return timings, {
+        'rows_a': len(bom_a),
+        'rows_b': len(bom_b),
+        'refs_a': len(exploded_a.ref_to_pn),
+        'refs_b': len(exploded_b.ref_to_pn),
+        'report_lines': len(report)
+    }
+
+def measure_peak_memory(path_a, path_b):
+    """使用tracemalloc单独运行一次，返回峰值内存（MB）"""
+    comparer = BOMComparer()
+    tracemalloc.start()
+    try:
+        with quiet():
+            run_stages(comparer, path_a, path_b)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+def measure_bytes_per_ref(path_a, path_b):
+    """用tracemalloc测量内存对比（展开两个BOM并计算差异）的峰值内存，按估算的位号数平均
+
+    结果用于校准bom_comparer.EXPLODED_BYTES_PER_REF（内存预算按该值估算是否改用磁盘模式）。
+    """
+    comparer = BOMComparer()
+    with quiet():
+        bom_a = comparer.load_bom(path_a, projection=True)
+        bom_b = comparer.load_bom(path_b, projection=True)
+    ref_count = estimate_ref_count(bom_a) + estimate_ref_count(bom_b)
+
+    tracemalloc.start()
+    try:
+        pool = PartNumberPool()
+        exploded_a = comparer.explode_bom(bom_a, pool)
+        exploded_b = comparer.explode_bom(bom_b, pool)
+        comparer.diff_exploded(exploded_a, exploded_b)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / max(ref_count, 1)
+
+def benchmark_case(args, rows, file_format, work_dir):
+    """对一个行数和文件格式组合执行基准测试"""
+    case = {
+        'rows': rows,
+        'format': file_format,
+        'refs_per_row': args.refs_per_row,
+        'alt_density': args.alt_density,
+        'range_ratio': args.range_ratio,
+        'change_pct': args.change_pct,
+        'seed': args.seed
+    }
+
+    if not format_available(file_format):
+        case['skipped'] = f"缺少写出{file_format}所需的库: {FORMAT_WRITERS[file_format]}"
+        return case
+
+    bom_a = generate_bom(rows, args.refs_per_row, args.alt_density, args.range_ratio, args.seed)
+    bom_b = mutate_bom(bom_a, args.change_pct, args.seed)
+
+    path_a = os.path.join(work_dir, f"bench_{rows}_A.{file_format}")
+    path_b = os.path.join(work_dir, f"bench_{rows}_B.{file_format}")
+    start = time.perf_counter()
+    write_bom(bom_a, path_a, file_format)
+    write_bom(bom_b, path_b, file_format)
+    case['write_seconds'] = time.perf_counter() - start
+    case['file_size_kb'] = os.path.getsize(path_a) / 1024
+
+    # 多次运行取每个阶段的最小耗时，减少系统抖动的影响
+    best = {}
+    try:
+        for _ in range(args.repeat):
+            comparer = BOMComparer()
+            with quiet():
+                timings, counts = run_stages(comparer, path_a, path_b)
+            for stage, seconds in timings.items():
+                best[stage] = min(seconds, best.get(stage, seconds))
+        case['timings'] = best
+        case.update(counts)
+        if args.memory:
+            case['peak_memory_mb'] = measure_peak_memory(path_a, path_b)
+            case['bytes_per_ref'] = measure_bytes_per_ref(path_a, path_b)
+    except Exception as e:
+        case['error'] = f"{type(e).__name__}: {e}"
+
+    return case
+
+def get_git_commit():
+    """获取当前代码的提交号，不在git仓库中时返回None"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+def compare_with_baseline(results, baseline_path, threshold):
+    """与之前的结果对比，返回超过阈值的回退项列表"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    baseline_cases = {(case['rows'], case['format']): case for case in baseline.get('cases', [])}
+    regressions = []
+    for case in results['cases']:
+        old_case = baseline_cases.get((case['rows'], case['format']))
+        if not old_case or 'timings' not in case or 'timings' not in old_case:
+            continue
+        for stage, seconds in case['timings'].items():
+            old_seconds = old_case['timings'].get(stage)
+            if old_seconds and seconds > old_seconds * (1 + threshold):
+                regressions.append(
+                    f"{case['rows']}行 {case['format']} {stage}: "
+                    f"{old_seconds:.3f}s → {seconds:.3f}s (+{(seconds / old_seconds - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="BOM对比性能基准测试")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000], help="BOM行数，可指定多个")
+    parser.add_argument('--refs-per-row', type=float, default=4, help="每行平均位号数")
+    parser.add_argument('--alt-density', type=float, default=0.05, help="带替代料的主料比例(0-1)")
+    parser.add_argument('--range-ratio', type=float, default=0.0, help="使用范围写法(R1-R4)的行比例(0-1)")
+    parser.add_argument('--change-pct', type=float, default=5.0, help="A/B之间变更的行百分比")
+    parser.add_argument('--formats', nargs='+', default=['xlsx'], choices=sorted(FORMAT_WRITERS), help="文件格式")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--repeat', type=int, default=3, help="每个组合的重复次数，取最小耗时")
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help="不测量峰值内存")
+    parser.add_argument('--output', default='bench_results.json', help="结果JSON文件")
+    parser.add_argument('--keep-files', metavar='DIR', help="将生成的BOM文件保存到指定目录")
+    parser.add_argument('--baseline', help="用于对比的历史结果JSON文件")
+    parser.add_argument('--threshold', type=float, default=0.2, help="判定为回退的耗时增长比例")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': get_git_commit(),
+        'app_version': APP_VERSION,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cases': []
+    }
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = args.keep_files or temp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        for rows in args.rows:
+            for file_format in args.formats:
+                case = benchmark_case(args, rows, file_format, work_dir)
+                results['cases'].append(case)
+
+                if 'timings' in case:
+                    stages = ", ".join(f"{stage}={seconds:.3f}s" for stage, seconds in case['timings'].items())
+                    memory = ""
+                    if 'peak_memory_mb' in case:
+                        memory = (f", 峰值内存={case['peak_memory_mb']:.1f}MB, 每个位号{case['bytes_per_ref']:.0f}字节"
+                                  f"(EXPLODED_BYTES_PER_REF={EXPLODED_BYTES_PER_REF})")
+                    print(f"[{rows}行 {file_format}] {stages}{memory}")
+                else:
+                    print(f"[{rows}行 {file_format}] {case.get('skipped') or case.get('error')}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {args.output}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.threshold)
+        if regressions:
+            print("\n=== 性能回退 ===")
+            for line in regressions:
+                print(line)
+            return 1
+        print("未发现性能回退")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
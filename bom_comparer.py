@@ -1,43 +1,1330 @@
+import time
+# 程序开始时间，启动计时模式以此为起点
+STARTUP_TIME = time.perf_counter()
+
 import os
 import sys
 import json
+import importlib
+import csv
+import codecs
+import itertools
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext, font as tk_font
 from tkinter.font import Font
-import pandas as pd
 import datetime
 import re  # 添加re模块导入
 import traceback
 from datetime import datetime
 import random
-import time
 import threading  # 添加threading模块导入
+import multiprocessing
+import logging
+import argparse
+from logging.handlers import RotatingFileHandler
 import difflib
-# 添加更新功能所需的库
-import requests
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import cProfile
+import pstats
+import tracemalloc
 import tempfile
+import sqlite3
 import shutil
 import zipfile
 import subprocess
 import platform
-from packaging import version as pkg_version
+
+class LazyModule:
+    """延迟导入的模块
+
+    首次访问属性时才导入，并把本模块中的同名全局变量替换为真实模块，之后的访问没有额外开销。
+    pandas、requests等导入耗时较长，延迟导入使窗口可以先显示，再由后台线程预热（见warm_up_imports）。
+    """
+
+    def __init__(self, name, alias):
+        self.name = name
+        self.alias = alias
+
+    def load(self):
+        module = importlib.import_module(self.name)
+        globals()[self.alias] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+pd = LazyModule('pandas', 'pd')
+np = LazyModule('numpy', 'np')
+# 更新功能所需的库
+requests = LazyModule('requests', 'requests')
+pkg_version = LazyModule('packaging.version', 'pkg_version')
+
+# 启动后在后台线程预热的模块（openpyxl由pandas读写Excel时按需导入）
+WARMUP_MODULES = ('numpy', 'pandas', 'openpyxl', 'requests', 'packaging.version')
 
 # 定义版本信息和更新相关常量
 APP_VERSION = "1.4"
 GITHUB_REPO = "XiaoHang9527/BOMCompare"
 GITHUB_API_URL = f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest"
 UPDATE_CHECK_INTERVAL = 7  # 天
+UPDATE_RETRY_HOURS = 24    # 检查失败（如离线）后的重试间隔(小时)
+UPDATE_CONNECT_TIMEOUT = 3  # 检查更新的连接超时(秒)
+UPDATE_READ_TIMEOUT = 10    # 检查更新的读取超时(秒)
+# 检查更新的地址，可用环境变量指向本地的替代服务（测试用）
+UPDATE_API_URL = os.environ.get("BOM_COMPARER_UPDATE_URL", GITHUB_API_URL)
+# 检查更新结果缓存文件（与config.json保存在同一目录）
+UPDATE_CACHE_FILE = "update_cache.json"
 
 # 定义下载重试次数和超时时间
 DOWNLOAD_MAX_RETRIES = 3  # 最大重试次数
 DOWNLOAD_TIMEOUT = 30     # 下载超时时间(秒)
-DOWNLOAD_CHUNK_SIZE = 8192  # 下载块大小
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # 读取响应的块大小
+# 并行分段下载：文件不小于DOWNLOAD_PARALLEL_MIN_BYTES且服务器支持Range时，用多个连接按字节范围下载
+DOWNLOAD_PARALLEL_PARTS = 4                   # 并行连接数
+DOWNLOAD_PARALLEL_MIN_BYTES = 4 * 1024 * 1024
+# 每段的大小按该连接的实测速度调整，使每次请求约耗时DOWNLOAD_PART_SECONDS秒
+DOWNLOAD_PART_MIN_BYTES = 256 * 1024
+DOWNLOAD_PART_MAX_BYTES = 16 * 1024 * 1024
+DOWNLOAD_PART_SECONDS = 2
+DOWNLOAD_STATE_SUFFIX = ".parts"              # 记录已完成范围的文件（与下载文件同目录），用于断点续传
+
+# 更新相关网络请求的超时(秒)：connect为连接超时，read为检查更新的读取超时，download为下载的读取超时。
+# 可在config.json的"http_timeouts"中修改（见set_http_timeouts）
+HTTP_TIMEOUTS = {'connect': UPDATE_CONNECT_TIMEOUT, 'read': UPDATE_READ_TIMEOUT, 'download': DOWNLOAD_TIMEOUT}
+
+# 日志文件（与config.json保存在同一目录）及滚动设置
+LOG_FILE = "bom_comparer.log"
+LOG_MAX_BYTES = 1024 * 1024  # 单个日志文件最大1MB
+LOG_BACKUP_COUNT = 3  # 保留的历史日志文件数
+
+logger = logging.getLogger("bom_comparer")
+
+# 内存预算超出时使用磁盘模式：按块展开的行数、分批读取查询结果的行数
+SPILL_CHUNK_ROWS = 50000
+SPILL_FETCH_SIZE = 10000
+# 展开和计算差异时每个位号约占用的峰值内存（字节），用于估算对比所需内存。
+# 由bom_benchmark.py的bytes_per_ref（tracemalloc）在合成BOM上测得：每行4个位号时约260字节，
+# 每行1个位号时约440字节（每行的开销分摊到更少的位号上），取较大值使预算判断偏保守
+EXPLODED_BYTES_PER_REF = 450
+
+# 只按完整列名匹配的字段：层级别名"Level"会被"MSL Level"等列名包含，
+# 用量别名"数量"会被"最小包装数量"、"MOQ数量"等列名包含
+EXACT_MATCH_FIELDS = ('Level', 'Quantity')
+
+# 表头签名缓存文件（与config.json保存在同一目录）及最大条目数
+HEADER_CACHE_FILE = "header_cache.json"
+HEADER_CACHE_MAX_ENTRIES = 200
+
+# 多工作表模式：文件不小于该大小时各工作表在子进程中并行解析（小文件启动进程的开销大于收益）
+SHEET_PARALLEL_MIN_BYTES = 2 * 1024 * 1024
+
+# 支持的BOM文件格式：CSV/TSV的分隔符为None时按内容识别
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+DELIMITED_EXTENSIONS = {'.csv': None, '.tsv': '\t', '.txt': None}
+PARQUET_EXTENSIONS = ('.parquet',)
+SUPPORTED_BOM_EXTENSIONS = EXCEL_EXTENSIONS + tuple(DELIMITED_EXTENSIONS) + PARQUET_EXTENSIONS
+
+# 保留的对比结果个数（输入未变化时只重新生成报告）
+COMPARE_CACHE_MAX_ENTRIES = 2
+
+# 监视模式：检查文件变化的间隔（毫秒），文件变化后需保持不变的时间（秒）才重新加载
+WATCH_POLL_INTERVAL_MS = 1000
+WATCH_DEBOUNCE_SECONDS = 1.5
+
+# B变化的行数超过此比例时不再增量更新，直接完整对比
+INCREMENTAL_MAX_CHANGED_RATIO = 0.2
+ENCODING_SNIFF_BYTES = 64 * 1024  # 识别文本编码时读取的字节数
 
 # 避免Windows上打包后的UTF-8编码问题
 if sys.platform.startswith('win'):
     import locale
     locale.setlocale(locale.LC_ALL, 'C')
 
+# 位号解析正则：前缀(字母等非数字字符) + 数字 + 后缀，例如 "C10" -> ("C", "10", "")
+REFERENCE_KEY_PATTERN = re.compile(r'^(\D*)(\d+)(.*)$')
+
+@lru_cache(maxsize=65536)
+def reference_sort_key(ref):
+    """计算位号的自然排序键（结果会被缓存，每个位号只解析一次）
+
+    Args:
+        ref: 位号字符串，如 "C10"、"R1A"、"U3-2"
+
+    Returns:
+        tuple: (前缀, 数字, 后缀, 原始位号)，使 "C2" 排在 "C10" 之前
+    """
+    match = REFERENCE_KEY_PATTERN.match(ref)
+    if not match:
+        # 不含数字的位号排在同前缀的编号位号之前
+        return (ref.upper(), -1, "", ref)
+    prefix, number, suffix = match.groups()
+    return (prefix.upper(), int(number), suffix.upper(), ref)
+
+def sort_references(refs):
+    """按自然顺序排序位号（C1, C2, C10 而不是 C1, C10, C2）"""
+    return sorted(refs, key=reference_sort_key)
+
+def get_app_dir():
+    """获取程序所在目录（支持打包为exe的情况），配置文件保存在该目录"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return script_dir or os.getcwd()
+
+def setup_logging(debug=False, log_to_file=False, log_file=None):
+    """配置日志输出
+
+    默认只向控制台输出INFO及以上级别，双击定位、高亮、替代料识别等高频路径的
+    DEBUG日志不会格式化和输出；debug为True时输出DEBUG级别，log_to_file为True时
+    同时写入滚动日志文件。可重复调用，每次调用会替换之前添加的处理器。
+
+    Args:
+        debug: 是否输出调试日志
+        log_to_file: 是否写入日志文件
+        log_file: 日志文件路径，为None时使用程序目录下的LOG_FILE
+
+    Returns:
+        logging.Logger: 程序使用的日志记录器
+    """
+    logger.setLevel(logging.DEBUG if debug else logging.INFO)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    # 打包为无控制台的exe时没有标准输出
+    if sys.stdout is not None:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(console_handler)
+
+    if log_to_file:
+        log_path = log_file or os.path.join(get_app_dir(), LOG_FILE)
+        try:
+            file_handler = RotatingFileHandler(log_path, maxBytes=LOG_MAX_BYTES,
+                                               backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+            file_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(threadName)s: %(message)s"))
+            logger.addHandler(file_handler)
+        except OSError as e:
+            logger.warning("无法创建日志文件 %s: %s", log_path, e)
+
+    return logger
+
+class HeaderSignatureCache:
+    """表头签名缓存
+
+    以表头行内容的签名为键，记录识别出的表头行号和列映射。同一ERP模板导出的
+    文件可以跳过表头识别和列映射，用户手动选择过的列也不会被再次询问。
+    多工作表模式下还按工作簿的工作表布局记录被识别为BOM的工作表。
+    缓存按最近使用顺序淘汰，最多保留 max_entries 条。
+    """
+
+    def __init__(self, max_entries=HEADER_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # 签名 -> 缓存条目
+        self.sheet_entries = OrderedDict()  # 工作表布局签名 -> 工作表选择结果
+        self.dirty = False  # 是否有尚未保存的修改
+        self.touched = set()  # 命中或写入过的表头签名（子进程据此返回需要合并的条目）
+
+    @staticmethod
+    def make_signature(cells):
+        """计算表头行的签名，空行返回None"""
+        values = ['' if pd.isna(cell) else str(cell).strip() for cell in cells]
+        while values and not values[-1]:
+            values.pop()
+        if not any(values):
+            return None
+        return hashlib.sha1('\x1f'.join(values).encode('utf-8')).hexdigest()
+
+    def get(self, signature):
+        """查找缓存条目，命中时标记为最近使用"""
+        entry = self.entries.get(signature)
+        if entry is not None:
+            self.entries.move_to_end(signature)
+            self.touched.add(signature)
+        return entry
+
+    def put(self, signature, header_row, column_map, mappings_digest, manual_fields=()):
+        """保存表头识别结果
+
+        Args:
+            signature: 表头行签名
+            header_row: 表头所在行号
+            column_map: {标准字段名: 实际列名}
+            mappings_digest: 生成该结果时字段映射的摘要
+            manual_fields: 由用户手动选择的字段
+        """
+        if not signature:
+            return
+        self.entries[signature] = {
+            'header_row': int(header_row),
+            'column_map': {field: str(col) for field, col in column_map.items()},
+            'mappings': mappings_digest,
+            'manual_fields': sorted(manual_fields)
+        }
+        self.entries.move_to_end(signature)
+        self.touched.add(signature)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.dirty = True
+
+    def touched_entries(self):
+        """命中或写入过的表头识别结果 {签名: 条目}"""
+        return {signature: self.entries[signature] for signature in self.touched if signature in self.entries}
+
+    def merge_entries(self, entries):
+        """合并其他进程（多工作表并行加载）命中或写入的表头识别结果，按最近使用处理"""
+        for signature, entry in entries.items():
+            if self.entries.get(signature) != entry:
+                self.entries[signature] = entry
+                self.dirty = True
+            self.entries.move_to_end(signature)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    @staticmethod
+    def make_layout_signature(sheet_names):
+        """计算工作簿布局（工作表名称及顺序）的签名"""
+        return hashlib.sha1('\x1f'.join(str(name) for name in sheet_names).encode('utf-8')).hexdigest()
+
+    def get_sheets(self, layout_signature, mappings_digest):
+        """查找工作表选择结果，字段映射变化后的结果视为无效"""
+        entry = self.sheet_entries.get(layout_signature)
+        if entry is None or entry['mappings'] != mappings_digest:
+            return None
+        self.sheet_entries.move_to_end(layout_signature)
+        return list(entry['sheets'])
+
+    def put_sheets(self, layout_signature, sheets, mappings_digest):
+        """保存工作表选择结果"""
+        self.sheet_entries[layout_signature] = {'sheets': [str(sheet) for sheet in sheets],
+                                                'mappings': mappings_digest}
+        self.sheet_entries.move_to_end(layout_signature)
+        while len(self.sheet_entries) > self.max_entries:
+            self.sheet_entries.popitem(last=False)
+        self.dirty = True
+
+    def drop_sheets(self, layout_signature):
+        """删除工作表选择结果（缓存的工作表加载失败时）"""
+        if self.sheet_entries.pop(layout_signature, None) is not None:
+            self.dirty = True
+
+    def clear(self):
+        """清空缓存"""
+        if self.entries or self.sheet_entries:
+            self.entries.clear()
+            self.sheet_entries.clear()
+            self.dirty = True
+
+    def load(self, file_path):
+        """从文件加载缓存，文件不存在或损坏时保持为空"""
+        try:
+            if not os.path.exists(file_path):
+                return
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.entries.clear()
+            for item in data.get('entries', [])[-self.max_entries:]:
+                signature = item.pop('signature', None)
+                if signature:
+                    self.entries[signature] = item
+            self.sheet_entries.clear()
+            for item in data.get('sheets', [])[-self.max_entries:]:
+                signature = item.pop('signature', None)
+                if signature:
+                    self.sheet_entries[signature] = item
+            self.dirty = False
+        except Exception as e:
+            logger.warning("加载表头缓存失败: %s", e)
+
+    def save(self, file_path):
+        """保存缓存到文件（按使用顺序，最早使用的在前）"""
+        try:
+            entries = [dict(entry, signature=signature) for signature, entry in self.entries.items()]
+            sheets = [dict(entry, signature=signature) for signature, entry in self.sheet_entries.items()]
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump({'entries': entries, 'sheets': sheets}, f, ensure_ascii=False, indent=2)
+            self.dirty = False
+            return True
+        except Exception as e:
+            logger.warning("保存表头缓存失败: %s", e)
+            return False
+
+class FieldMappingMatcher:
+    """预编译的表头字段匹配器
+
+    将字段映射字典编译为精确匹配字典和Aho-Corasick自动机，
+    表头行打分和列映射只需对每个单元格扫描一次，与别名数量无关。
+    EXACT_MATCH_FIELDS中的字段只匹配与别名完全相同的列名。
+    """
+
+    def __init__(self, field_mappings, exact_fields=EXACT_MATCH_FIELDS):
+        """编译字段映射
+
+        Args:
+            field_mappings (dict): 字段映射字典，格式为 {标准字段名: [可能的别名列表]}
+            exact_fields: 只按完整列名匹配的字段
+        """
+        self.fields = list(field_mappings.keys())
+
+        # 精确匹配: 小写别名 -> 字段索引集合
+        self.exact = {}
+
+        # 只按完整列名匹配的别名: 小写别名 -> [(字段索引, 别名优先级)]
+        self.exact_only = {}
+
+        # 自动机: 状态转移表、失败指针、每个状态命中的模式id列表
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        # 模式id -> [(字段索引, 别名优先级)]，同一别名可能属于多个字段
+        self._pattern_targets = []
+        pattern_ids = {}
+
+        for field_idx, field in enumerate(self.fields):
+            for rank, alias in enumerate(field_mappings[field]):
+                key = str(alias).lower()
+                if not key:
+                    continue
+                self.exact.setdefault(key, set()).add(field_idx)
+                if field in exact_fields:
+                    self.exact_only.setdefault(key.strip(), []).append((field_idx, rank))
+                    continue
+
+                pattern_id = pattern_ids.get(key)
+                if pattern_id is None:
+                    pattern_id = len(self._pattern_targets)
+                    pattern_ids[key] = pattern_id
+                    self._pattern_targets.append([])
+                    self._add_pattern(key, pattern_id)
+                self._pattern_targets[pattern_id].append((field_idx, rank))
+
+        self._build_failure_links()
+
+    def _add_pattern(self, pattern, pattern_id):
+        """将模式插入字典树"""
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(pattern_id)
+
+    def _build_failure_links(self):
+        """广度优先构建失败指针，并合并后缀状态的输出"""
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_patterns(self, text):
+        """返回文本中包含的所有别名模式id（包括相互重叠的别名）"""
+        found = set()
+        state = 0
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+    def score_row(self, cells):
+        """计算一行与字段映射的匹配度：有别名与单元格完全相同的字段个数"""
+        matched_fields = set()
+        exact = self.exact
+        for cell in cells:
+            fields = exact.get(str(cell).lower())
+            if fields:
+                matched_fields.update(fields)
+        return len(matched_fields)
+
+    def map_columns(self, columns):
+        """将实际列名映射到标准字段
+
+        每个字段按别名顺序优先、列顺序其次选取第一个包含该别名的列
+        （完全相同也属于包含；EXACT_MATCH_FIELDS中的字段只选取与别名完全相同的列）。
+
+        Args:
+            columns: 实际列名列表
+
+        Returns:
+            dict: {标准字段名: 实际列名}
+        """
+        columns = list(columns)
+        best = {}  # 字段索引 -> (别名优先级, 列索引)
+        for col_idx, col in enumerate(columns):
+            text = str(col).lower()
+            targets = [target for pattern_id in self.find_patterns(text)
+                       for target in self._pattern_targets[pattern_id]]
+            targets.extend(self.exact_only.get(text.strip(), ()))
+            for field_idx, rank in targets:
+                candidate = (rank, col_idx)
+                current = best.get(field_idx)
+                if current is None or candidate < current:
+                    best[field_idx] = candidate
+
+        return {self.fields[field_idx]: columns[best[field_idx][1]]
+                for field_idx in range(len(self.fields)) if field_idx in best}
+
+class StageTimer:
+    """分阶段计时器
+
+    支持两种用法：
+        with timer.span('diff'):        # 上下文管理的计时区间
+            ...
+        timer.begin('read_excel')       # 顺序流程中切换阶段，自动结束上一阶段
+        timer.begin('header_detection')
+        timer.end()
+
+    同名阶段多次计时会累加（例如加载A和B两个文件的read_excel）。
+    """
+
+    def __init__(self):
+        self.timings = OrderedDict()
+        self._current = None
+        self._current_start = None
+
+    def reset(self):
+        """清空所有计时"""
+        self.timings = OrderedDict()
+        self._current = None
+        self._current_start = None
+
+    def add(self, stage, seconds):
+        """累加阶段耗时"""
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def span(self, stage):
+        """计时一个代码块"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def begin(self, stage):
+        """结束当前阶段（如果有）并开始新阶段"""
+        self.end()
+        self._current = stage
+        self._current_start = time.perf_counter()
+
+    def end(self):
+        """结束当前阶段"""
+        if self._current is not None:
+            self.add(self._current, time.perf_counter() - self._current_start)
+            self._current = None
+            self._current_start = None
+
+    def snapshot(self):
+        """返回各阶段耗时（秒）的副本"""
+        return dict(self.timings)
+
+class CompareReport(str):
+    """对比报告文本
+
+    行为与普通字符串相同，额外携带本次对比的分阶段耗时和性能分析文件路径。
+    """
+
+    def __new__(cls, text, timings=None, profile_path=None):
+        report = super().__new__(cls, text)
+        report.timings = timings or {}
+        report.profile_path = profile_path
+        return report
+
+class PartNumberPool:
+    """料号驻留池
+
+    同一次比较中的所有BOM共享一个池，每个不同的料号只保存一份字符串，
+    比较内核中只使用整数id。
+    """
+
+    def __init__(self):
+        self.ids = {}    # 料号 -> id
+        self.names = []  # id -> 料号
+
+    def intern(self, pn):
+        """返回料号的id，首次出现时分配新id"""
+        pn_id = self.ids.get(pn)
+        if pn_id is None:
+            pn_id = len(self.names)
+            self.ids[pn] = pn_id
+            self.names.append(pn)
+        return pn_id
+
+    def intern_many(self, pns):
+        """批量驻留料号，返回与输入顺序一致的id列表"""
+        return [self.intern(pn) for pn in pns]
+
+    def __len__(self):
+        return len(self.names)
+
+class ExplodedBOM:
+    """按位号展开的BOM，料号以驻留池id表示
+
+    磁盘模式下只包含与差异相关的位号和料号，ref_total/part_total记录完整BOM的位号数和物料数。
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.ref_to_pn = {}         # 位号 -> 料号id（重复位号以最后一行为准）
+        self.pn_to_refs = {}        # 料号id -> 位号列表
+        self.mpn_map = {}           # 料号id -> MPN
+        self.desc_map = {}          # 料号id -> 描述
+        self.duplicate_refs = set() # 出现在多行中的位号
+        self.qty_map = {}           # 料号id -> 无位号行的用量合计（螺丝、标签等）
+        self.row_count = 0
+        self.ref_total = None
+        self.part_total = None
+
+    def ref_count(self):
+        """BOM中不重复的位号数"""
+        return len(self.ref_to_pn) if self.ref_total is None else self.ref_total
+
+    def part_count(self):
+        """BOM中不重复的物料数"""
+        return len(self.pn_to_refs) if self.part_total is None else self.part_total
+
+    def quantity(self, pn_id):
+        """料号的用量：位号数加上无位号行的用量"""
+        return normalize_quantity(len(self.pn_to_refs.get(pn_id, ())) + self.qty_map.get(pn_id, 0))
+
+def factorize_text(values):
+    """将一列值编码为(文本列表, 行编码)
+
+    文本与逐行 str(value).strip() 的结果一致（空值为'nan'），
+    重复值只转换一次，编码为-1的空值对应列表最后一项。
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    texts = [str(value).strip() for value in np.asarray(uniques, dtype=object).tolist()]
+    texts.append('nan')
+    return texts, codes
+
+def merge_alternative_maps(*alternative_maps):
+    """合并多个替代料映射，返回新的映射（不修改参数）"""
+    merged = {}
+    for alternative_map in alternative_maps:
+        for pn, alts in alternative_map.items():
+            current = merged.setdefault(pn, [])
+            current.extend(alt for alt in alts if alt not in current)
+    return merged
+
+def estimate_ref_count(bom_df):
+    """按分隔符个数估算BOM展开后的位号数（不展开范围写法）"""
+    if not len(bom_df) or 'Reference' not in bom_df.columns:
+        return 0
+    refs = bom_df['Reference'].astype(str).str.strip()
+    return len(bom_df) + int(refs.str.count(r'[,\s]+').sum())
+
+def normalize_quantity(value):
+    """整数用量返回int，小数用量保留6位小数（避免浮点累加误差出现在报告中）"""
+    value = round(float(value), 6)
+    return int(value) if value.is_integer() else value
+
+def unreferenced_quantities(bom_df, ref_rows):
+    """每行的无位号用量
+
+    Args:
+        bom_df: 标准化的BOM
+        ref_rows: 有位号的行位置（explode_references结果的'row'列）
+
+    Returns:
+        ndarray: 无位号行取Quantity列的数值（无法解析为0），有位号的行和没有Quantity列时为0
+    """
+    if 'Quantity' not in bom_df.columns:
+        return np.zeros(len(bom_df))
+    quantities = pd.to_numeric(bom_df['Quantity'], errors='coerce').fillna(0).to_numpy(dtype=float, copy=True)
+    quantities[ref_rows] = 0
+    return quantities
+
+def split_reference_text(text):
+    """分割一个位号单元格的文本，含逗号时按逗号分割，否则按空白分割，去除空位号和'nan'"""
+    parts = text.split(',') if ',' in text else text.split()
+    return [ref for ref in (part.strip() for part in parts) if ref and ref.lower() != 'nan']
+
+def explode_references(references):
+    """将位号列拆分为每个位号一行
+
+    含逗号时按逗号分割（C1,C2,C3），否则按空白分割（C1 C2 C3），
+    去除空位号和'nan'。相同的位号文本只分割一次。
+
+    Args:
+        references: 位号列
+
+    Returns:
+        DataFrame: 'row'列为原始行位置，'ref'列为位号，保持原有顺序
+    """
+    texts, codes = factorize_text(references)
+    split_texts = [split_reference_text(text) for text in texts]
+
+    rows = []
+    refs = []
+    for row, code in enumerate(codes.tolist()):
+        row_refs = split_texts[code]
+        if row_refs:
+            refs.extend(row_refs)
+            rows.extend([row] * len(row_refs))
+    return pd.DataFrame({'row': np.asarray(rows, dtype=np.int64), 'ref': refs})
+
+LEVEL_NUMBER_PATTERN = re.compile(r'\.*(\d+)(?:\.0+)?')
+LEVEL_PATH_PATTERN = re.compile(r'\d+(?:\.\d+)+')
+
+def parse_bom_levels(values):
+    """将层级列解析为整数层级
+
+    支持数字（1、2、3）、点缩进写法（.1、..2）和分段编号（1.2.3，按段数计层级），
+    空值沿用上一行的层级。
+
+    Returns:
+        list: 每行的层级；存在无法解析的值或只有一个层级时返回None（不是多层级BOM）
+    """
+    texts, codes = factorize_text(values)
+    parsed = []
+    for text in texts:
+        if text in ('', 'nan'):
+            parsed.append(None)
+            continue
+        match = LEVEL_NUMBER_PATTERN.fullmatch(text)
+        if match:
+            parsed.append(int(match.group(1)))
+        elif LEVEL_PATH_PATTERN.fullmatch(text):
+            parsed.append(text.count('.') + 1)
+        else:
+            return None
+
+    levels = []
+    previous = 0
+    for code in codes.tolist():
+        level = parsed[code]
+        previous = previous if level is None else level
+        levels.append(previous)
+    return levels if len(set(levels)) > 1 else None
+
+def is_level_sequence(levels):
+    """层级序列是否合理：从0或1开始，第一行为最小层级，每行最多比上一行深一层
+
+    用于排除被误映射为Level的列（如元件的湿敏等级"MSL Level"）。
+    """
+    if not levels:
+        return False
+    lowest = min(levels)
+    if lowest not in (0, 1) or levels[0] != lowest:
+        return False
+    return all(current - previous <= 1 for previous, current in zip(levels, levels[1:]))
+
+def indent_levels(values):
+    """按文本的前导空白宽度推断层级（缩进导出的多层级BOM）
+
+    Returns:
+        list: 每行的层级（不同缩进宽度从小到大编号为0、1、2...），没有缩进时返回None
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    widths = [len(text) - len(text.lstrip()) for text in
+              (str(value) for value in np.asarray(uniques, dtype=object).tolist())]
+    if not any(widths):
+        return None
+    ranks = {width: rank for rank, width in enumerate(sorted(set(widths)))}
+    # 空值编码为-1，对应列表最后一项，层级记为0
+    width_levels = [ranks[width] for width in widths] + [0]
+    return [width_levels[code] for code in codes.tolist()]
+
+class BOMTree:
+    """多层级BOM的树形结构
+
+    每行是一个节点，父节点为其上方最近的层级更小的行，顶层行挂在虚拟根节点（-1）下。
+    每个节点的子树哈希由本行的料号、位号、MPN和所有子节点的哈希（与顺序无关）计算，
+    子树哈希相同的两个子装配内容完全相同。
+    """
+
+    ROOT = -1
+
+    def __init__(self, bom_df, levels):
+        self.bom_df = bom_df
+        self.levels = levels
+        self.parent = [self.ROOT] * len(levels)
+        self.children = {self.ROOT: []}
+
+        stack = []
+        for row, level in enumerate(levels):
+            while stack and levels[stack[-1]] >= level:
+                stack.pop()
+            parent = stack[-1] if stack else self.ROOT
+            self.parent[row] = parent
+            self.children.setdefault(parent, []).append(row)
+            stack.append(row)
+
+        self.pns = self._row_texts('P/N')
+        mpns = self._row_texts('MPN')
+
+        # 位号按自然顺序排序后参与哈希，位号书写顺序不同不视为变化
+        ref_texts, ref_codes = factorize_text(bom_df['Reference'])
+        ref_keys = [','.join(sort_references(split_reference_text(text))) for text in ref_texts]
+
+        # 子节点的行号总是大于父节点，倒序计算即可保证子节点先于父节点完成
+        self.hashes = [None] * len(levels)
+        for row in range(len(levels) - 1, -1, -1):
+            self.hashes[row] = self._hash_node(
+                f"{self.pns[row]}\x1f{ref_keys[ref_codes[row]]}\x1f{mpns[row]}",
+                self.children.get(row, ())
+            )
+        self.root_hash = self._hash_node('', self.children[self.ROOT])
+
+    def _row_texts(self, field):
+        if field not in self.bom_df.columns:
+            return [''] * len(self.levels)
+        texts, codes = factorize_text(self.bom_df[field])
+        return np.asarray(texts, dtype=object)[codes].tolist()
+
+    def _hash_node(self, content, child_rows):
+        digest = hashlib.sha1(content.encode('utf-8'))
+        for child_hash in sorted(self.hashes[child] for child in child_rows):
+            digest.update(child_hash)
+        return digest.digest()
+
+    def node_hash(self, row):
+        return self.root_hash if row == self.ROOT else self.hashes[row]
+
+    def is_assembly(self, row):
+        """节点是否为子装配（有子项）"""
+        return bool(self.children.get(row))
+
+    def assemblies(self):
+        """所有子装配的行号"""
+        return [row for row in self.children if row != self.ROOT and self.children[row]]
+
+    def subtree_size(self, row):
+        """子装配下所有层级的行数"""
+        size = 0
+        pending = list(self.children.get(row, ()))
+        while pending:
+            child = pending.pop()
+            size += 1
+            pending.extend(self.children.get(child, ()))
+        return size
+
+    def path(self, row):
+        """从顶层到该节点的料号路径"""
+        names = []
+        while row != self.ROOT:
+            names.append(self.pns[row])
+            row = self.parent[row]
+        return " > ".join(reversed(names)) or "顶层"
+
+    def child_assemblies(self, row):
+        """直接下级的子装配，按(料号, 同料号出现序号)编号，用于两个BOM间匹配"""
+        keyed = {}
+        occurrences = {}
+        for child in self.children.get(row, ()):
+            if self.children.get(child):
+                pn = self.pns[child]
+                occurrence = occurrences.get(pn, 0)
+                occurrences[pn] = occurrence + 1
+                keyed[(pn, occurrence)] = child
+        return keyed
+
+class SpillStore:
+    """磁盘模式的展开表存储
+
+    超出内存预算时，两个BOM按块展开后写入临时SQLite数据库，
+    差异计算通过带索引的连接查询完成，结果分批读取，
+    内存中只保留与差异相关的位号和料号。
+    """
+
+    SIDES = {'A': 0, 'B': 1}
+
+    def __init__(self, chunk_rows=SPILL_CHUNK_ROWS, fetch_size=SPILL_FETCH_SIZE):
+        self.chunk_rows = chunk_rows
+        self.fetch_size = fetch_size
+        fd, self.path = tempfile.mkstemp(prefix="bom_compare_", suffix=".sqlite")
+        os.close(fd)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("PRAGMA cache_size=-16000")  # 页缓存上限约16MB
+        self.conn.execute("PRAGMA temp_store=FILE")
+        self.conn.execute("CREATE TABLE refs (side INTEGER, seq INTEGER, ref TEXT, pn TEXT)")
+        self.conn.execute("CREATE TABLE parts (side INTEGER, seq INTEGER, pn TEXT, mpn TEXT, descr TEXT, qty REAL)")
+        self.row_counts = {}
+
+    def close(self):
+        """关闭并删除临时数据库"""
+        try:
+            self.conn.close()
+        finally:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def add_bom(self, side, bom_df):
+        """按块展开BOM并写入数据库
+
+        Args:
+            side: 'A'或'B'
+            bom_df: load_bom返回的标准化DataFrame
+        """
+        side_id = self.SIDES[side]
+        self.row_counts[side] = len(bom_df)
+        ref_seq = 0
+        for start in range(0, len(bom_df), self.chunk_rows):
+            chunk = bom_df.iloc[start:start + self.chunk_rows]
+
+            pn_texts, pn_codes = factorize_text(chunk['P/N'])
+            row_pns = np.asarray(pn_texts, dtype=object)[pn_codes]
+
+            field_texts = []
+            for field in ('MPN', 'Description'):
+                if field in chunk.columns:
+                    texts, codes = factorize_text(chunk[field])
+                    field_texts.append(np.asarray(texts, dtype=object)[codes])
+                else:
+                    field_texts.append([''] * len(chunk))
+
+            ref_table = explode_references(chunk['Reference'])
+            refs = ref_table['ref'].tolist()
+            quantities = unreferenced_quantities(chunk, ref_table['row'].to_numpy()).tolist()
+
+            self.conn.executemany(
+                "INSERT INTO parts VALUES (?, ?, ?, ?, ?, ?)",
+                zip([side_id] * len(chunk), range(start, start + len(chunk)), row_pns, *field_texts, quantities)
+            )
+            self.conn.executemany(
+                "INSERT INTO refs VALUES (?, ?, ?, ?)",
+                zip([side_id] * len(refs), range(ref_seq, ref_seq + len(refs)), refs,
+                    row_pns[ref_table['row'].to_numpy()])
+            )
+            ref_seq += len(refs)
+        self.conn.commit()
+
+    def build_indexes(self):
+        """建立索引并生成每个位号的最终料号表（重复位号以最后一行为准）及料号的位号数"""
+        self.conn.executescript("""
+            CREATE INDEX idx_refs_ref ON refs(side, ref, seq);
+            CREATE INDEX idx_refs_pn ON refs(side, pn);
+            CREATE INDEX idx_parts_pn ON parts(side, pn, seq);
+
+            CREATE TABLE ref_map AS
+                SELECT r.side, r.ref, r.pn FROM refs r
+                JOIN (SELECT side, ref, MAX(seq) AS seq FROM refs GROUP BY side, ref) last
+                  ON r.side = last.side AND r.ref = last.ref AND r.seq = last.seq;
+            CREATE INDEX idx_ref_map ON ref_map(side, ref);
+
+            CREATE TABLE pn_count AS
+                SELECT p.side, p.pn, COALESCE(c.cnt, 0) AS cnt, p.qty
+                FROM (SELECT side, pn, SUM(qty) AS qty FROM parts GROUP BY side, pn) p
+                LEFT JOIN (SELECT side, pn, COUNT(*) AS cnt FROM refs GROUP BY side, pn) c
+                  ON p.side = c.side AND p.pn = c.pn;
+            CREATE INDEX idx_pn_count ON pn_count(side, pn);
+        """)
+
+    def iter_query(self, sql, params=()):
+        """分批读取查询结果"""
+        cursor = self.conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(self.fetch_size)
+            if not rows:
+                break
+            yield from rows
+
+    def diff(self, pool, alt_index):
+        """计算差异
+
+        Args:
+            pool: 料号驻留池
+            alt_index: BOMComparer.build_alternative_index()的结果
+
+        Returns:
+            tuple: (ExplodedBOM A, ExplodedBOM B, 差异结果)，格式与diff_exploded相同，
+                其中pn_common只包含用量发生变化的共有料号
+        """
+        self.build_indexes()
+        exploded = {side: ExplodedBOM(pool) for side in self.SIDES}
+        for side, side_id in self.SIDES.items():
+            exploded[side].row_count = self.row_counts.get(side, 0)
+            exploded[side].ref_total = self.conn.execute(
+                "SELECT COUNT(*) FROM ref_map WHERE side = ?", (side_id,)).fetchone()[0]
+            exploded[side].part_total = self.conn.execute(
+                "SELECT COUNT(*) FROM pn_count WHERE side = ?", (side_id,)).fetchone()[0]
+
+        names = pool.names
+        ref_changed = {}
+        for ref, pn_a, pn_b in self.iter_query("""
+                SELECT a.ref, a.pn, b.pn FROM ref_map a
+                JOIN ref_map b ON b.side = 1 AND b.ref = a.ref
+                WHERE a.side = 0 AND a.pn <> b.pn"""):
+            id_a = pool.intern(pn_a)
+            id_b = pool.intern(pn_b)
+            groups_a = alt_index.get(pn_a)
+            groups_b = alt_index.get(pn_b)
+            ref_changed[ref] = (id_a, id_b, bool(groups_a and groups_b and not groups_a.isdisjoint(groups_b)))
+            exploded['A'].ref_to_pn[ref] = id_a
+            exploded['B'].ref_to_pn[ref] = id_b
+
+        # 只存在于一侧的位号和料号
+        only_sql = {
+            'ref': "SELECT x.ref, x.pn FROM ref_map x WHERE x.side = ? AND NOT EXISTS "
+                   "(SELECT 1 FROM ref_map y WHERE y.side = ? AND y.ref = x.ref)",
+            'pn': "SELECT x.pn FROM pn_count x WHERE x.side = ? AND NOT EXISTS "
+                  "(SELECT 1 FROM pn_count y WHERE y.side = ? AND y.pn = x.pn)"
+        }
+        only_refs = {}
+        only_pns = {}
+        for side, other in (('A', 'B'), ('B', 'A')):
+            params = (self.SIDES[side], self.SIDES[other])
+            only_refs[side] = set()
+            for ref, pn in self.iter_query(only_sql['ref'], params):
+                exploded[side].ref_to_pn[ref] = pool.intern(pn)
+                only_refs[side].add(ref)
+            only_pns[side] = {pool.intern(pn) for (pn,) in self.iter_query(only_sql['pn'], params)}
+
+        count_changed = {pool.intern(pn) for (pn,) in self.iter_query("""
+                SELECT a.pn FROM pn_count a
+                JOIN pn_count b ON b.side = 1 AND b.pn = a.pn
+                WHERE a.side = 0 AND (a.cnt <> b.cnt OR ABS(a.qty - b.qty) > 1e-9)""")}
+
+        # 读取报告中涉及的料号的位号列表和MPN/描述
+        relevant = set(count_changed) | only_pns['A'] | only_pns['B']
+        for side in self.SIDES:
+            relevant.update(exploded[side].ref_to_pn.values())
+        self.conn.execute("CREATE TEMP TABLE relevant (pn TEXT PRIMARY KEY)")
+        self.conn.executemany("INSERT INTO relevant VALUES (?)", ((names[pn_id],) for pn_id in relevant))
+
+        for side_id, pn, qty in self.iter_query(
+                "SELECT c.side, c.pn, c.qty FROM pn_count c JOIN relevant USING (pn)"):
+            side_exploded = exploded['A' if side_id == 0 else 'B']
+            pn_id = pool.intern(pn)
+            side_exploded.pn_to_refs[pn_id] = []
+            if qty:
+                side_exploded.qty_map[pn_id] = normalize_quantity(qty)
+        for side_id, pn, ref in self.iter_query(
+                "SELECT r.side, r.pn, r.ref FROM refs r JOIN relevant USING (pn) ORDER BY r.seq"):
+            exploded['A' if side_id == 0 else 'B'].pn_to_refs[pool.intern(pn)].append(ref)
+        for side_id, pn, mpn, descr in self.iter_query("""
+                SELECT p.side, p.pn, p.mpn, p.descr FROM parts p
+                JOIN (SELECT q.side, q.pn, MAX(q.seq) AS seq FROM parts q JOIN relevant USING (pn)
+                      GROUP BY q.side, q.pn) last
+                  ON p.side = last.side AND p.pn = last.pn AND p.seq = last.seq"""):
+            side_exploded = exploded['A' if side_id == 0 else 'B']
+            pn_id = pool.intern(pn)
+            side_exploded.mpn_map[pn_id] = mpn
+            side_exploded.desc_map[pn_id] = descr
+
+        diff = {
+            'pn_added': only_pns['B'],
+            'pn_removed': only_pns['A'],
+            'pn_common': count_changed,
+            'ref_added': only_refs['B'],
+            'ref_removed': only_refs['A'],
+            'ref_changed': ref_changed
+        }
+        return exploded['A'], exploded['B'], diff
+
+def sniff_encoding(file_path, sample_size=ENCODING_SNIFF_BYTES):
+    """识别文本文件的编码
+
+    依次判断UTF-8 BOM、UTF-16 BOM、无BOM的UTF-16（ASCII字符的另一半字节为0）
+    和UTF-8，都不是时按GBK（使用其超集GB18030）读取。
+    """
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_size)
+
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+
+    half = len(sample) // 2
+    if half:
+        even_zeros = sample[0::2].count(0)
+        odd_zeros = sample[1::2].count(0)
+        if odd_zeros > half * 0.3 and even_zeros * 10 < odd_zeros:
+            return 'utf-16-le'
+        if even_zeros > half * 0.3 and odd_zeros * 10 < even_zeros:
+            return 'utf-16-be'
+
+    try:
+        # 样本可能在多字节字符中间截断，未读完整个文件时不检查结尾
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=len(sample) < sample_size)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'gb18030'
+
+def sniff_delimiter(lines, candidates=(',', '\t', ';', '|')):
+    """按前几行中出现次数最多的分隔符识别CSV分隔符（表头行的列数通常最多）"""
+    best = ','
+    best_count = 0
+    for delimiter in candidates:
+        count = max((line.count(delimiter) for line in lines), default=0)
+        if count > best_count:
+            best = delimiter
+            best_count = count
+    return best
+
+class DelimitedBOMFile:
+    """CSV/TSV格式的BOM读取器，提供与pd.ExcelFile相同的parse/close接口
+
+    编码按文件内容识别，分隔符按扩展名或前几行内容识别。所有单元格按文本读取
+    （保留料号的前导零）。列投影时由解析器只转换需要的列，其余列不会生成数据。
+    """
+
+    sheet_names = [0]
+
+    def __init__(self, file_path, delimiter=None):
+        self.file_path = file_path
+        self.encoding = sniff_encoding(file_path)
+
+        with open(file_path, 'r', encoding=self.encoding, newline='') as f:
+            head = list(itertools.islice(f, 20))
+        self.delimiter = delimiter or sniff_delimiter(head)
+        # 预览行与Excel的header=None读取结果一致：空单元格为NaN，短行补齐
+        self.preview = list(csv.reader(head, delimiter=self.delimiter))
+
+    def close(self):
+        pass
+
+    def read_options(self, header):
+        return {
+            'sep': self.delimiter,
+            'encoding': self.encoding,
+            'skiprows': header,
+            'header': 0,
+            'dtype': str,
+            'index_col': False
+        }
+
+    def parse(self, sheet_name=0, header=0, nrows=None, usecols=None):
+        """按ExcelFile.parse的语义读取数据"""
+        if header is None:
+            rows = self.preview[:nrows] if nrows is not None else self.preview
+            width = max((len(row) for row in rows), default=0)
+            return pd.DataFrame([[cell if cell.strip() else None for cell in row] + [None] * (width - len(row))
+                                 for row in rows])
+
+        return pd.read_csv(self.file_path, nrows=nrows, usecols=usecols, **self.read_options(header))
+
+class ParquetBOMFile:
+    """Parquet格式的BOM读取器，提供与pd.ExcelFile相同的parse/close接口
+
+    列名作为第一行表头，列投影时只读取需要的列。需要安装pyarrow。
+    """
+
+    sheet_names = [0]
+
+    def __init__(self, file_path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("缺少读取Parquet所需的库，请安装pyarrow库: pip install pyarrow")
+        self.file_path = file_path
+        self.parquet_file = pq.ParquetFile(file_path)
+        self.columns = list(self.parquet_file.schema_arrow.names)
+
+    def close(self):
+        self.parquet_file.close()
+
+    def raw_rows(self, nrows=None):
+        """列名行加数据行，与Excel的header=None读取结果一致"""
+        if nrows is None:
+            data = self.parquet_file.read().to_pandas()
+        else:
+            batches = self.parquet_file.iter_batches(batch_size=max(nrows, 1))
+            batch = next(batches, None)
+            data = batch.to_pandas() if batch is not None else pd.DataFrame(columns=self.columns)
+            data = data.iloc[:max(nrows - 1, 0)]
+        header_row = pd.DataFrame([self.columns], columns=data.columns)
+        raw = pd.concat([header_row, data], ignore_index=True)
+        raw.columns = range(len(raw.columns))
+        return raw
+
+    def parse(self, sheet_name=0, header=0, nrows=None, usecols=None):
+        """按ExcelFile.parse的语义读取数据"""
+        if header is None:
+            return self.raw_rows(nrows)
+
+        if header == 0:
+            if nrows == 0:
+                df = pd.DataFrame(columns=self.columns)
+                return df if usecols is None else df.iloc[:, list(usecols)]
+            columns = None if usecols is None else [self.columns[i] for i in usecols]
+            df = self.parquet_file.read(columns=columns).to_pandas()
+            return df if nrows is None else df.iloc[:nrows]
+
+        # 表头不在第一行（列名不是真正的表头）时按原始行重新确定表头
+        raw = self.raw_rows()
+        df = raw.iloc[header + 1:].reset_index(drop=True)
+        df.columns = list(raw.iloc[header])
+        if usecols is not None:
+            df = df.iloc[:, list(usecols)]
+        return df if nrows is None else df.iloc[:nrows]
+
+def frame_fingerprint(bom_df, hashes=None):
+    """计算标准化BOM的内容指纹（列名和逐行内容的哈希），内容相同的BOM指纹相同
+
+    Args:
+        bom_df: 标准化的BOM
+        hashes: 已计算的行哈希（row_hashes的结果），为None时重新计算
+    """
+    digest = hashlib.sha1('\x1f'.join(str(col) for col in bom_df.columns).encode('utf-8'))
+    if len(bom_df):
+        digest.update((row_hashes(bom_df) if hashes is None else hashes).tobytes())
+    return digest.hexdigest()
+
+class CompareResultCache:
+    """对比结果缓存
+
+    以两个BOM的内容指纹和影响差异计算的选项为键，保存展开结果和差异结果。
+    报告显示选项（如是否显示MPN）不在键中，修改后直接用缓存的差异重新生成报告。
+    按最近使用顺序淘汰，最多保留 max_entries 条（为0时不缓存）。
+    """
+
+    def __init__(self, max_entries=COMPARE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, result):
+        if self.max_entries <= 0:
+            return
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+def row_hashes(bom_df):
+    """逐行计算内容哈希（不含索引），内容相同的行哈希相同
+
+    位号等文本列的值大多不重复，categorize=False跳过先去重再哈希的步骤（结果相同）。
+    """
+    return pd.util.hash_pandas_object(bom_df, index=False, categorize=False).to_numpy()
+
+def changed_rows(old_hashes, new_hashes):
+    """按行哈希找出两个版本之间变化的行
+
+    内容相同的行在两个版本中出现次数不同时，这些行全部视为变化（先移除再新增）。
+
+    Returns:
+        tuple: (旧版本中被移除的行位置, 新版本中新增的行位置)
+    """
+    old_values, old_counts = np.unique(old_hashes, return_counts=True)
+    new_values, new_counts = np.unique(new_hashes, return_counts=True)
+    common, old_idx, new_idx = np.intersect1d(old_values, new_values, assume_unique=True, return_indices=True)
+    changed = np.concatenate([
+        np.setdiff1d(old_values, new_values, assume_unique=True),
+        np.setdiff1d(new_values, old_values, assume_unique=True),
+        common[old_counts[old_idx] != new_counts[new_idx]]
+    ])
+    return np.flatnonzero(np.isin(old_hashes, changed)), np.flatnonzero(np.isin(new_hashes, changed))
+
+def file_signature(file_path):
+    """文件的(修改时间, 大小)，文件不存在或无法访问时返回None"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class FileWatcher:
+    """轮询文件的修改时间和大小，检测文件变化
+
+    文件变化后需保持 debounce 秒不再变化才报告，Excel保存时的多次写入
+    （先写临时文件再替换）只触发一次重新加载。由调用方定时调用poll()。
+    """
+
+    def __init__(self, debounce=WATCH_DEBOUNCE_SECONDS, clock=time.monotonic):
+        self.debounce = debounce
+        self.clock = clock
+        self.signatures = {}  # 路径 -> 上次加载时的文件签名
+        self.pending = {}     # 路径 -> (变化后的文件签名, 首次检测到该签名的时间)
+
+    def watch(self, file_path):
+        """开始监视文件（以当前状态为基准）"""
+        self.signatures[file_path] = file_signature(file_path)
+        self.pending.pop(file_path, None)
+
+    def unwatch(self, file_path):
+        self.signatures.pop(file_path, None)
+        self.pending.pop(file_path, None)
+
+    def clear(self):
+        self.signatures.clear()
+        self.pending.clear()
+
+    def poll(self):
+        """检查所有监视的文件
+
+        Returns:
+            list: 已变化且保持稳定的文件路径，返回后以新状态为基准
+        """
+        now = self.clock()
+        changed = []
+        for file_path, signature in self.signatures.items():
+            current = file_signature(file_path)
+            if current == signature:
+                self.pending.pop(file_path, None)
+                continue
+            pending = self.pending.get(file_path)
+            if pending is None or pending[0] != current:
+                self.pending[file_path] = (current, now)
+            elif current is not None and now - pending[1] >= self.debounce:
+                # 保存过程中文件可能暂时不存在，等重新出现后再报告
+                changed.append(file_path)
+
+        for file_path in changed:
+            self.signatures[file_path] = self.pending.pop(file_path)[0]
+        return changed
+
+def open_bom_file(file_path):
+    """按扩展名打开BOM文件，返回具有parse/close接口的读取器"""
+    file_ext = os.path.splitext(file_path)[1].lower()
+    if file_ext in DELIMITED_EXTENSIONS:
+        return DelimitedBOMFile(file_path, delimiter=DELIMITED_EXTENSIONS[file_ext])
+    if file_ext in PARQUET_EXTENSIONS:
+        return ParquetBOMFile(file_path)
+    return pd.ExcelFile(file_path)
+
+class MissingFieldsError(ValueError):
+    """BOM文件缺少必要字段（未能自动识别，也没有手动选择）"""
+
+    def __init__(self, fields, message=None):
+        super().__init__(message or f"BOM文件缺少必要字段: {'、'.join(fields)}，请检查文件格式")
+        self.fields = list(fields)
+
+    def __reduce__(self):
+        # 对比服务在子进程中加载BOM，异常需要按(字段, 消息)重建
+        return type(self), (self.fields, str(self))
+
 class BOMComparer:
     def __init__(self, parent_window=None):
         """初始化BOM比较器
@@ -48,18 +1335,36 @@ class BOMComparer:
         # 设置父窗口引用
         self.parent_window = parent_window
 
+        # 是否允许弹出对话框（如手动选择未识别的列），无界面运行（对比服务）时为False
+        self.interactive = True
+
         # 设置默认的字段映射
         self.field_mappings = {
             'Item': ['Item', 'item', '序号', 'Number'],
             'P/N': ['P/N', '料号', '物料编码', '物料编号', 'Part Number', '型号'],
             'Reference': ['Reference', 'Ref', 'ref', '位号'],
             'Description': ['Description', '描述', '物料描述'],
-            'MPN': ['Manufacturer P/N', 'MPN', '制造商料号', '厂家料号', '生产商料号']
+            'MPN': ['Manufacturer P/N', 'MPN', '制造商料号', '厂家料号', '生产商料号'],
+            'Level': ['Level', 'BOM Level', '层级', '阶层'],
+            'Quantity': ['Quantity', 'Qty', '数量', '用量']
         }
 
         # 报告显示设置
         self.show_mpn_in_report = True  # 默认显示MPN信息
 
+        # 列投影模式：识别表头后只读取映射到标准字段的列，完整表格按需加载
+        self.column_projection = False
+
+        # 多工作表模式：读取工作簿中所有被识别为BOM的工作表并合并（增加Sheet列记录来源）
+        self.multi_sheet = False
+
+        # 预编译的字段匹配器，字段映射变化时重新编译
+        self._field_matcher = None
+        self._field_matcher_signature = None
+
+        # 表头签名缓存 - 由GUI从文件加载并保存
+        self.header_cache = HeaderSignatureCache()
+
         # 替代料映射字典 - 可以由用户配置
         self.alternative_map = {}
 
@@ -70,10 +1375,30 @@ class BOMComparer:
         self.bom_a = None
         self.bom_b = None
 
+        # 内存预算（MB），预计超出时对比改用磁盘模式，0表示不限制
+        self.memory_budget_mb = 0
+
+        # 对比结果缓存：输入和替代料关系未变化时跳过展开和差异计算
+        self.compare_cache = CompareResultCache()
+
+        # 上一次平铺对比的B和结果，只有B少量修改时增量更新
+        self.last_flat = None
+
         # 用于记录处理时间
         self.start_time = None
         self.end_time = None  # 结束时间
 
+        # 分阶段计时，compare返回的报告上附带本次对比的耗时字典
+        self.stage_timer = StageTimer()
+        self.last_timings = {}
+
+        # 最近一次对比的差异结果（diff_flat或diff_hierarchy_frames的返回值），供导出结构化数据使用
+        self.last_result = None
+
+        # 性能分析模式：None、'cprofile' 或 'tracemalloc'，开启后每次对比输出一个分析文件
+        self.profile_mode = None
+        self.profile_dir = None  # 为None时保存到程序目录下的profiles文件夹
+
         # 错误信息映射字典
         self.error_messages = {
             'FileNotFoundError': '文件不存在，请检查文件路径是否正确',
@@ -108,6 +1433,20 @@ class BOMComparer:
 
         self.field_mappings = field_mappings
 
+    def get_field_matcher(self):
+        """获取与当前字段映射一致的预编译匹配器"""
+        # 字段映射可能被原地修改（如记住用户选择的列），因此按内容判断是否需要重新编译
+        signature = tuple((field, tuple(aliases)) for field, aliases in self.field_mappings.items())
+        if self._field_matcher is None or signature != self._field_matcher_signature:
+            self._field_matcher = FieldMappingMatcher(self.field_mappings)
+            self._field_matcher_signature = signature
+        return self._field_matcher
+
+    def get_field_mappings_digest(self):
+        """字段映射的摘要，用于判断表头缓存中的自动识别结果是否仍然有效（匹配规则变化时也会失效）"""
+        data = json.dumps([self.field_mappings, EXACT_MATCH_FIELDS], ensure_ascii=False)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()[:16]
+
     def update_progress(self, progress, message=""):
         """更新进度信息"""
         if self.progress_callback:
@@ -158,10 +1497,28 @@ class BOMComparer:
             final_width = min(max_width_limit, max(header_width, max_content_width, 80))
             tree.column(col, width=final_width)
 
-    def load_bom(self, file_path):
-        """加载BOM文件并处理"""
+    def load_bom(self, file_path, projection=None, sheet_name=None):
+        """加载BOM文件并处理
+
+        Args:
+            file_path: BOM文件路径
+            projection: 是否只读取映射到标准字段的列，为None时使用column_projection设置
+            sheet_name: 读取的工作表，为None时读取第一个工作表（多工作表模式下读取所有BOM工作表）
+
+        Returns:
+            DataFrame: 标准化后的BOM数据
+        """
+        if projection is None:
+            projection = self.column_projection
+        if sheet_name is None and self.multi_sheet:
+            return self.load_bom_sheets(file_path, projection)
+        sheet = 0 if sheet_name is None else sheet_name
+
+        bom_file = None
+        timer = self.stage_timer
         try:
-            print(f"\n=== 加载文件: {os.path.basename(file_path)} ===")
+            logger.info("=== 加载文件: %s ===", os.path.basename(file_path))
+            timer.begin('read_excel')
 
             # 检查文件是否存在
             if not os.path.exists(file_path):
@@ -169,12 +1526,14 @@ class BOMComparer:
 
             # 检查文件扩展名
             file_ext = os.path.splitext(file_path)[1].lower()
-            if file_ext not in ['.xlsx', '.xls']:
-                raise ValueError("不支持的文件格式，请使用Excel文件(.xlsx或.xls)")
+            if file_ext not in SUPPORTED_BOM_EXTENSIONS:
+                raise ValueError("不支持的文件格式，请使用Excel文件(.xlsx或.xls)、CSV/TSV文件或Parquet文件")
 
-            # 首先不指定header，读取整个文件作为原始数据
+            # 首先不指定header，只读取前20行原始数据用于识别表头
+            # 文件只打开一次，后续按识别出的表头再解析数据（CSV和Parquet使用相同接口的读取器）
             try:
-                df_raw = pd.read_excel(file_path, header=None)
+                bom_file = open_bom_file(file_path)
+                df_raw = bom_file.parse(sheet, header=None, nrows=20)
             except Exception as e:
                 error_msg = str(e)
                 if "XLRDError" in error_msg:
@@ -185,62 +1544,77 @@ class BOMComparer:
                     raise ValueError("无法访问文件，请检查文件是否被其他程序占用")
                 elif "Missing optional dependency" in error_msg and "xlrd" in error_msg:
                     raise ValueError("缺少读取Excel所需的库，请安装xlrd库: pip install xlrd>=2.0.1")
+                elif "pyarrow" in error_msg:
+                    raise ValueError("缺少读取Parquet所需的库，请安装pyarrow库: pip install pyarrow")
                 else:
                     raise ValueError(f"读取文件失败: {error_msg}")
 
-            print(f"原始数据行数: {len(df_raw)}")
+            timer.begin('header_detection')
 
-            # 使用实例的字段映射字典，而不是硬编码的
-            field_mappings = self.field_mappings
+            # 使用实例的字段映射（预编译），而不是硬编码的
+            matcher = self.get_field_matcher()
 
-            # 尝试识别表头行
-            header_row = -1
-            max_matches = 0
+            mappings_digest = self.get_field_mappings_digest()
 
-            # 检查前20行，寻找最可能的表头行
+            # 先查找表头签名缓存：同一模板的文件无需重新识别表头
+            header_row = -1
+            header_signature = None
+            cache_entry = None
             for row_idx in range(min(20, len(df_raw))):
-                row = df_raw.iloc[row_idx]
-                match_count = 0
-
-                # 计算该行与期望字段的匹配度
-                for field_aliases in field_mappings.values():
-                    for alias in field_aliases:
-                        if any(str(cell).lower() == alias.lower() for cell in row):
-                            match_count += 1
-                            break
-
-                # 记录匹配度最高的行
-                if match_count > max_matches:
-                    max_matches = match_count
+                signature = HeaderSignatureCache.make_signature(df_raw.iloc[row_idx])
+                entry = self.header_cache.get(signature) if signature else None
+                if entry is not None and entry['header_row'] == row_idx:
                     header_row = row_idx
+                    header_signature = signature
+                    cache_entry = entry
+                    logger.debug("表头缓存命中: 第%s行", row_idx + 1)
+                    break
 
-            # 如果找不到合适的表头行，尝试读取第一行作为表头
-            if header_row < 0:
-                header_row = 0
-
-            # 重新读取文件，使用识别出的表头行
-            df = pd.read_excel(file_path, header=header_row)
-
-            # 用于存储实际列名到标准列名的映射
-            column_map = {}
-
-            # 检查并映射列名
-            for std_field, possible_names in field_mappings.items():
-                found = False
-                for name in possible_names:
-                    for col in df.columns:
-                        # 精确匹配
-                        if str(col).lower() == name.lower():
-                            column_map[std_field] = col
-                            found = True
-                            break
-                        # 包含匹配（例如"物料编码(P/N)"包含"物料编码"）
-                        elif name.lower() in str(col).lower():
-                            column_map[std_field] = col
-                            found = True
-                            break
-                    if found:
-                        break
+            if cache_entry is None:
+                # 尝试识别表头行
+                max_matches = 0
+
+                # 检查前20行，寻找最可能的表头行
+                for row_idx in range(min(20, len(df_raw))):
+                    # 计算该行与期望字段的匹配度
+                    match_count = matcher.score_row(df_raw.iloc[row_idx])
+
+                    # 记录匹配度最高的行
+                    if match_count > max_matches:
+                        max_matches = match_count
+                        header_row = row_idx
+
+                # 如果找不到合适的表头行，尝试读取第一行作为表头
+                if header_row < 0:
+                    header_row = 0
+
+                header_signature = HeaderSignatureCache.make_signature(df_raw.iloc[header_row]) \
+                    if len(df_raw) > header_row else None
+
+            # 只读取表头得到实际列名（与按该表头读取整个表格时的列名一致）
+            header_columns = list(bom_file.parse(sheet, header=header_row, nrows=0).columns)
+
+            # 按字符串查找实际列名（缓存和对话框中保存的是字符串）
+            columns_by_name = {str(col): col for col in header_columns}
+            manual_fields = set()
+
+            if cache_entry is not None and cache_entry.get('mappings') == mappings_digest:
+                # 字段映射未变化，直接使用缓存的列映射
+                column_map = {field: columns_by_name[col] for field, col in cache_entry['column_map'].items()
+                              if col in columns_by_name}
+                manual_fields.update(cache_entry.get('manual_fields', []))
+            else:
+                # 检查并映射列名，得到标准列名到实际列名的映射
+                # 支持精确匹配和包含匹配（例如"物料编码(P/N)"包含"物料编码"）
+                column_map = matcher.map_columns(header_columns)
+
+                # 字段映射已变化时，仍保留用户之前手动选择的列
+                if cache_entry is not None:
+                    for field in cache_entry.get('manual_fields', []):
+                        col = cache_entry['column_map'].get(field)
+                        if col in columns_by_name:
+                            column_map[field] = columns_by_name[col]
+                            manual_fields.add(field)
 
             # 检查是否所有必要字段都找到了映射
             missing_fields = []
@@ -252,7 +1626,7 @@ class BOMComparer:
                     missing_fields.append(field)
 
             # 如果有必要字段缺失，尝试弹出对话框让用户选择
-            if missing_fields and hasattr(self, 'parent_window'):
+            if missing_fields and self.interactive:
                 for missing_field in missing_fields[:]:  # 使用切片创建副本，避免在循环中修改
                     # 构建提示信息
                     if missing_field == 'Reference':
@@ -270,7 +1644,7 @@ class BOMComparer:
                         self.parent_window,
                         title,
                         message,
-                        [str(col) for col in df.columns],
+                        [str(col) for col in header_columns],
                         field_type=missing_field
                     )
 
@@ -280,8 +1654,9 @@ class BOMComparer:
                         remember = dialog.result['remember']
 
                         # 更新映射
-                        column_map[missing_field] = selected_column
+                        column_map[missing_field] = columns_by_name.get(selected_column, selected_column)
                         missing_fields.remove(missing_field)
+                        manual_fields.add(missing_field)
 
                         # 如果用户选择记住选择，更新字段映射
                         if remember:
@@ -292,13 +1667,32 @@ class BOMComparer:
 
             # 如果仍有缺失字段，报错
             if missing_fields:
-                missing_fields_str = '、'.join(missing_fields)
-                raise ValueError(f"BOM文件缺少必要字段: {missing_fields_str}，请检查文件格式")
+                raise MissingFieldsError(missing_fields)
+
+            # 记录表头识别结果（在补充默认列之前），同一模板的文件下次直接复用
+            current_digest = self.get_field_mappings_digest()  # 记住用户选择后字段映射会变化
+            if cache_entry is None or cache_entry.get('mappings') != current_digest or \
+               manual_fields != set(cache_entry.get('manual_fields', [])):
+                self.header_cache.put(header_signature, header_row, column_map, current_digest, manual_fields)
+
+            # 使用识别出的表头行读取数据
+            timer.begin('read_excel')
+            if projection:
+                # 列投影：只解析映射到的列，按位置选择以避免列名重复或非字符串的问题
+                positions = sorted({header_columns.index(col) for col in column_map.values()
+                                    if col in header_columns})
+                df = bom_file.parse(sheet, header=header_row, usecols=positions)
+                df.columns = [header_columns[i] for i in positions]
+            else:
+                df = bom_file.parse(sheet, header=header_row)
+
+            logger.info("原始数据行数: %s, 读取列数: %s/%s", len(df), len(df.columns), len(header_columns))
+            timer.begin('normalization')
 
             # 添加可选字段的默认值
             for field in optional_fields:
                 if field not in column_map:
-                    print(f"警告: 未找到字段 '{field}'，将使用默认空值")
+                    logger.warning("未找到字段 '%s'，将使用默认空值", field)
                     # 添加空列
                     df[field] = ""
                     column_map[field] = field
@@ -347,16 +1741,52 @@ class BOMComparer:
             # 确保Reference列是字符串类型
             df_renamed['Reference'] = df_renamed['Reference'].astype(str)
 
-            # 移除空的Reference行
-            df_renamed = df_renamed[df_renamed['Reference'].str.strip() != '']
-            df_renamed = df_renamed[df_renamed['Reference'].str.strip().str.lower() != 'nan']
-
-            # 移除完全相同的重复行
-            df_renamed = df_renamed.drop_duplicates()
+            # 多层级BOM：子装配行通常没有位号，且不同装配下可能有完全相同的行，都需要保留
+            levels = self.get_bom_levels(df_renamed)
+
+            # 去重只比较标准字段：列投影时只读取了这些列，完整读取时其余列的差异也不影响对比，
+            # 两种读取方式得到相同的行
+            standard_columns = [col for col in df_renamed.columns if col in self.field_mappings]
+
+            if levels is None and 'Quantity' in df_renamed.columns:
+                # 有用量列时保留没有位号但有用量的行（螺丝、标签、胶水等）
+                refs = df_renamed['Reference'].fillna('').str.strip()
+                no_refs = (refs == '') | (refs.str.lower() == 'nan')
+                df_renamed['Reference'] = df_renamed['Reference'].where(~no_refs, '')
+                pns = df_renamed['P/N'].astype(str).fillna('').str.strip()
+                has_quantity = (pd.to_numeric(df_renamed['Quantity'], errors='coerce') > 0) & \
+                    (pns != '') & (pns.str.lower() != 'nan')
+                df_renamed = df_renamed[~no_refs | has_quantity]
+                logger.info("保留无位号物料行: %s行", int((no_refs & has_quantity).sum()))
+
+                # 移除标准字段完全相同的重复行
+                df_renamed = df_renamed.drop_duplicates(subset=standard_columns)
+            elif levels is None:
+                # 移除空的Reference行
+                df_renamed = df_renamed[df_renamed['Reference'].str.strip() != '']
+                df_renamed = df_renamed[df_renamed['Reference'].str.strip().str.lower() != 'nan']
+
+                # 移除标准字段完全相同的重复行
+                df_renamed = df_renamed.drop_duplicates(subset=standard_columns)
+            else:
+                df_renamed['Level'] = levels
+                refs = df_renamed['Reference'].fillna('').str.strip()
+                no_refs = (refs == '') | (refs.str.lower() == 'nan')
+                df_renamed['Reference'] = df_renamed['Reference'].where(~no_refs, '')
+                # 只移除料号和位号都为空的行
+                pns = df_renamed['P/N'].astype(str).fillna('').str.strip()
+                keep = ~no_refs | ((pns != '') & (pns.str.lower() != 'nan'))
+                df_renamed = df_renamed[keep]
+                logger.info("识别为多层级BOM: %s个层级", len(set(levels)))
 
             # 重置索引
             df_renamed = df_renamed.reset_index(drop=True)
 
+            # 料号、MPN和描述重复度高，使用类别类型存储，每个不同值只保存一份
+            for field in ('P/N', 'MPN', 'Description'):
+                if field in df_renamed.columns:
+                    df_renamed[field] = df_renamed[field].astype('category')
+
             # 数据统计和检查
             stats = {
                 '总行数': len(df_renamed),
@@ -366,9 +1796,9 @@ class BOMComparer:
                 '重复物料行数': len(df_renamed) - len(df_renamed.drop_duplicates(['P/N']))
             }
 
-            print("\n=== 数据统计 ===")
+            logger.info("=== 数据统计 ===")
             for key, value in stats.items():
-                print(f"{key}: {value}")
+                logger.info("%s: %s", key, value)
 
             # 检查潜在问题
             warnings = []
@@ -378,15 +1808,17 @@ class BOMComparer:
                 warnings.append(f"发现 {stats['重复物料行数']} 行重复物料")
 
             if warnings:
-                print("\n=== 警告信息 ===")
+                logger.warning("=== 警告信息 ===")
                 for warning in warnings:
-                    print(f"警告: {warning}")
+                    logger.warning("%s", warning)
 
             # 检查是否有有效数据
             if len(df_renamed) == 0:
                 raise ValueError("处理后的BOM数据为空，请检查文件格式和内容")
 
             # 在处理完数据后，根据Item列识别替代料关系
+            timer.begin('alternate_detection')
+
             def extract_main_item(item):
                 """从Item值中提取主序号（例如：从'1.2'提取'1'）"""
                 try:
@@ -401,8 +1833,8 @@ class BOMComparer:
             # 创建基于Item的替代料映射
             item_based_alt_map = {}
 
-            # 检查是否有Item列
-            if 'Item' in df_renamed.columns:
+            # 检查是否有Item列（多层级BOM的Item是层级编号，不用于识别替代料）
+            if 'Item' in df_renamed.columns and levels is None:
                 # 按主序号分组
                 item_groups = {}
                 for _, row in df_renamed.iterrows():
@@ -427,7 +1859,7 @@ class BOMComparer:
                                 alt_pns = [p for p in all_pns if p != pn]
                                 if alt_pns:  # 确保有替代料
                                     item_based_alt_map[pn] = alt_pns
-                                    print(f"基于Item识别到替代料关系: {pn} -> {alt_pns}")
+                                    logger.debug("基于Item识别到替代料关系: %s -> %s", pn, alt_pns)
 
             # 将基于Item的替代料关系添加到替代料映射中
             for main_pn, alt_pns in item_based_alt_map.items():
@@ -464,18 +1896,167 @@ class BOMComparer:
                     error_msg = self.error_messages['MemoryError']
                 elif "Missing optional dependency" in error_msg and "xlrd" in error_msg:
                     error_msg = "缺少读取Excel所需的库，请安装xlrd库: pip install xlrd>=2.0.1"
+                elif "pyarrow" in error_msg:
+                    error_msg = "缺少读取Parquet所需的库，请安装pyarrow库: pip install pyarrow"
                 else:
                     error_msg = f"{friendly_msg}"
 
-            print(f"BOM文件处理出错: {error_msg}")
+            logger.error("BOM文件处理出错: %s", error_msg)
             if hasattr(self, 'update_progress'):
                 self.update_progress(0, error_msg)
+            if isinstance(e, MissingFieldsError):
+                # 保留缺少的字段（多工作表模式的子进程据此交给主进程重新加载）
+                raise MissingFieldsError(e.fields, error_msg)
             raise ValueError(error_msg)
+        finally:
+            timer.end()
+            # 及时关闭工作簿，避免文件被占用（Excel中无法保存）
+            if bom_file is not None:
+                bom_file.close()
+
+    def is_bom_sheet(self, df_raw):
+        """判断工作表是否为BOM：前20行中匹配度最高的行能映射出料号列和位号列"""
+        matcher = self.get_field_matcher()
+        best_row = None
+        best_score = 0
+        for row_idx in range(min(20, len(df_raw))):
+            score = matcher.score_row(df_raw.iloc[row_idx])
+            if score > best_score:
+                best_score = score
+                best_row = row_idx
+        if best_row is None:
+            return False
+        cells = [str(cell).strip() for cell in df_raw.iloc[best_row] if not pd.isna(cell)]
+        column_map = matcher.map_columns(cells)
+        return 'P/N' in column_map and 'Reference' in column_map
+
+    def select_bom_sheets(self, file_path):
+        """识别工作簿中的BOM工作表
+
+        同一布局（工作表名称和顺序相同）的工作簿直接使用表头缓存中记录的结果。
+
+        Returns:
+            tuple: (BOM工作表名称列表, 工作簿布局签名)，无法打开文件时返回([], None)
+        """
+        if not os.path.exists(file_path) or os.path.splitext(file_path)[1].lower() not in EXCEL_EXTENSIONS:
+            return [], None
+        try:
+            excel_file = pd.ExcelFile(file_path)
+        except Exception:
+            return [], None
+
+        try:
+            sheet_names = list(excel_file.sheet_names)
+            if len(sheet_names) < 2:
+                return sheet_names, None
+
+            mappings_digest = self.get_field_mappings_digest()
+            layout = HeaderSignatureCache.make_layout_signature(sheet_names)
+            cached = self.header_cache.get_sheets(layout, mappings_digest)
+            if cached is not None and all(sheet in sheet_names for sheet in cached):
+                logger.debug("工作表选择缓存命中: %s", cached)
+                return cached, layout
+
+            selected = [sheet for sheet in sheet_names
+                        if self.is_bom_sheet(excel_file.parse(sheet, header=None, nrows=20))]
+            self.header_cache.put_sheets(layout, selected, mappings_digest)
+            logger.info("识别到BOM工作表: %s", ", ".join(selected) if selected else "无")
+            return selected, layout
+        finally:
+            excel_file.close()
+
+    def load_bom_sheets(self, file_path, projection=None):
+        """多工作表模式加载BOM
+
+        识别所有BOM工作表后分别加载（文件较大时在子进程中并行解析），
+        合并为一个标准化的DataFrame，Sheet列记录每行来自的工作表。
+        只有一个BOM工作表时与普通模式相同。
+
+        Returns:
+            DataFrame: 标准化后的BOM数据
+        """
+        timer = self.stage_timer
+        with timer.span('sheet_detection'):
+            sheets, layout = self.select_bom_sheets(file_path)
+        if len(sheets) <= 1:
+            return self.load_bom(file_path, projection, sheet_name=sheets[0] if sheets else 0)
+
+        logger.info("=== 多工作表加载: %s (%s个工作表) ===", os.path.basename(file_path), len(sheets))
+        try:
+            results = None
+            if os.path.getsize(file_path) >= SHEET_PARALLEL_MIN_BYTES:
+                try:
+                    with timer.span('read_excel'):
+                        # 用spawn启动子进程：fork会复制Tk和后台线程（预热、网络请求）持有的锁，
+                        # 在各平台上的行为也与Windows一致
+                        with ProcessPoolExecutor(max_workers=min(len(sheets), os.cpu_count() or 1),
+                                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+                            header_entries = dict(self.header_cache.entries)
+                            futures = [executor.submit(load_bom_sheet, file_path, sheet, self.field_mappings, projection,
+                                                       header_entries)
+                                       for sheet in sheets]
+                            results = []
+                            for sheet, future in zip(sheets, futures):
+                                bom_df, alternative_map, missing_fields, touched_entries = future.result()
+                                self.header_cache.merge_entries(touched_entries)
+                                if missing_fields:
+                                    logger.warning("工作表 %s 未能识别必要字段: %s，在主进程中重新加载",
+                                                   sheet, '、'.join(missing_fields))
+                                    results.append(None)
+                                else:
+                                    results.append((bom_df, alternative_map))
+                except (OSError, BrokenProcessPool) as e:
+                    logger.warning("并行解析工作表失败，改为逐个解析: %s", e)
+                    results = None
+
+            # 逐个加载未并行解析的工作表；子进程中缺少必要字段的工作表在这里加载，可以弹出对话框选择列
+            if results is None:
+                results = [None] * len(sheets)
+            for index, sheet in enumerate(sheets):
+                if results[index] is not None:
+                    continue
+                alternative_map = self.alternative_map
+                self.alternative_map = {}
+                try:
+                    bom_df = self.load_bom(file_path, projection, sheet_name=sheet)
+                    results[index] = (bom_df, self.alternative_map)
+                finally:
+                    self.alternative_map = alternative_map
+        except ValueError:
+            # 缓存的工作表选择可能已不适用于该文件，下次重新识别
+            if layout is not None:
+                self.header_cache.drop_sheets(layout)
+            raise
+
+        frames = []
+        for sheet, (bom_df, alternative_map) in zip(sheets, results):
+            # 各工作表的Item独立编号，替代料关系按工作表分别识别后合并
+            for main_pn, alt_pns in alternative_map.items():
+                current = self.alternative_map.setdefault(main_pn, [])
+                current.extend(alt_pn for alt_pn in alt_pns if alt_pn not in current)
+            frames.append(bom_df.assign(Sheet=sheet))
+
+        combined = pd.concat(frames, ignore_index=True)
+        for field in ('P/N', 'MPN', 'Description'):
+            if field in combined.columns:
+                combined[field] = combined[field].astype('category')
+        logger.info("合并后数据行数: %s", len(combined))
+        return combined
 
     def set_alternative_map(self, alt_map):
         """设置物料替代关系映射"""
         self.alternative_map = alt_map
 
+    @contextmanager
+    def extra_alternatives(self, *alternative_maps):
+        """在with块中临时加入替代料关系（如已保存版本记录的替代料），退出时恢复原来的映射"""
+        saved = self.alternative_map
+        self.alternative_map = merge_alternative_maps(saved, *alternative_maps)
+        try:
+            yield self
+        finally:
+            self.alternative_map = saved
+
     def get_material_key(self, pn):
         """获取物料主料号（处理替代料关系）"""
         for main_pn, alt_pns in self.alternative_map.items():
@@ -483,6 +2064,279 @@ class BOMComparer:
                 return main_pn
         return pn
 
+    def explode_bom(self, bom_df, pool):
+        """将BOM展开为以位号为粒度的查找表
+
+        Args:
+            bom_df: load_bom返回的标准化DataFrame
+            pool: 料号驻留池，参与比较的BOM必须共享同一个池
+
+        Returns:
+            ExplodedBOM: 展开后的BOM
+        """
+        exploded = ExplodedBOM(pool)
+        exploded.row_count = len(bom_df)
+        if len(bom_df) == 0:
+            return exploded
+
+        # 料号按不同值编码，每个不同的料号只转换和驻留一次
+        pn_texts, pn_codes = factorize_text(bom_df['P/N'])
+        pn_ids = np.asarray(pool.intern_many(pn_texts))
+        row_pn_ids = pn_ids[pn_codes].tolist()
+
+        # 存储MPN和描述信息（同一料号以最后一行为准）
+        for field, target in (('MPN', exploded.mpn_map), ('Description', exploded.desc_map)):
+            if field in bom_df.columns:
+                texts, codes = factorize_text(bom_df[field])
+                row_texts = np.asarray(texts, dtype=object)[codes]
+            else:
+                row_texts = [''] * len(bom_df)
+            target.update(zip(row_pn_ids, row_texts))
+
+        # 每个料号都有位号列表（即使该行没有有效位号）
+        exploded.pn_to_refs = {pn_id: [] for pn_id in row_pn_ids}
+
+        # 分割位号（C1,C2,C3 或 C1 C2 C3）
+        ref_table = explode_references(bom_df['Reference'])
+
+        # 构建映射：位号到料号（重复位号以最后一行为准），料号到位号列表
+        refs = ref_table['ref'].tolist()
+        pns = pn_ids[pn_codes[ref_table['row'].to_numpy()]].tolist()
+        exploded.ref_to_pn = dict(zip(refs, pns))
+        pn_to_refs = exploded.pn_to_refs
+        for ref, pn_id in zip(refs, pns):
+            pn_to_refs[pn_id].append(ref)
+
+        # 记录出现在多行中的位号
+        if len(exploded.ref_to_pn) != len(refs):
+            exploded.duplicate_refs = set(ref_table.loc[ref_table['ref'].duplicated(keep=False), 'ref'])
+
+        # 无位号行按料号汇总用量（空料号的编码-1对应文本列表最后一项）
+        row_quantities = unreferenced_quantities(bom_df, ref_table['row'].to_numpy())
+        if row_quantities.any():
+            codes = np.where(pn_codes < 0, len(pn_texts) - 1, pn_codes)
+            totals = np.bincount(codes, weights=row_quantities, minlength=len(pn_texts))
+            qty_map = exploded.qty_map
+            for code in np.flatnonzero(totals).tolist():
+                pn_id = int(pn_ids[code])
+                qty_map[pn_id] = qty_map.get(pn_id, 0) + totals[code]
+            for pn_id, total in qty_map.items():
+                qty_map[pn_id] = normalize_quantity(total)
+
+        return exploded
+
+    def estimate_compare_memory(self, bom_a_df, bom_b_df):
+        """估算在内存中对比两个BOM所需的字节数
+
+        包括两个DataFrame本身和展开后的查找表，位号数按分隔符个数估算。
+        """
+        total = 0
+        for bom_df in (bom_a_df, bom_b_df):
+            total += int(bom_df.memory_usage(deep=True).sum())
+            total += estimate_ref_count(bom_df) * EXPLODED_BYTES_PER_REF
+        return total
+
+    def exceeds_memory_budget(self, bom_a_df, bom_b_df):
+        """判断对比是否会超出内存预算（memory_budget_mb为0时不限制）"""
+        if not self.memory_budget_mb:
+            return False
+        estimate = self.estimate_compare_memory(bom_a_df, bom_b_df)
+        budget = self.memory_budget_mb * 1024 * 1024
+        if estimate > budget:
+            logger.info("预计内存占用 %.1fMB 超出预算 %sMB，使用磁盘模式",
+                        estimate / (1024 * 1024), self.memory_budget_mb)
+            return True
+        return False
+
+    def spill_compare(self, bom_a_df, bom_b_df):
+        """磁盘模式对比：展开表写入临时SQLite数据库，以分块连接查询计算差异
+
+        Returns:
+            tuple: (ExplodedBOM A, ExplodedBOM B, 差异结果)，可直接用于render_report
+        """
+        timer = self.stage_timer
+        store = SpillStore()
+        try:
+            with timer.span('explosion'):
+                store.add_bom('A', bom_a_df)
+                store.add_bom('B', bom_b_df)
+            with timer.span('diffing'):
+                return store.diff(PartNumberPool(), self.build_alternative_index())
+        finally:
+            store.close()
+
+    def build_alternative_index(self):
+        """构建料号到替代料组的索引，用于快速判断两个料号是否互为替代料"""
+        alt_index = {}
+        for group_id, (main_pn, alt_pns) in enumerate(self.alternative_map.items()):
+            for pn in [main_pn] + list(alt_pns):
+                alt_index.setdefault(pn, set()).add(group_id)
+        return alt_index
+
+    def is_alternative_pair(self, alt_index, pn_a, pn_b, pool):
+        """两个料号id是否互为替代料（属于同一替代料组）"""
+        groups_a = alt_index.get(pool.names[pn_a])
+        groups_b = alt_index.get(pool.names[pn_b])
+        return bool(groups_a and groups_b and not groups_a.isdisjoint(groups_b))
+
+    def diff_exploded(self, exploded_a, exploded_b):
+        """比较两个展开后的BOM
+
+        Args:
+            exploded_a: 基准BOM(A)
+            exploded_b: 对比BOM(B)
+
+        Returns:
+            dict: 差异结果，料号均为驻留池中的id
+                pn_added/pn_removed/pn_common: 新增/移除/共有料号集合
+                ref_added/ref_removed: 新增/移除位号集合
+                ref_changed: {位号: (A料号, B料号, 是否替代料)}
+        """
+        if exploded_a.pool is not exploded_b.pool:
+            raise ValueError("比较的两个BOM必须使用同一个料号驻留池")
+
+        # 1. 物料变更分析
+        pns_a = exploded_a.pn_to_refs.keys()
+        pns_b = exploded_b.pn_to_refs.keys()
+
+        # 2. 位号变更分析
+        ref_to_pn_a = exploded_a.ref_to_pn
+        ref_to_pn_b = exploded_b.ref_to_pn
+
+        alt_index = self.build_alternative_index()
+        ref_changed = {}
+        for ref in ref_to_pn_a.keys() & ref_to_pn_b.keys():
+            pn_a = ref_to_pn_a[ref]
+            pn_b = ref_to_pn_b[ref]
+            if pn_a != pn_b:
+                ref_changed[ref] = (pn_a, pn_b, self.is_alternative_pair(alt_index, pn_a, pn_b, exploded_a.pool))
+
+        return {
+            'pn_added': set(pns_b - pns_a),
+            'pn_removed': set(pns_a - pns_b),
+            'pn_common': set(pns_a & pns_b),
+            'ref_added': set(ref_to_pn_b.keys() - ref_to_pn_a.keys()),
+            'ref_removed': set(ref_to_pn_a.keys() - ref_to_pn_b.keys()),
+            'ref_changed': ref_changed
+        }
+
+    def get_bom_levels(self, bom_df):
+        """获取多层级BOM每行的层级
+
+        层级来自映射到Level字段的列：数字或点缩进写法按层级号解析，
+        文本列（如缩进导出的料号列）按前导空白宽度推断。
+
+        Returns:
+            list: 每行的层级，单层BOM返回None
+        """
+        if 'Level' not in bom_df.columns or len(bom_df) == 0:
+            return None
+        levels = parse_bom_levels(bom_df['Level'])
+        if levels is None:
+            levels = indent_levels(bom_df['Level'])
+        if levels is None or len(set(levels)) < 2:
+            return None
+        if not is_level_sequence(levels):
+            logger.info("层级列的值不是有效的层级序列，按单层BOM处理")
+            return None
+        return levels
+
+    def diff_hierarchy(self, tree_a, tree_b):
+        """逐层比较两个多层级BOM
+
+        从虚拟根节点开始，只比较子树哈希不同的装配的直接子项，并向下递归到
+        料号相同但哈希不同的子装配；哈希相同的子装配整棵跳过。
+
+        Returns:
+            dict: 比较结果
+                assemblies: 直接子项有差异的装配 [(路径, ExplodedBOM A, ExplodedBOM B, 差异结果)]
+                added/removed: 新增/移除的子装配 [(路径, 行数)]
+                skipped: 内容相同而跳过的子装配个数
+                skipped_rows: 跳过的子装配包含的行数
+        """
+        pool = PartNumberPool()
+        result = {'assemblies': [], 'added': [], 'removed': [], 'skipped': 0, 'skipped_rows': 0}
+        if tree_a.root_hash == tree_b.root_hash:
+            result['skipped'] = len(tree_a.assemblies())
+            result['skipped_rows'] = len(tree_a.levels)
+            return result
+
+        pending = [(BOMTree.ROOT, BOMTree.ROOT)]
+        while pending:
+            row_a, row_b = pending.pop()
+            children_a = tree_a.children.get(row_a, [])
+            children_b = tree_b.children.get(row_b, [])
+
+            # 只有子装配内部有变化时，直接子项可能完全相同
+            own_a = sorted(tree_a.hashes[child] for child in children_a if not tree_a.is_assembly(child))
+            own_b = sorted(tree_b.hashes[child] for child in children_b if not tree_b.is_assembly(child))
+            assemblies_a = tree_a.child_assemblies(row_a)
+            assemblies_b = tree_b.child_assemblies(row_b)
+            if own_a != own_b or assemblies_a.keys() != assemblies_b.keys():
+                exploded_a = self.explode_bom(tree_a.bom_df.iloc[children_a], pool)
+                exploded_b = self.explode_bom(tree_b.bom_df.iloc[children_b], pool)
+                diff = self.diff_exploded(exploded_a, exploded_b)
+                result['assemblies'].append((tree_a.path(row_a), exploded_a, exploded_b, diff))
+
+            for key, child_a in assemblies_a.items():
+                child_b = assemblies_b.get(key)
+                if child_b is None:
+                    result['removed'].append((tree_a.path(child_a), tree_a.subtree_size(child_a)))
+                elif tree_a.hashes[child_a] == tree_b.hashes[child_b]:
+                    result['skipped'] += 1
+                    result['skipped_rows'] += tree_a.subtree_size(child_a)
+                else:
+                    pending.append((child_a, child_b))
+            for key, child_b in assemblies_b.items():
+                if key not in assemblies_a:
+                    result['added'].append((tree_b.path(child_b), tree_b.subtree_size(child_b)))
+
+        # 按路径顺序输出（顶层在前）
+        result['assemblies'].sort(key=lambda item: (item[0] != "顶层", item[0]))
+        return result
+
+    def render_hierarchy_report(self, tree_a, tree_b, hierarchy):
+        """生成多层级BOM对比报告文本行，每个有差异的装配使用render_report生成独立的小节"""
+        result = ["=== 多层级BOM对比报告 ===", ""]
+        result.append(f"基准BOM(A): {len(tree_a.levels)}行, {len(tree_a.assemblies())}个子装配")
+        result.append(f"对比BOM(B): {len(tree_b.levels)}行, {len(tree_b.assemblies())}个子装配")
+        result.append(f"内容相同的子装配: {hierarchy['skipped']}个（{hierarchy['skipped_rows']}行，已跳过）")
+        result.append(f"有差异的装配: {len(hierarchy['assemblies'])}个")
+        result.append("")
+
+        for title, items in (("新增子装配", hierarchy['added']), ("移除子装配", hierarchy['removed'])):
+            if items:
+                result.append(f"【{title}】")
+                for idx, (path, size) in enumerate(sorted(items), 1):
+                    result.append(f"{idx}. {path} ({size}行)")
+                result.append("")
+
+        if not hierarchy['assemblies'] and not hierarchy['added'] and not hierarchy['removed']:
+            result.append("两个BOM的所有层级完全相同")
+
+        for path, exploded_a, exploded_b, diff in hierarchy['assemblies']:
+            result.append(f"====== 装配: {path} ======")
+            result.extend(self.render_report(exploded_a, exploded_b, diff))
+            result.append("")
+
+        return result
+
+    def diff_hierarchy_frames(self, bom_a_df, bom_b_df, levels_a, levels_b):
+        """多层级BOM对比
+
+        Returns:
+            dict: 对比结果，kind为'hierarchy'，a/b为装配树，diff为diff_hierarchy的结果
+        """
+        timer = self.stage_timer
+        with timer.span('hierarchy'):
+            tree_a = BOMTree(bom_a_df, levels_a)
+            tree_b = BOMTree(bom_b_df, levels_b)
+        with timer.span('diffing'):
+            hierarchy = self.diff_hierarchy(tree_a, tree_b)
+        logger.info("多层级对比: 跳过%s个相同子装配, %s个装配有差异",
+                    hierarchy['skipped'], len(hierarchy['assemblies']))
+        return {'kind': 'hierarchy', 'a': tree_a, 'b': tree_b, 'diff': hierarchy}
+
     def compare(self, bom_a, bom_b, is_dataframe=False):
         """比较两个BOM文件
 
@@ -492,22 +2346,82 @@ class BOMComparer:
             is_dataframe: 如果为True，则bom_a和bom_b是DataFrame，否则是文件路径
 
         Returns:
-            dict: 包含比较结果的字典
+            CompareReport: 对比报告文本，timings属性为各阶段耗时（秒），
+                开启性能分析时profile_path属性为分析文件路径
+        """
+        if self.profile_mode:
+            return self.profile_compare(bom_a, bom_b, is_dataframe)
+        return self.run_compare(bom_a, bom_b, is_dataframe)
+
+    def profile_compare(self, bom_a, bom_b, is_dataframe=False):
+        """在性能分析模式下执行一次对比，并将分析结果写入文件
+
+        cprofile模式输出.prof文件（可用snakeviz等工具查看）和按累计耗时排序的文本摘要，
+        tracemalloc模式输出峰值内存和内存分配最多的代码行。
         """
+        if self.profile_mode not in ('cprofile', 'tracemalloc'):
+            raise ValueError(f"未知的性能分析模式: {self.profile_mode}")
+
+        profile_dir = self.profile_dir or os.path.join(get_app_dir(), "profiles")
+        os.makedirs(profile_dir, exist_ok=True)
+        base_path = os.path.join(profile_dir, f"compare_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}")
+
+        if self.profile_mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                report = self.run_compare(bom_a, bom_b, is_dataframe)
+            finally:
+                profiler.disable()
+
+            profile_path = base_path + ".prof"
+            profiler.dump_stats(profile_path)
+            with open(base_path + ".txt", "w", encoding="utf-8") as f:
+                pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(50)
+        else:
+            was_tracing = tracemalloc.is_tracing()
+            if not was_tracing:
+                tracemalloc.start(10)
+            try:
+                if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+                    tracemalloc.reset_peak()
+                report = self.run_compare(bom_a, bom_b, is_dataframe)
+                _, peak = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot()
+            finally:
+                if not was_tracing:
+                    tracemalloc.stop()
+
+            profile_path = base_path + "_memory.txt"
+            with open(profile_path, "w", encoding="utf-8") as f:
+                f.write(f"峰值内存: {peak / (1024 * 1024):.2f} MB\n\n")
+                for stat in snapshot.statistics('lineno')[:50]:
+                    f.write(f"{stat}\n")
+
+        logger.info("性能分析结果已保存到: %s", profile_path)
+        if isinstance(report, CompareReport):
+            report.profile_path = profile_path
+        return report
+
+    def run_compare(self, bom_a, bom_b, is_dataframe=False):
+        """执行对比并记录各阶段耗时，参数与compare相同"""
+        timer = self.stage_timer
+        timer.reset()
         try:
             # 记录开始时间
             self.start_time = datetime.now()
-            print(f"比较开始时间: {self.start_time}")
+            logger.info("比较开始时间: %s", self.start_time)
 
             # 加载或使用已有的DataFrame
             self.update_progress(5, "准备数据...")
 
             if not is_dataframe:
                 # 从文件加载
-                bom_a_df = self.load_bom(bom_a)
+                # 对比只需要标准字段，直接使用列投影加载
+                bom_a_df = self.load_bom(bom_a, projection=True)
                 self.update_progress(20, "基准BOM加载完成")
 
-                bom_b_df = self.load_bom(bom_b)
+                bom_b_df = self.load_bom(bom_b, projection=True)
                 self.update_progress(40, "对比BOM加载完成")
             else:
                 # 直接使用提供的DataFrame
@@ -515,635 +2429,1018 @@ class BOMComparer:
                 bom_b_df = bom_b
                 self.update_progress(40, "使用已加载的数据")
 
-            print(f"BOM A 数据行数: {len(bom_a_df)}, 列: {list(bom_a_df.columns)}")
-            print(f"BOM B 数据行数: {len(bom_b_df)}, 列: {list(bom_b_df.columns)}")
+            logger.debug("BOM A 数据行数: %s, 列: %s", len(bom_a_df), list(bom_a_df.columns))
+            logger.debug("BOM B 数据行数: %s, 列: %s", len(bom_b_df), list(bom_b_df.columns))
 
             # 提取A和B中的物料编号和位号信息
             self.update_progress(50, "分析BOM数据...")
 
-            # 处理位号信息 - 分割位号字符串，创建位号到物料的映射
-            ref_to_pn_a = {}
-            pn_to_refs_a = {}
-            mpn_map_a = {}  # 存储物料号到MPN的映射
-            desc_map_a = {}  # 存储物料号到描述的映射
-
-            for _, row in bom_a_df.iterrows():
-                pn = str(row['P/N']).strip()
-                refs = str(row['Reference']).strip()
-                mpn = str(row.get('MPN', '')).strip()
-                desc = str(row.get('Description', '')).strip()
-
-                # 存储MPN和描述信息
-                mpn_map_a[pn] = mpn
-                desc_map_a[pn] = desc
-
-                # 分割位号（C1,C2,C3 或 C1 C2 C3）
-                if ',' in refs:
-                    ref_list = [r.strip() for r in refs.split(',')]
+            # 输入未变化时直接使用缓存的差异结果，只按当前的显示设置重新生成报告
+            with timer.span('fingerprint'):
+                # 与上一次平铺对比相同的DataFrame对象不再重新计算哈希（修改BOM时应替换为新的DataFrame）
+                previous = self.last_flat
+                same_a = previous is not None and previous['bom_a'] is bom_a_df
+                same_b = previous is not None and previous['bom_b'] is bom_b_df
+                hashes_b = previous['hashes_b'] if same_b else row_hashes(bom_b_df)
+                cache_key = self.get_compare_key(bom_a_df, bom_b_df, hashes_b,
+                                                 fingerprint_a=previous['key'][0] if same_a else None)
+            compare_result = self.compare_cache.get(cache_key)
+
+            if compare_result is None:
+                # 两个BOM都是多层级时按装配逐层对比，否则按位号平铺对比
+                levels_a = self.get_bom_levels(bom_a_df)
+                levels_b = self.get_bom_levels(bom_b_df)
+                if levels_a is not None and levels_b is not None:
+                    self.update_progress(60, "分析多层级BOM...")
+                    compare_result = self.diff_hierarchy_frames(bom_a_df, bom_b_df, levels_a, levels_b)
                 else:
-                    ref_list = [r.strip() for r in refs.split()]
+                    # 只有B修改时在上一次结果的基础上增量更新
+                    with timer.span('incremental'):
+                        compare_result = self.update_flat_diff(bom_b_df, hashes_b, cache_key)
+                    if compare_result is None:
+                        compare_result = self.diff_flat(bom_a_df, bom_b_df)
+                self.compare_cache.put(cache_key, compare_result)
+            else:
+                logger.info("BOM和替代料关系未变化，使用缓存的差异结果")
+                self.update_progress(60, "使用缓存的差异结果...")
 
-                # 构建映射
-                for ref in ref_list:
-                    if ref and ref.lower() != 'nan':
-                        ref_to_pn_a[ref] = pn
+            # 记录内存模式的平铺对比结果，供B再次修改后增量更新
+            if compare_result['kind'] == 'flat' and compare_result['b'].ref_total is None:
+                self.last_flat = {'key': cache_key, 'bom_a': bom_a_df, 'bom_b': bom_b_df, 'hashes_b': hashes_b,
+                                  'result': compare_result}
+            else:
+                self.last_flat = None
 
-                # 构建物料到位号的映射
-                if pn not in pn_to_refs_a:
-                    pn_to_refs_a[pn] = []
-                pn_to_refs_a[pn].extend([r for r in ref_list if r and r.lower() != 'nan'])
-
-            # 同样处理BOM B
-            ref_to_pn_b = {}
-            pn_to_refs_b = {}
-            mpn_map_b = {}
-            desc_map_b = {}
-
-            for _, row in bom_b_df.iterrows():
-                pn = str(row['P/N']).strip()
-                refs = str(row['Reference']).strip()
-                mpn = str(row.get('MPN', '')).strip()
-                desc = str(row.get('Description', '')).strip()
-
-                mpn_map_b[pn] = mpn
-                desc_map_b[pn] = desc
-
-                if ',' in refs:
-                    ref_list = [r.strip() for r in refs.split(',')]
-                else:
-                    ref_list = [r.strip() for r in refs.split()]
+            # 生成报告
+            self.update_progress(80, "生成报告...")
+            with timer.span('rendering'):
+                result = self.render_compare_result(compare_result)
+            self.last_result = compare_result
 
-                for ref in ref_list:
-                    if ref and ref.lower() != 'nan':
-                        ref_to_pn_b[ref] = pn
+            # 记录结束时间
+            self.end_time = datetime.now()
+            processing_time = self.end_time - self.start_time
 
-                if pn not in pn_to_refs_b:
-                    pn_to_refs_b[pn] = []
-                pn_to_refs_b[pn].extend([r for r in ref_list if r and r.lower() != 'nan'])
+            # 添加处理时间信息到报告开头
+            time_info = [
+                "=== 处理时间统计 ===",
+                f"开始时间: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}",
+                f"结束时间: {self.end_time.strftime('%Y-%m-%d %H:%M:%S')}",
+                f"总耗时: {processing_time.total_seconds():.2f}秒\n"
+            ]
 
-            print(f"BOM A 位号数: {len(ref_to_pn_a)}, 物料数: {len(pn_to_refs_a)}")
-            print(f"BOM B 位号数: {len(ref_to_pn_b)}, 物料数: {len(pn_to_refs_b)}")
+            result = time_info + result
 
-            # 分析结果
-            self.update_progress(60, "分析差异...")
+            timer.add('total', processing_time.total_seconds())
+            self.last_timings = timer.snapshot()
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("各阶段耗时: %s", ", ".join(f"{stage}={seconds:.3f}s" for stage, seconds in self.last_timings.items()))
 
-            # 1. 物料变更分析
-            pn_added = []    # 在B中新增的物料
-            pn_removed = []  # 从A中移除的物料
-            pn_common = []   # A和B中共有的物料
+            self.update_progress(100, "处理完成")
+            return CompareReport("\n".join(result), self.last_timings)
 
-            for pn in pn_to_refs_a:
-                if pn not in pn_to_refs_b:
-                    pn_removed.append(pn)
-                else:
-                    pn_common.append(pn)
+        except Exception as e:
+            trace = traceback.format_exc()
+            return f"生成对比报告时出错:\n{str(e)}\n\n详细错误信息:\n{trace}"
 
-            for pn in pn_to_refs_b:
-                if pn not in pn_to_refs_a:
-                    pn_added.append(pn)
-
-            # 2. 位号变更分析
-            ref_added = []   # 在B中新增的位号
-            ref_removed = [] # 从A中移除的位号
-            ref_changed = [] # 物料变更的位号
-
-            for ref in ref_to_pn_a:
-                if ref not in ref_to_pn_b:
-                    ref_removed.append(ref)
-                elif ref_to_pn_a[ref] != ref_to_pn_b[ref]:
-                    # 检查是否是替代料
-                    pn_a = ref_to_pn_a[ref]
-                    pn_b = ref_to_pn_b[ref]
-
-                    is_alternative = False
-                    # 检查替代料关系
-                    for main_pn, alt_pns in self.alternative_map.items():
-                        if (pn_a == main_pn and pn_b in alt_pns) or (pn_b == main_pn and pn_a in alt_pns):
-                            is_alternative = True
-                            break
-                        # 检查是否都是同一主料的替代料
-                        if pn_a in alt_pns and pn_b in alt_pns:
-                            is_alternative = True
-                            break
+    def diff_flat(self, bom_a_df, bom_b_df):
+        """按位号平铺对比两个标准化的BOM
 
-                    ref_changed.append((ref, pn_a, pn_b, is_alternative))
+        Returns:
+            dict: 对比结果，kind为'flat'，a/b为展开后的BOM，diff为差异结果
+        """
+        timer = self.stage_timer
 
-            for ref in ref_to_pn_b:
-                if ref not in ref_to_pn_a:
-                    ref_added.append(ref)
+        # 估算内存占用，超出预算时使用磁盘模式
+        use_spill = self.exceeds_memory_budget(bom_a_df, bom_b_df)
 
-            print(f"新增位号: {len(ref_added)}个, 示例: {ref_added[:5] if ref_added else '无'}")
-            print(f"移除位号: {len(ref_removed)}个, 示例: {ref_removed[:5] if ref_removed else '无'}")
-            print(f"变更位号: {len(ref_changed)}个, 示例: {ref_changed[:5] if ref_changed else '无'}")
+        if not use_spill:
+            try:
+                # 两个BOM共享同一个料号驻留池，比较时只比较整数id
+                pool = PartNumberPool()
+                with timer.span('explosion'):
+                    exploded_a = self.explode_bom(bom_a_df, pool)
+                    exploded_b = self.explode_bom(bom_b_df, pool)
 
-            # 3. 共有物料位号数量变化分析
-            pn_quantity_changes = []
+                # 分析结果
+                self.update_progress(60, "分析差异...")
+                with timer.span('diffing'):
+                    diff = self.diff_exploded(exploded_a, exploded_b)
+            except MemoryError:
+                logger.warning("内存不足，切换到磁盘模式重新对比")
+                exploded_a = exploded_b = pool = None
+                use_spill = True
 
-            # 物料数量变更包含三种情况：
-            # 1. 常规数量变更：物料在A和B中都存在，但数量不同
-            # 2. 物料完全移除：物料在A中存在，但在B中不存在（数量从N变为0）
-            # 3. 物料完全新增：物料在A中不存在，但在B中存在（数量从0变为N）
+        if use_spill:
+            self.update_progress(60, "分析差异（磁盘模式）...")
+            exploded_a, exploded_b, diff = self.spill_compare(bom_a_df, bom_b_df)
 
-            # 1. 处理常规数量变更
-            for pn in pn_common:
-                count_a = len(pn_to_refs_a[pn])
-                count_b = len(pn_to_refs_b[pn])
+        logger.info("BOM A 位号数: %s, 物料数: %s", exploded_a.ref_count(), exploded_a.part_count())
+        logger.info("BOM B 位号数: %s, 物料数: %s", exploded_b.ref_count(), exploded_b.part_count())
 
-                if count_a != count_b:
-                    pn_quantity_changes.append((pn, count_a, count_b))
+        logger.info("新增位号: %s个", len(diff['ref_added']))
+        logger.info("移除位号: %s个", len(diff['ref_removed']))
+        logger.info("变更位号: %s个", len(diff['ref_changed']))
 
-            # 2. 处理物料完全移除的情况
-            for pn in pn_removed:
-                count_a = len(pn_to_refs_a[pn])
-                count_b = 0  # 在B中不存在，数量为0
-                pn_quantity_changes.append((pn, count_a, count_b))
+        return {'kind': 'flat', 'a': exploded_a, 'b': exploded_b, 'diff': diff}
 
-            # 3. 处理物料完全新增的情况
-            for pn in pn_added:
-                count_a = 0  # 在A中不存在，数量为0
-                count_b = len(pn_to_refs_b[pn])
-                pn_quantity_changes.append((pn, count_a, count_b))
+    def update_flat_diff(self, bom_b_df, hashes_b, cache_key):
+        """A和替代料关系未变化、B只修改了少量行时，增量更新上一次的平铺对比结果
 
-            # 生成报告
-            self.update_progress(80, "生成报告...")
+        按行哈希找出新旧B之间变化的行，只重新展开这些行涉及的料号，
+        并只对涉及的料号和位号重新判断新增、移除和变更。上一次的结果不会被修改。
 
-            result = []
+        Args:
+            bom_b_df: 修改后的B
+            hashes_b: bom_b_df的行哈希
+            cache_key: 本次对比的get_compare_key结果
 
-            # 报告标题
-            result.append("=== BOM对比报告 ===")
-            result.append("")
+        Returns:
+            dict: 与diff_flat格式相同的对比结果；无上一次结果、变化行过多或涉及重复位号时返回None
+        """
+        previous = self.last_flat
+        if previous is None or previous['key'][0] != cache_key[0] or previous['key'][2] != cache_key[2]:
+            return None
+        old_df = previous['bom_b']
+        if list(old_df.columns) != list(bom_b_df.columns):
+            return None
 
-            # 基本信息
-            result.append("1. 基本信息")
-            result.append(f"基准BOM(A)物料数: {len(pn_to_refs_a)}")
-            result.append(f"基准BOM(A)位号数: {len(ref_to_pn_a)}")
-            result.append(f"对比BOM(B)物料数: {len(pn_to_refs_b)}")
-            result.append(f"对比BOM(B)位号数: {len(ref_to_pn_b)}")
-            result.append("")
+        removed_rows, added_rows = changed_rows(previous['hashes_b'], hashes_b)
+        if len(removed_rows) + len(added_rows) > max(len(old_df), len(bom_b_df)) * INCREMENTAL_MAX_CHANGED_RATIO:
+            return None
 
-            # 物料变更汇总
-            result.append("2. 物料变更汇总")
-            result.append(f"新增物料: {len(pn_added)}个")
-            result.append(f"移除物料: {len(pn_removed)}个")
-            result.append(f"变更物料: {len(ref_changed)}个")
-            result.append("")
+        exploded_a = previous['result']['a']
+        old_b = previous['result']['b']
+        old_diff = previous['result']['diff']
+        pool = exploded_a.pool
 
-            # 位号变更汇总
-            result.append("3. 位号变更汇总")
-            result.append(f"新增位号: {len(ref_added)}个")
-            result.append(f"移除位号: {len(ref_removed)}个")
-            result.append(f"变更位号: {len(ref_changed)}个")
-            result.append("")
+        removed = old_df.iloc[removed_rows]
+        added = bom_b_df.iloc[added_rows]
+        removed_refs = set(explode_references(removed['Reference'])['ref'])
+        added_refs = explode_references(added['Reference'])['ref'].tolist()
 
-            # 查找同一位号物料替换的情况
-            replaced_refs = set()
+        # 重复位号以最后一行为准，涉及重复位号（原有的或修改后新出现的）时完整对比
+        if not old_b.duplicate_refs.isdisjoint(removed_refs) or not old_b.duplicate_refs.isdisjoint(added_refs) or \
+           len(set(added_refs)) != len(added_refs) or \
+           any(ref in old_b.ref_to_pn and ref not in removed_refs for ref in added_refs):
+            return None
 
-            # 查找同一位号上的替换情况：移除了一个物料并新增了另一个物料
-            for ref, pn_a, pn_b, is_alt in ref_changed:
-                replaced_refs.add(ref)
+        # 变化的行涉及的料号：重新展开新B中这些料号的所有行
+        affected_pns = set()
+        for rows_df in (removed, added):
+            texts, codes = factorize_text(rows_df['P/N'])
+            affected_pns.update(np.asarray(texts, dtype=object)[codes].tolist())
+        texts, codes = factorize_text(bom_b_df['P/N'])
+        is_affected = np.array([text in affected_pns for text in texts])
+        partial = self.explode_bom(bom_b_df.iloc[np.flatnonzero(is_affected[codes])], pool)
+        affected_ids = {pool.ids[pn] for pn in affected_pns if pn in pool.ids}
+
+        exploded_b = ExplodedBOM(pool)
+        exploded_b.row_count = len(bom_b_df)
+        exploded_b.duplicate_refs = set(old_b.duplicate_refs)
+        for attr in ('pn_to_refs', 'mpn_map', 'desc_map', 'qty_map'):
+            mapping = dict(getattr(old_b, attr))
+            for pn_id in affected_ids:
+                mapping.pop(pn_id, None)
+            mapping.update(getattr(partial, attr))
+            setattr(exploded_b, attr, mapping)
+        exploded_b.ref_to_pn = {ref: pn_id for ref, pn_id in old_b.ref_to_pn.items() if ref not in removed_refs}
+        for ref in added_refs:
+            exploded_b.ref_to_pn[ref] = partial.ref_to_pn[ref]
+
+        # 只重新判断涉及的料号和位号
+        diff = {key: set(old_diff[key]) for key in ('pn_added', 'pn_removed', 'pn_common', 'ref_added', 'ref_removed')}
+        ref_changed = dict(old_diff['ref_changed'])
+        diff['ref_changed'] = ref_changed
+        for pn_id in affected_ids:
+            for key in ('pn_added', 'pn_removed', 'pn_common'):
+                diff[key].discard(pn_id)
+            in_a = pn_id in exploded_a.pn_to_refs
+            in_b = pn_id in exploded_b.pn_to_refs
+            if in_a and in_b:
+                diff['pn_common'].add(pn_id)
+            elif in_b:
+                diff['pn_added'].add(pn_id)
+            elif in_a:
+                diff['pn_removed'].add(pn_id)
+
+        alt_index = self.build_alternative_index()
+        for ref in removed_refs.union(added_refs):
+            diff['ref_added'].discard(ref)
+            diff['ref_removed'].discard(ref)
+            ref_changed.pop(ref, None)
+            pn_a = exploded_a.ref_to_pn.get(ref)
+            pn_b = exploded_b.ref_to_pn.get(ref)
+            if pn_a is None:
+                if pn_b is not None:
+                    diff['ref_added'].add(ref)
+            elif pn_b is None:
+                diff['ref_removed'].add(ref)
+            elif pn_a != pn_b:
+                ref_changed[ref] = (pn_a, pn_b, self.is_alternative_pair(alt_index, pn_a, pn_b, pool))
 
-            # 位号变动详情
-            result.append("4. 位号变动")
+        logger.info("增量对比: B中%s行移除, %s行新增, 涉及%s个料号",
+                    len(removed_rows), len(added_rows), len(affected_ids))
+        return {'kind': 'flat', 'a': exploded_a, 'b': exploded_b, 'diff': diff}
 
-            # 位号变动计数器（统一所有类型的位号变动）
-            position_change_counter = 1
+    def get_compare_key(self, bom_a_df, bom_b_df, hashes_b=None, fingerprint_a=None):
+        """对比结果缓存的键：两个BOM的内容指纹和替代料关系（只包含影响差异计算的输入）
 
-            # 初始化变更类型字典，确保它在任何情况下都存在
-            changes_by_type = {
-                "[常规替换]": [],
-                "[新物料引入]": [],
-                "[物料整合]": []
-            }
+        fingerprint_a为已知的A的指纹（A与上一次对比相同时），为None时重新计算。
+        """
+        alternatives = sorted((str(pn), [str(alt) for alt in alts]) for pn, alts in self.alternative_map.items())
+        alternatives_digest = hashlib.sha1(json.dumps(alternatives, ensure_ascii=False).encode('utf-8')).hexdigest()
+        return (fingerprint_a or frame_fingerprint(bom_a_df), frame_fingerprint(bom_b_df, hashes_b),
+                alternatives_digest)
 
-            # 1. 物料变更部分（原4.物料变更详情）
-            if ref_changed:
-                # 按原物料号分组
-                changes_by_pn = {}
-                for ref, pn_a, pn_b, is_alt in ref_changed:
-                    key = (pn_a, pn_b, is_alt)
-                    if key not in changes_by_pn:
-                        changes_by_pn[key] = []
-                    changes_by_pn[key].append(ref)
-
-                # 分类变更类型
-                changes_by_type = {
-                    "[常规替换]": [],
-                    "[新物料引入]": [],
-                    "[物料整合]": []
-                }
+    def render_compare_result(self, compare_result):
+        """根据diff_flat或diff_hierarchy_frames的结果生成报告文本行（使用当前的报告显示设置）"""
+        if compare_result['kind'] == 'hierarchy':
+            return self.render_hierarchy_report(compare_result['a'], compare_result['b'], compare_result['diff'])
+        return self.render_report(compare_result['a'], compare_result['b'], compare_result['diff'])
 
-                # 输出分组信息
-                for (pn_a, pn_b, is_alt), refs in sorted(changes_by_pn.items()):
-                    mpn_a_info = f" (MPN: {mpn_map_a.get(pn_a, '')})" if self.show_mpn_in_report else ""
-                    mpn_b_info = f" (MPN: {mpn_map_b.get(pn_b, '')})" if self.show_mpn_in_report else ""
+    def render_report(self, exploded_a, exploded_b, diff):
+        """根据差异结果生成报告文本
 
-                    alt_info = " [替代料]" if is_alt else ""
+        Args:
+            exploded_a: 展开后的基准BOM(A)
+            exploded_b: 展开后的对比BOM(B)
+            diff: diff_exploded返回的差异结果
 
-                    # 判断变更类型
-                    change_type = ""
+        Returns:
+            list: 报告文本行
+        """
+        names = exploded_a.pool.names
+        ref_to_pn_a = exploded_a.ref_to_pn
+        ref_to_pn_b = exploded_b.ref_to_pn
+        pn_to_refs_a = exploded_a.pn_to_refs
+        pn_to_refs_b = exploded_b.pn_to_refs
+        mpn_map_a = exploded_a.mpn_map
+        mpn_map_b = exploded_b.mpn_map
+
+        pn_added = diff['pn_added']
+        pn_removed = diff['pn_removed']
+        ref_added = diff['ref_added']
+        ref_removed = diff['ref_removed']
+        ref_changed = diff['ref_changed']
+
+        def format_alternatives(pn):
+            """查找料号的替代料（料号为主料时列出其替代料，为替代料时列出主料和其他替代料）"""
+            alt_pns = []
+            for main_pn, alt_pn_list in self.alternative_map.items():
+                if pn == main_pn:
+                    # 当前料号是主料号，查找其所有替代料
+                    alt_pns = alt_pn_list
+                    break
+                elif pn in alt_pn_list:
+                    # 当前料号是替代料，找到主料号和其他替代料
+                    alt_pns = [main_pn] + [p for p in alt_pn_list if p != pn]
+                    break
 
-                    # 检查物料A是否在B中完全被移除（没有出现在任何其他位号）
-                    pn_a_completely_removed = pn_a not in pn_to_refs_b
+            # 如果有替代料，添加替代料信息
+            if alt_pns:
+                return " [替代料: " + ", ".join(alt_pns) + "]"
+            return ""
 
-                    # 检查物料B是否是完全新增的（在A中不存在）
-                    pn_b_completely_new = pn_b not in pn_to_refs_a
+        # 3. 共有物料位号数量变化分析
+        pn_quantity_changes = []
 
-                    if not pn_a_completely_removed and not pn_b_completely_new:
-                        # 情况1: 两个物料在BOM中都保留 - 只是位号上的调整
-                        change_type = "[常规替换]"
-                    elif pn_a_completely_removed and not pn_b_completely_new:
-                        # 物料A被完全移除，物料B已存在于A中
-                        change_type = "[物料整合]"
-                    else:
-                        # 情况2和3: 物料B是新增的(无论物料A是否完全移除)
-                        change_type = "[新物料引入]"
-
-                    # 存储变更信息，包含该变更涉及的位号、物料和变更类型
-                    changes_by_type[change_type].append((refs, pn_a, pn_b, mpn_a_info, mpn_b_info, alt_info))
-
-                # 按变更类型显示
-                first_type = True
-                for change_type, changes in changes_by_type.items():
-                    if changes:
-                        # 在不同类型之间添加空行（第一个类型前不添加）
-                        if not first_type:
-                            result.append("")
-                        first_type = False
-
-                        result.append(f"    位号变更{change_type}:")
-                        for refs, pn_a, pn_b, mpn_a_info, mpn_b_info, alt_info in changes:
-                            for ref in sorted(refs):
-                                # 检查是否有替代料
-                                alt_a_info = ""
-                                alt_b_info = ""
-
-                                # 找到A料号的替代料
-                                if pn_a in self.alternative_map:
-                                    alt_pns_a = self.alternative_map[pn_a]
-                                    if alt_pns_a:
-                                        alt_a_info = f" [替代料: {', '.join(alt_pns_a)}]"
-
-                                # 找到B料号的替代料
-                                if pn_b in self.alternative_map:
-                                    alt_pns_b = self.alternative_map[pn_b]
-                                    if alt_pns_b:
-                                        alt_b_info = f" [替代料: {', '.join(alt_pns_b)}]"
-
-                                result.append(f"    {position_change_counter}.{ref} : {pn_a}{mpn_a_info}{alt_a_info} → {pn_b}{mpn_b_info}{alt_b_info}")
-                                position_change_counter += 1
-
-            # 新增位号部分前添加空行（仅当有位号变更且有新增位号时）
-            has_changes = any(changes for changes in changes_by_type.values())
-            if has_changes and ref_added:
-                result.append("")
+        # 物料数量变更包含三种情况：
+        # 1. 常规数量变更：物料在A和B中都存在，但数量不同
+        # 2. 物料完全移除：物料在A中存在，但在B中不存在（数量从N变为0）
+        # 3. 物料完全新增：物料在A中不存在，但在B中存在（数量从0变为N）
 
-            # 2. 新增位号部分（原6.位号变动的新增位号部分）
-            if ref_added:
-                # 首先按照物料的不同状态分组
-                new_refs_with_new_material = []  # 新增位号对应新增物料
-                new_refs_with_existing_material = []  # 新增位号对应原有物料
+        # 1. 处理常规数量变更
+        for pn in diff['pn_common']:
+            count_a = exploded_a.quantity(pn)
+            count_b = exploded_b.quantity(pn)
 
-                for ref in sorted(ref_added):
-                    pn = ref_to_pn_b.get(ref, "未知")
-                    if pn not in pn_to_refs_a:
-                        new_refs_with_new_material.append((ref, pn))
-                    else:
-                        new_refs_with_existing_material.append((ref, pn))
+            if count_a != count_b:
+                pn_quantity_changes.append((pn, count_a, count_b))
 
-                # 先显示新增位号对应新增物料的情况
-                if new_refs_with_new_material:
-                    result.append("    新增位号[对应新增物料]:")
-                    for ref, pn in sorted(new_refs_with_new_material):
-                        mpn_info = f" (MPN: {mpn_map_b.get(pn, '')})" if self.show_mpn_in_report else ""
+        # 2. 处理物料完全移除的情况
+        for pn in pn_removed:
+            pn_quantity_changes.append((pn, exploded_a.quantity(pn), 0))
+
+        # 3. 处理物料完全新增的情况
+        for pn in pn_added:
+            pn_quantity_changes.append((pn, 0, exploded_b.quantity(pn)))
+
+        result = []
+
+        # 报告标题
+        result.append("=== BOM对比报告 ===")
+        result.append("")
+
+        # 基本信息
+        result.append("1. 基本信息")
+        result.append(f"基准BOM(A)物料数: {exploded_a.part_count()}")
+        result.append(f"基准BOM(A)位号数: {exploded_a.ref_count()}")
+        result.append(f"对比BOM(B)物料数: {exploded_b.part_count()}")
+        result.append(f"对比BOM(B)位号数: {exploded_b.ref_count()}")
+        result.append("")
+
+        # 物料变更汇总
+        result.append("2. 物料变更汇总")
+        result.append(f"新增物料: {len(pn_added)}个")
+        result.append(f"移除物料: {len(pn_removed)}个")
+        result.append(f"变更物料: {len(ref_changed)}个")
+        result.append("")
+
+        # 位号变更汇总
+        result.append("3. 位号变更汇总")
+        result.append(f"新增位号: {len(ref_added)}个")
+        result.append(f"移除位号: {len(ref_removed)}个")
+        result.append(f"变更位号: {len(ref_changed)}个")
+        result.append("")
+
+        # 查找同一位号上的替换情况：移除了一个物料并新增了另一个物料
+        replaced_refs = set(ref_changed)
+
+        # 位号变动详情
+        result.append("4. 位号变动")
+
+        # 位号变动计数器（统一所有类型的位号变动）
+        position_change_counter = 1
+
+        # 初始化变更类型字典，确保它在任何情况下都存在
+        changes_by_type = {
+            "[常规替换]": [],
+            "[新物料引入]": [],
+            "[物料整合]": []
+        }
+
+        # 1. 物料变更部分（原4.物料变更详情）
+        if ref_changed:
+            # 按原物料号分组
+            changes_by_pn = {}
+            for ref, (pn_a, pn_b, is_alt) in ref_changed.items():
+                key = (names[pn_a], names[pn_b], is_alt)
+                if key not in changes_by_pn:
+                    changes_by_pn[key] = (pn_a, pn_b, [])
+                changes_by_pn[key][2].append(ref)
+
+            # 输出分组信息
+            for key in sorted(changes_by_pn):
+                pn_a, pn_b, refs = changes_by_pn[key]
+                is_alt = key[2]
+                mpn_a_info = f" (MPN: {mpn_map_a.get(pn_a, '')})" if self.show_mpn_in_report else ""
+                mpn_b_info = f" (MPN: {mpn_map_b.get(pn_b, '')})" if self.show_mpn_in_report else ""
+
+                alt_info = " [替代料]" if is_alt else ""
+
+                # 判断变更类型
+                # 检查物料A是否在B中完全被移除（没有出现在任何其他位号）
+                pn_a_completely_removed = pn_a not in pn_to_refs_b
+
+                # 检查物料B是否是完全新增的（在A中不存在）
+                pn_b_completely_new = pn_b not in pn_to_refs_a
+
+                if not pn_a_completely_removed and not pn_b_completely_new:
+                    # 情况1: 两个物料在BOM中都保留 - 只是位号上的调整
+                    change_type = "[常规替换]"
+                elif pn_a_completely_removed and not pn_b_completely_new:
+                    # 物料A被完全移除，物料B已存在于A中
+                    change_type = "[物料整合]"
+                else:
+                    # 情况2和3: 物料B是新增的(无论物料A是否完全移除)
+                    change_type = "[新物料引入]"
+
+                # 存储变更信息，包含该变更涉及的位号、物料和变更类型
+                changes_by_type[change_type].append((refs, pn_a, pn_b, mpn_a_info, mpn_b_info, alt_info))
+
+            # 按变更类型显示
+            first_type = True
+            for change_type, changes in changes_by_type.items():
+                if changes:
+                    # 在不同类型之间添加空行（第一个类型前不添加）
+                    if not first_type:
+                        result.append("")
+                    first_type = False
+
+                    result.append(f"    位号变更{change_type}:")
+                    for refs, pn_a, pn_b, mpn_a_info, mpn_b_info, alt_info in changes:
+                        name_a = names[pn_a]
+                        name_b = names[pn_b]
 
                         # 检查是否有替代料
-                        alt_info = ""
-                        alt_pns = []
-                        for main_pn, alt_pn_list in self.alternative_map.items():
-                            if pn == main_pn:
-                                # 当前料号是主料号，查找其所有替代料
-                                alt_pns = alt_pn_list
-                                break
-                            elif pn in alt_pn_list:
-                                # 当前料号是替代料，找到主料号和其他替代料
-                                alt_pns = [main_pn] + [p for p in alt_pn_list if p != pn]
-                                break
+                        alt_a_info = ""
+                        alt_b_info = ""
+
+                        # 找到A料号的替代料
+                        alt_pns_a = self.alternative_map.get(name_a)
+                        if alt_pns_a:
+                            alt_a_info = f" [替代料: {', '.join(alt_pns_a)}]"
+
+                        # 找到B料号的替代料
+                        alt_pns_b = self.alternative_map.get(name_b)
+                        if alt_pns_b:
+                            alt_b_info = f" [替代料: {', '.join(alt_pns_b)}]"
+
+                        for ref in sort_references(refs):
+                            result.append(f"    {position_change_counter}.{ref} : {name_a}{mpn_a_info}{alt_a_info} → {name_b}{mpn_b_info}{alt_b_info}")
+                            position_change_counter += 1
+
+        # 新增位号部分前添加空行（仅当有位号变更且有新增位号时）
+        has_changes = any(changes for changes in changes_by_type.values())
+        if has_changes and ref_added:
+            result.append("")
 
-                        # 如果有替代料，添加替代料信息
-                        if alt_pns:
-                            alt_info = " [替代料: " + ", ".join(alt_pns) + "]"
+        # 2. 新增位号部分（原6.位号变动的新增位号部分）
+        if ref_added:
+            # 首先按照物料的不同状态分组
+            new_refs_with_new_material = []  # 新增位号对应新增物料
+            new_refs_with_existing_material = []  # 新增位号对应原有物料
 
-                        result.append(f"    {position_change_counter}.{ref} : {pn}{mpn_info}{alt_info}")
-                        position_change_counter += 1
+            # 位号已按自然顺序排列，分组后无需再次排序
+            for ref in sort_references(ref_added):
+                pn = ref_to_pn_b[ref]
+                if pn not in pn_to_refs_a:
+                    new_refs_with_new_material.append((ref, pn))
+                else:
+                    new_refs_with_existing_material.append((ref, pn))
 
-                # 增加一个空行，使子分类之间有间隔
-                if new_refs_with_new_material and new_refs_with_existing_material:
-                    result.append("")
+            # 先显示新增位号对应新增物料的情况
+            if new_refs_with_new_material:
+                result.append("    新增位号[对应新增物料]:")
+                for ref, pn in new_refs_with_new_material:
+                    mpn_info = f" (MPN: {mpn_map_b.get(pn, '')})" if self.show_mpn_in_report else ""
+                    alt_info = format_alternatives(names[pn])
+                    result.append(f"    {position_change_counter}.{ref} : {names[pn]}{mpn_info}{alt_info}")
+                    position_change_counter += 1
 
-                # 再显示新增位号对应原有物料的情况
-                if new_refs_with_existing_material:
-                    result.append("    新增位号[对应原有物料]:")
-                    for ref, pn in sorted(new_refs_with_existing_material):
-                        mpn_info = f" (MPN: {mpn_map_b.get(pn, '')})" if self.show_mpn_in_report else ""
+            # 增加一个空行，使子分类之间有间隔
+            if new_refs_with_new_material and new_refs_with_existing_material:
+                result.append("")
 
-                        # 检查是否有替代料
-                        alt_info = ""
-                        alt_pns = []
-                        for main_pn, alt_pn_list in self.alternative_map.items():
-                            if pn == main_pn:
-                                # 当前料号是主料号，查找其所有替代料
-                                alt_pns = alt_pn_list
-                                break
-                            elif pn in alt_pn_list:
-                                # 当前料号是替代料，找到主料号和其他替代料
-                                alt_pns = [main_pn] + [p for p in alt_pn_list if p != pn]
-                                break
+            # 再显示新增位号对应原有物料的情况
+            if new_refs_with_existing_material:
+                result.append("    新增位号[对应原有物料]:")
+                for ref, pn in new_refs_with_existing_material:
+                    mpn_info = f" (MPN: {mpn_map_b.get(pn, '')})" if self.show_mpn_in_report else ""
+                    alt_info = format_alternatives(names[pn])
+                    result.append(f"    {position_change_counter}.{ref} : {names[pn]}{mpn_info}{alt_info}")
+                    position_change_counter += 1
+
+        # 增加一个空行，使子分类之间有间隔
+        if ref_added and ref_removed:
+            result.append("")
 
-                        # 如果有替代料，添加替代料信息
-                        if alt_pns:
-                            alt_info = " [替代料: " + ", ".join(alt_pns) + "]"
+        # 3. 移除位号部分（原6.位号变动的移除位号部分）
+        if ref_removed:
+            # 首先按照物料的不同状态分组
+            removed_refs_with_removed_material = []  # 移除位号对应物料移除
+            removed_refs_with_remaining_material = []  # 移除位号对应物料仍保留
+
+            # 位号已按自然顺序排列，分组后无需再次排序
+            for ref in sort_references(ref_removed):
+                pn = ref_to_pn_a[ref]
+                if pn not in pn_to_refs_b:
+                    removed_refs_with_removed_material.append((ref, pn))
+                else:
+                    removed_refs_with_remaining_material.append((ref, pn))
 
-                        result.append(f"    {position_change_counter}.{ref} : {pn}{mpn_info}{alt_info}")
-                        position_change_counter += 1
+            # 先显示移除位号对应物料移除的情况
+            if removed_refs_with_removed_material:
+                result.append("    移除位号[对应物料移除]:")
+                for ref, pn in removed_refs_with_removed_material:
+                    mpn_info = f" (MPN: {mpn_map_a.get(pn, '')})" if self.show_mpn_in_report else ""
+                    alt_info = format_alternatives(names[pn])
+                    result.append(f"    {position_change_counter}.{ref} : {names[pn]}{mpn_info}{alt_info}")
+                    position_change_counter += 1
 
             # 增加一个空行，使子分类之间有间隔
-            if ref_added and ref_removed:
+            if removed_refs_with_removed_material and removed_refs_with_remaining_material:
                 result.append("")
 
-            # 3. 移除位号部分（原6.位号变动的移除位号部分）
-            if ref_removed:
-                # 首先按照物料的不同状态分组
-                removed_refs_with_removed_material = []  # 移除位号对应物料移除
-                removed_refs_with_remaining_material = []  # 移除位号对应物料仍保留
+            # 再显示移除位号对应物料仍保留的情况
+            if removed_refs_with_remaining_material:
+                result.append("    移除位号[对应物料仍保留]:")
+                for ref, pn in removed_refs_with_remaining_material:
+                    mpn_info = f" (MPN: {mpn_map_a.get(pn, '')})" if self.show_mpn_in_report else ""
+                    alt_info = format_alternatives(names[pn])
+                    result.append(f"    {position_change_counter}.{ref} : {names[pn]}{mpn_info}{alt_info}")
+                    position_change_counter += 1
+
+        result.append("")
+
+        # 过滤掉已经在变更中报告过的位号
+        filtered_pn_added = [pn for pn in pn_added
+                             if not all(ref in replaced_refs for ref in pn_to_refs_b[pn])]
+        filtered_pn_removed = [pn for pn in pn_removed
+                               if not all(ref in replaced_refs for ref in pn_to_refs_a[pn])]
+
+        # 详细变更信息
+        # 物料变动（新增物料和移除物料）
+        if filtered_pn_added or filtered_pn_removed:
+            result.append("5. 物料变动")
+
+            # 物料变动计数器
+            material_change_counter = 1
+
+            # 1. 新增物料部分
+            if filtered_pn_added:
+                result.append("    新增物料:")
+                for pn in sorted(filtered_pn_added, key=names.__getitem__):
+                    # 过滤掉已经报告的位号
+                    unreported_refs = [r for r in set(pn_to_refs_b[pn]) if r not in replaced_refs]
+
+                    if not unreported_refs:
+                        continue
 
-                for ref in sorted(ref_removed):
-                    pn = ref_to_pn_a.get(ref, "未知")
-                    if pn not in pn_to_refs_b:
-                        removed_refs_with_removed_material.append((ref, pn))
-                    else:
-                        removed_refs_with_remaining_material.append((ref, pn))
+                    mpn_info = f" (MPN: {mpn_map_b.get(pn, '')})" if self.show_mpn_in_report else ""
 
-                # 先显示移除位号对应物料移除的情况
-                if removed_refs_with_removed_material:
-                    result.append("    移除位号[对应物料移除]:")
-                    for ref, pn in sorted(removed_refs_with_removed_material):
-                        mpn_info = f" (MPN: {mpn_map_a.get(pn, '')})" if self.show_mpn_in_report else ""
+                    for ref in sort_references(unreported_refs):
+                        result.append(f"    {material_change_counter}.{names[pn]}{mpn_info} : {ref}")
+                        material_change_counter += 1
 
-                        # 检查是否有替代料
-                        alt_info = ""
-                        alt_pns = []
-                        for main_pn, alt_pn_list in self.alternative_map.items():
-                            if pn == main_pn:
-                                # 当前料号是主料号，查找其所有替代料
-                                alt_pns = alt_pn_list
-                                break
-                            elif pn in alt_pn_list:
-                                # 当前料号是替代料，找到主料号和其他替代料
-                                alt_pns = [main_pn] + [p for p in alt_pn_list if p != pn]
-                                break
+            # 增加一个空行，使分类之间有间隔
+            if filtered_pn_added and filtered_pn_removed:
+                result.append("")
+
+            # 2. 移除物料部分
+            if filtered_pn_removed:
+                result.append("    移除物料:")
+                for pn in sorted(filtered_pn_removed, key=names.__getitem__):
+                    # 过滤掉已经报告的位号
+                    unreported_refs = [r for r in set(pn_to_refs_a[pn]) if r not in replaced_refs]
 
-                        # 如果有替代料，添加替代料信息
-                        if alt_pns:
-                            alt_info = " [替代料: " + ", ".join(alt_pns) + "]"
+                    if not unreported_refs:
+                        continue
+
+                    mpn_info = f" (MPN: {mpn_map_a.get(pn, '')})" if self.show_mpn_in_report else ""
 
-                        result.append(f"    {position_change_counter}.{ref} : {pn}{mpn_info}{alt_info}")
-                        position_change_counter += 1
+                    for ref in sort_references(unreported_refs):
+                        result.append(f"    {material_change_counter}.{names[pn]}{mpn_info} : {ref}")
+                        material_change_counter += 1
+
+            result.append("")
 
-                # 增加一个空行，使子分类之间有间隔
-                if removed_refs_with_removed_material and removed_refs_with_remaining_material:
+        # 数量变更
+        if pn_quantity_changes:
+            result.append("6. 物料数量变更")
+
+            # 数量变更计数器
+            quantity_change_counter = 1
+
+            # 自定义排序函数，按变更类型分组排序
+            # 排序优先级：
+            # 1. 完全移除的物料（count_b=0）
+            # 2. 完全新增的物料（count_a=0）
+            # 3. 数量增加的物料（count_b>count_a）
+            # 4. 数量减少的物料（count_b<count_a）
+            # 每组内按物料号字典序排序
+            def sort_key(item):
+                pn, count_a, count_b = item
+                if count_b == 0:  # 完全移除
+                    return 0, names[pn]  # 第一组：完全移除的物料
+                elif count_a == 0:  # 完全新增
+                    return 1, names[pn]  # 第二组：完全新增的物料
+                elif count_b > count_a:  # 数量增加
+                    return 2, names[pn]  # 第三组：数量增加的物料
+                else:  # 数量减少
+                    return 3, names[pn]  # 第四组：数量减少的物料
+
+            # 按变更类型分组排序
+            sorted_changes = sorted(pn_quantity_changes, key=sort_key)
+            total_changes = len(sorted_changes)
+
+            # 记录前一个项目的类型，用于在类型变化时添加空行和类型标识
+            prev_type = None
+
+            # 遍历排序后的物料数量变更
+            for i, (pn, count_a, count_b) in enumerate(sorted_changes):
+                # 确定当前项目的类型和对应的标识文本
+                if count_b == 0:
+                    current_type = "removed"
+                    type_label = "    【物料完全移除】"
+                elif count_a == 0:
+                    current_type = "added"
+                    type_label = "    【物料完全新增】"
+                elif count_b > count_a:
+                    current_type = "increased"
+                    type_label = "    【物料数量增加】"
+                else:
+                    current_type = "decreased"
+                    type_label = "    【物料数量减少】"
+
+                # 处理类型变化和类型标识的显示
+                if prev_type is None:
+                    # 第一个类型，添加类型标识
+                    result.append(type_label)
+                elif prev_type != current_type:
+                    # 类型发生变化，添加空行和新类型标识
                     result.append("")
+                    result.append(type_label)
 
-                # 再显示移除位号对应物料仍保留的情况
-                if removed_refs_with_remaining_material:
-                    result.append("    移除位号[对应物料仍保留]:")
-                    for ref, pn in sorted(removed_refs_with_remaining_material):
-                        mpn_info = f" (MPN: {mpn_map_a.get(pn, '')})" if self.show_mpn_in_report else ""
+                # 更新前一个类型
+                prev_type = current_type
 
-                        # 检查是否有替代料
-                        alt_info = ""
-                        alt_pns = []
-                        for main_pn, alt_pn_list in self.alternative_map.items():
-                            if pn == main_pn:
-                                # 当前料号是主料号，查找其所有替代料
-                                alt_pns = alt_pn_list
-                                break
-                            elif pn in alt_pn_list:
-                                # 当前料号是替代料，找到主料号和其他替代料
-                                alt_pns = [main_pn] + [p for p in alt_pn_list if p != pn]
-                                break
+                # 生成差异描述文本
+                change = normalize_quantity(count_b - count_a)
+                if count_b == 0:  # 物料完全移除的情况
+                    difference_text = "完全移除"
+                elif count_a == 0:  # 物料完全新增的情况
+                    difference_text = "完全新增"
+                else:
+                    direction = "增加" if change > 0 else "减少"
+                    difference_text = f"{direction}{abs(change)}"
 
-                        # 如果有替代料，添加替代料信息
-                        if alt_pns:
-                            alt_info = " [替代料: " + ", ".join(alt_pns) + "]"
+                # 根据情况选择正确的MPN信息源
+                # 对于新增物料，使用B中的MPN信息；对于其他情况，使用A中的MPN信息
+                if count_a == 0:  # 完全新增的物料
+                    mpn_info = f" (MPN: {mpn_map_b.get(pn, '')})" if self.show_mpn_in_report else ""
+                else:
+                    mpn_info = f" (MPN: {mpn_map_a.get(pn, '')})" if self.show_mpn_in_report else ""
+
+                # 添加主数量变更信息行
+                result.append(f"    {quantity_change_counter}.{names[pn]}{mpn_info} : {count_a} → {count_b} (差异: {difference_text})")
+
+                # 获取位号差异：添加的位号和移除的位号
+                refs_a_set = set(pn_to_refs_a.get(pn, []))
+                refs_b_set = set(pn_to_refs_b.get(pn, []))
+
+                added_refs = refs_b_set - refs_a_set
+                removed_refs = refs_a_set - refs_b_set
+
+                # 显示移除的位号（所有类型都可能有）
+                if removed_refs:
+                    for ref in sort_references(removed_refs):
+                        result.append(f"\t移除位号: {ref} → {names[pn]}{mpn_info}")
+
+                # 显示新增的位号（只有当物料没有完全移除时才显示）
+                if added_refs and count_b > 0:
+                    for ref in sort_references(added_refs):
+                        result.append(f"\t新增位号: {ref} → {names[pn]}{mpn_info}")
+
+                # 添加项目间的空行分隔（只在同一类型内的项目之间添加）
+                if i < total_changes - 1:  # 不是最后一项
+                    next_pn, next_count_a, next_count_b = sorted_changes[i + 1]
+
+                    # 确定下一项的类型
+                    if next_count_b == 0:
+                        next_type = "removed"
+                    elif next_count_a == 0:
+                        next_type = "added"
+                    elif next_count_b > next_count_a:
+                        next_type = "increased"
+                    else:
+                        next_type = "decreased"
 
-                        result.append(f"    {position_change_counter}.{ref} : {pn}{mpn_info}{alt_info}")
-                        position_change_counter += 1
+                    # 仅当下一项与当前项类型相同时，添加空行
+                    if current_type == next_type:
+                        result.append("")
 
-            result.append("")
+                # 递增计数器
+                quantity_change_counter += 1
 
-            # 过滤掉已经在变更中报告过的位号
-            filtered_pn_added = []
-            for pn in pn_added:
-                # 检查该物料的所有位号是否都已经在变更中报告过
-                refs = set(pn_to_refs_b[pn])
-                if not all(ref in replaced_refs for ref in refs):
-                    filtered_pn_added.append(pn)
-
-            filtered_pn_removed = []
-            for pn in pn_removed:
-                # 检查该物料的所有位号是否都已经在变更中报告过
-                refs = set(pn_to_refs_a[pn])
-                if not all(ref in replaced_refs for ref in refs):
-                    filtered_pn_removed.append(pn)
-
-            # 详细变更信息
-            # 物料变动（新增物料和移除物料）
-            if filtered_pn_added or filtered_pn_removed:
-                result.append("5. 物料变动")
-
-                # 物料变动计数器
-                material_change_counter = 1
-
-                # 1. 新增物料部分
-                if filtered_pn_added:
-                    result.append("    新增物料:")
-                    for pn in sorted(filtered_pn_added):
-                        # 过滤掉已经报告的位号
-                        all_refs = set(pn_to_refs_b[pn])
-                        unreported_refs = [r for r in all_refs if r not in replaced_refs]
-
-                        if not unreported_refs:
-                            continue
-
-                        mpn_info = f" (MPN: {mpn_map_b.get(pn, '')})" if self.show_mpn_in_report else ""
-
-                        for ref in sorted(unreported_refs):
-                            result.append(f"    {material_change_counter}.{pn}{mpn_info} : {ref}")
-                            material_change_counter += 1
-
-                # 增加一个空行，使分类之间有间隔
-                if filtered_pn_added and filtered_pn_removed:
-                    result.append("")
+        return result
 
-                # 2. 移除物料部分
-                if filtered_pn_removed:
-                    result.append("    移除物料:")
-                    for pn in sorted(filtered_pn_removed):
-                        # 过滤掉已经报告的位号
-                        all_refs = set(pn_to_refs_a[pn])
-                        unreported_refs = [r for r in all_refs if r not in replaced_refs]
+    def load_revisions(self, boms, names=None, is_dataframe=False):
+        """加载多个BOM，每个文件只读取一次
 
-                        if not unreported_refs:
-                            continue
+        Args:
+            boms: BOM文件路径或DataFrame列表
+            names: 各BOM的名称，默认为文件名（DataFrame时为"版本1"、"版本2"...）
+            is_dataframe: 如果为True，则boms是DataFrame列表
 
-                        mpn_info = f" (MPN: {mpn_map_a.get(pn, '')})" if self.show_mpn_in_report else ""
+        Returns:
+            tuple: (DataFrame列表, 名称列表)
+        """
+        if names is None:
+            if is_dataframe:
+                names = [f"版本{i + 1}" for i in range(len(boms))]
+            else:
+                names = [os.path.basename(path) for path in boms]
+        if len(names) != len(boms):
+            raise ValueError("BOM数量与名称数量不一致")
 
-                        for ref in sorted(unreported_refs):
-                            result.append(f"    {material_change_counter}.{pn}{mpn_info} : {ref}")
-                            material_change_counter += 1
+        frames = []
+        for i, bom in enumerate(boms):
+            frames.append(bom if is_dataframe else self.load_bom(bom, projection=True))
+            self.update_progress(int(40 * (i + 1) / len(boms)), f"已加载 {names[i]}")
+        return frames, list(names)
 
-                result.append("")
+    def compare_chain(self, boms, names=None, is_dataframe=False):
+        """多版本链式对比（A→B→C→...）
 
-            # 数量变更
-            if pn_quantity_changes:
-                result.append("6. 物料数量变更")
-
-                # 数量变更计数器
-                quantity_change_counter = 1
-
-                # 自定义排序函数，按变更类型分组排序
-                # 排序优先级：
-                # 1. 完全移除的物料（count_b=0）
-                # 2. 完全新增的物料（count_a=0）
-                # 3. 数量增加的物料（count_b>count_a）
-                # 4. 数量减少的物料（count_b<count_a）
-                # 每组内按物料号字典序排序
-                def sort_key(item):
-                    pn, count_a, count_b = item
-                    if count_b == 0:  # 完全移除
-                        return 0, pn  # 第一组：完全移除的物料
-                    elif count_a == 0:  # 完全新增
-                        return 1, pn  # 第二组：完全新增的物料
-                    elif count_b > count_a:  # 数量增加
-                        return 2, pn  # 第三组：数量增加的物料
-                    else:  # 数量减少
-                        return 3, pn  # 第四组：数量减少的物料
-
-                # 按变更类型分组排序
-                sorted_changes = sorted(pn_quantity_changes, key=sort_key)
-                total_changes = len(sorted_changes)
-
-                # 记录前一个项目的类型，用于在类型变化时添加空行和类型标识
-                prev_type = None
-
-                # 遍历排序后的物料数量变更
-                for i, (pn, count_a, count_b) in enumerate(sorted_changes):
-                    # 确定当前项目的类型和对应的标识文本
-                    if count_b == 0:
-                        current_type = "removed"
-                        type_label = "    【物料完全移除】"
-                    elif count_a == 0:
-                        current_type = "added"
-                        type_label = "    【物料完全新增】"
-                    elif count_b > count_a:
-                        current_type = "increased"
-                        type_label = "    【物料数量增加】"
-                    else:
-                        current_type = "decreased"
-                        type_label = "    【物料数量减少】"
-
-                    # 处理类型变化和类型标识的显示
-                    if prev_type is None:
-                        # 第一个类型，添加类型标识
-                        result.append(type_label)
-                    elif prev_type != current_type:
-                        # 类型发生变化，添加空行和新类型标识
-                        result.append("")
-                        result.append(type_label)
-
-                    # 更新前一个类型
-                    prev_type = current_type
-
-                    # 生成差异描述文本
-                    change = count_b - count_a
-                    if count_b == 0:  # 物料完全移除的情况
-                        direction = "移除"
-                        difference_text = "完全移除"
-                    elif count_a == 0:  # 物料完全新增的情况
-                        direction = "新增"
-                        difference_text = "完全新增"
-                    else:
-                        direction = "增加" if change > 0 else "减少"
-                        difference_text = f"{direction}{abs(change)}"
+        每个版本只加载和展开一次，相邻版本的差异基于共享的展开表计算，
+        总耗时与版本数成线性关系。
 
-                    # 根据情况选择正确的MPN信息源
-                    # 对于新增物料，使用B中的MPN信息；对于其他情况，使用A中的MPN信息
-                    if count_a == 0:  # 完全新增的物料
-                        mpn_info = f" (MPN: {mpn_map_b.get(pn, '')})" if self.show_mpn_in_report else ""
-                    else:
-                        mpn_info = f" (MPN: {mpn_map_a.get(pn, '')})" if self.show_mpn_in_report else ""
-
-                    # 添加主数量变更信息行
-                    result.append(f"    {quantity_change_counter}.{pn}{mpn_info} : {count_a} → {count_b} (差异: {difference_text})")
-
-                    # 获取位号差异：添加的位号和移除的位号
-                    refs_a_set = set(pn_to_refs_a.get(pn, []))
-                    refs_b_set = set(pn_to_refs_b.get(pn, []))
-
-                    added_refs = refs_b_set - refs_a_set
-                    removed_refs = refs_a_set - refs_b_set
-
-                    # 显示移除的位号（所有类型都可能有）
-                    if removed_refs:
-                        for ref in sorted(removed_refs):
-                            result.append(f"\t移除位号: {ref} → {pn}{mpn_info}")
-
-                    # 显示新增的位号（只有当物料没有完全移除时才显示）
-                    if added_refs and count_b > 0:
-                        for ref in sorted(added_refs):
-                            result.append(f"\t新增位号: {ref} → {pn}{mpn_info}")
-
-                    # 添加项目间的空行分隔（只在同一类型内的项目之间添加）
-                    if i < total_changes - 1:  # 不是最后一项
-                        next_pn, next_count_a, next_count_b = sorted_changes[i + 1]
-
-                        # 确定下一项的类型
-                        if next_count_b == 0:
-                            next_type = "removed"
-                        elif next_count_a == 0:
-                            next_type = "added"
-                        elif next_count_b > next_count_a:
-                            next_type = "increased"
-                        else:
-                            next_type = "decreased"
+        Args:
+            boms: 按时间顺序排列的BOM文件路径或DataFrame列表（至少两个）
+            names: 各版本名称
+            is_dataframe: 如果为True，则boms是DataFrame列表
 
-                        # 仅当下一项与当前项类型相同时，添加空行
-                        if current_type == next_type:
-                            result.append("")
+        Returns:
+            dict: 对比结果
+                names: 版本名称列表
+                steps: 每对相邻版本的结果 [{'from', 'to', 'summary', 'report'}]
+                timeline: 位号时间线 {位号: {'first_seen', 'last_seen', 'changes'}}，
+                    changes为[(版本, 变更前料号, 变更后料号)]，料号为None表示位号不存在
+                report: 完整的报告文本
+        """
+        if len(boms) < 2:
+            raise ValueError("链式对比至少需要两个BOM")
+
+        timer = self.stage_timer
+        timer.reset()
+        frames, names = self.load_revisions(boms, names, is_dataframe)
+
+        # 所有版本共享同一个料号驻留池，每个版本只展开一次
+        pool = PartNumberPool()
+        with timer.span('explosion'):
+            exploded = [self.explode_bom(frame, pool) for frame in frames]
+
+        pn_names = pool.names
+        timeline = {ref: {'first_seen': names[0], 'last_seen': None, 'changes': []}
+                    for ref in exploded[0].ref_to_pn}
+
+        steps = []
+        for i in range(len(exploded) - 1):
+            self.update_progress(40 + int(50 * (i + 1) / (len(exploded) - 1)), f"分析 {names[i]} → {names[i + 1]}")
+            with timer.span('diffing'):
+                diff = self.diff_exploded(exploded[i], exploded[i + 1])
+            with timer.span('rendering'):
+                report_lines = self.render_report(exploded[i], exploded[i + 1], diff)
+
+            # 更新位号时间线
+            to_name = names[i + 1]
+            for ref in diff['ref_added']:
+                pn = pn_names[exploded[i + 1].ref_to_pn[ref]]
+                entry = timeline.get(ref)
+                if entry is None:
+                    timeline[ref] = {'first_seen': to_name, 'last_seen': None, 'changes': []}
+                else:
+                    # 之前被移除的位号重新出现
+                    entry['changes'].append((to_name, None, pn))
+            for ref, (pn_a, pn_b, _) in diff['ref_changed'].items():
+                timeline[ref]['changes'].append((to_name, pn_names[pn_a], pn_names[pn_b]))
+            for ref in diff['ref_removed']:
+                entry = timeline[ref]
+                entry['changes'].append((to_name, pn_names[exploded[i].ref_to_pn[ref]], None))
+                entry['last_seen'] = names[i]
+
+            steps.append({
+                'from': names[i],
+                'to': to_name,
+                'summary': {
+                    'pn_added': len(diff['pn_added']),
+                    'pn_removed': len(diff['pn_removed']),
+                    'ref_added': len(diff['ref_added']),
+                    'ref_removed': len(diff['ref_removed']),
+                    'ref_changed': len(diff['ref_changed'])
+                },
+                'report': report_lines
+            })
+
+        for ref in exploded[-1].ref_to_pn:
+            timeline[ref]['last_seen'] = names[-1]
+
+        with timer.span('rendering'):
+            report = self.render_chain_report(names, steps, timeline)
+        self.last_timings = timer.snapshot()
+        self.update_progress(100, "处理完成")
+
+        return {
+            'names': names,
+            'steps': steps,
+            'timeline': timeline,
+            'report': report
+        }
 
-                    # 递增计数器
-                    quantity_change_counter += 1
+    def render_chain_report(self, names, steps, timeline):
+        """生成链式对比报告文本"""
+        result = ["=== BOM多版本对比报告 ===", ""]
+        result.append("版本顺序: " + " → ".join(names))
+        result.append("")
+
+        for step_idx, step in enumerate(steps, 1):
+            summary = step['summary']
+            result.append(f"【{step_idx}. {step['from']} → {step['to']}】")
+            result.append(f"新增物料: {summary['pn_added']}个, 移除物料: {summary['pn_removed']}个, "
+                          f"新增位号: {summary['ref_added']}个, 移除位号: {summary['ref_removed']}个, "
+                          f"变更位号: {summary['ref_changed']}个")
+            result.extend(step['report'])
+            result.append("")
 
-            # 记录结束时间
-            self.end_time = datetime.now()
-            processing_time = self.end_time - self.start_time
+        # 只列出发生过变化的位号
+        result.append("=== 位号变更时间线 ===")
+        changed_refs = sort_references(ref for ref, entry in timeline.items()
+                                       if entry['changes'] or entry['first_seen'] != names[0]
+                                       or entry['last_seen'] != names[-1])
+        if not changed_refs:
+            result.append("所有版本的位号均无变化")
+        for ref in changed_refs:
+            entry = timeline[ref]
+            last_seen = entry['last_seen'] or "-"
+            result.append(f"{ref}: 首次出现 {entry['first_seen']}, 最后出现 {last_seen}")
+            for name, pn_before, pn_after in entry['changes']:
+                result.append(f"\t{name}: {pn_before or '(无)'} → {pn_after or '(移除)'}")
+
+        return "\n".join(result)
+
+    def compare_variants(self, boms, names=None, baseline=0, is_dataframe=False):
+        """多变体矩阵对比
+
+        适用于同一产品族的多个变体BOM：每个变体展开一次，拼接为(位号, 变体, 料号)长表，
+        位号×变体矩阵以该长表稀疏表示（只存储存在的位号），差异和通用性统计都在长表上向量化计算，
+        内存与各变体位号数之和成正比，不随位号数×变体数增长。
 
-            # 添加处理时间信息到报告开头
-            time_info = [
-                "=== 处理时间统计 ===",
-                f"开始时间: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}",
-                f"结束时间: {self.end_time.strftime('%Y-%m-%d %H:%M:%S')}",
-                f"总耗时: {processing_time.total_seconds():.2f}秒\n"
-            ]
+        Args:
+            boms: BOM文件路径或DataFrame列表
+            names: 各变体名称
+            baseline: 基准变体的序号
+            is_dataframe: 如果为True，则boms是DataFrame列表
 
-            result = time_info + result
+        Returns:
+            dict: 对比结果
+                names: 变体名称列表
+                baseline: 基准变体名称
+                ref_matrix: 位号×变体的料号DataFrame（稀疏存储，位号不存在时为空字符串）
+                part_matrix: 料号×变体的用量DataFrame（稀疏存储，未使用为0）
+                deltas: 相对基准变体的差异明细DataFrame
+                summary: 每个变体的统计DataFrame
+                common_parts: 所有变体共用的料号列表
+                common_refs: 所有变体中料号相同的位号数
+                part_info: 料号 -> (描述, MPN)
+        """
+        if not boms:
+            raise ValueError("至少需要一个BOM")
+        if not 0 <= baseline < len(boms):
+            raise ValueError(f"基准变体序号超出范围: {baseline}")
+
+        timer = self.stage_timer
+        timer.reset()
+        frames, names = self.load_revisions(boms, names, is_dataframe)
+        if len(set(names)) != len(names):
+            raise ValueError("变体名称不能重复")
+
+        pool = PartNumberPool()
+        with timer.span('explosion'):
+            exploded = [self.explode_bom(frame, pool) for frame in frames]
+        self.update_progress(60, "构建变体矩阵...")
+
+        with timer.span('diffing'):
+            # 拼接所有变体的(位号, 料号id)长表
+            variant_ids = np.concatenate([np.full(len(e.ref_to_pn), i, dtype=np.int32)
+                                          for i, e in enumerate(exploded)])
+            refs = [ref for e in exploded for ref in e.ref_to_pn]
+            pn_ids = np.fromiter((pn_id for e in exploded for pn_id in e.ref_to_pn.values()),
+                                 dtype=np.int32, count=len(refs))
+
+            # 位号按自然顺序编码，长表的每一项为稀疏矩阵中的一个非空元素
+            ref_codes, ref_uniques = pd.factorize(pd.Series(refs, dtype=object))
+            ref_names = sort_references(np.asarray(ref_uniques, dtype=object).tolist())
+            ref_order = {ref: i for i, ref in enumerate(ref_names)}
+            remap = np.fromiter((ref_order[ref] for ref in np.asarray(ref_uniques, dtype=object).tolist()),
+                                dtype=np.int64, count=len(ref_uniques))
+            ref_ids = remap[ref_codes]
+
+            # 料号用量矩阵：用量为位号数加上无位号行的用量（与两两对比一致），用量为0的料号仍视为存在
+            part_count = len(pool.names)
+            quantities = np.zeros((part_count, len(names)), dtype=float)
+            present = np.zeros((part_count, len(names)), dtype=bool)
+            for i, e in enumerate(exploded):
+                ids = np.fromiter(set(e.pn_to_refs) | set(e.qty_map), dtype=np.int64)
+                present[ids, i] = True
+                quantities[ids, i] = [e.quantity(pn_id) for pn_id in ids.tolist()]
+            if np.all(quantities == np.round(quantities)):
+                quantities = quantities.astype(np.int64)
+
+            # 相对基准变体的差异：基准料号按位号展开为一维数组（-1表示基准中没有该位号）
+            base_pns = np.full(len(ref_names), -1, dtype=np.int32)
+            in_base = variant_ids == baseline
+            base_pns[ref_ids[in_base]] = pn_ids[in_base]
+            entry_base = base_pns[ref_ids]
+            added = entry_base == -1
+            changed = (entry_base != -1) & (pn_ids != entry_base)
+            same = (entry_base != -1) & (pn_ids == entry_base)
+
+            # 移除：基准中有而变体中没有的位号（每个变体的基准位号数减去其中仍存在的位号）
+            base_refs = np.flatnonzero(base_pns != -1)
+            removed_refs = []
+            removed_variants = []
+            for i in range(len(names)):
+                kept = np.zeros(len(ref_names), dtype=bool)
+                kept[ref_ids[variant_ids == i]] = True
+                missing = base_refs[~kept[base_refs]]
+                removed_refs.append(missing)
+                removed_variants.append(np.full(len(missing), i, dtype=np.int32))
+            removed_refs = np.concatenate(removed_refs) if removed_refs else np.zeros(0, dtype=np.int64)
+            removed_variants = np.concatenate(removed_variants) if removed_variants else np.zeros(0, dtype=np.int32)
+
+            alt_index = self.build_alternative_index()
+            pn_names = np.asarray(pool.names + [''], dtype=object)
+            deltas = self.build_variant_deltas(
+                [('新增', ref_ids[added], variant_ids[added], entry_base[added], pn_ids[added]),
+                 ('移除', removed_refs, removed_variants, base_pns[removed_refs], np.full(len(removed_refs), -1)),
+                 ('变更', ref_ids[changed], variant_ids[changed], entry_base[changed], pn_ids[changed])],
+                names, ref_names, pn_names, alt_index)
+
+            variant_counts = present.sum(axis=1)
+            common_mask = variant_counts == len(names)
+            # 所有变体（含基准）料号都与基准相同的位号
+            common_refs = int((np.bincount(ref_ids[same], minlength=len(ref_names)) == len(names)).sum())
+
+            summary = pd.DataFrame({
+                '变体': names,
+                '行数': [e.row_count for e in exploded],
+                '位号数': [e.ref_count() for e in exploded],
+                '物料数': [e.part_count() for e in exploded],
+                '新增位号': np.bincount(variant_ids[added], minlength=len(names)),
+                '移除位号': np.bincount(removed_variants, minlength=len(names)),
+                '变更位号': np.bincount(variant_ids[changed], minlength=len(names)),
+                '独有物料': (present & (variant_counts == 1)[:, None]).sum(axis=0)
+            })
+
+        part_info = {}
+        for e in exploded:
+            for pn_id, desc in e.desc_map.items():
+                part_info[pool.names[pn_id]] = (desc, e.mpn_map.get(pn_id, ''))
+
+        part_rows = np.flatnonzero(variant_counts > 0)
+        part_matrix = pd.DataFrame(
+            {name: pd.arrays.SparseArray(quantities[part_rows, i], fill_value=0) for i, name in enumerate(names)},
+            index=pd.Index(pn_names[part_rows], name='P/N')
+        )
+        ref_columns = {}
+        for i, name in enumerate(names):
+            column = np.full(len(ref_names), '', dtype=object)
+            in_variant = variant_ids == i
+            column[ref_ids[in_variant]] = pn_names[pn_ids[in_variant]]
+            ref_columns[name] = pd.arrays.SparseArray(column, fill_value='')
+        ref_matrix = pd.DataFrame(ref_columns, index=pd.Index(ref_names, name='位号'))
+
+        self.last_timings = timer.snapshot()
+        self.update_progress(100, "处理完成")
+
+        return {
+            'names': names,
+            'baseline': names[baseline],
+            'ref_matrix': ref_matrix,
+            'part_matrix': part_matrix,
+            'deltas': deltas,
+            'summary': summary,
+            'common_parts': pn_names[np.flatnonzero(common_mask)].tolist(),
+            'common_refs': common_refs,
+            'part_info': part_info
+        }
 
-            self.update_progress(100, "处理完成")
-            return "\n".join(result)
+    def build_variant_deltas(self, changes, names, ref_names, pn_names, alt_index):
+        """将差异项转换为明细表（变体, 位号, 类型, 基准料号, 变体料号, 是否替代料）
 
-        except Exception as e:
-            trace = traceback.format_exc()
-            return f"生成对比报告时出错:\n{str(e)}\n\n详细错误信息:\n{trace}"
+        Args:
+            changes: [(类型, 位号序号, 变体序号, 基准料号id, 变体料号id)]，料号id为-1表示不存在
+        """
+        frames = []
+        for change_type, ref_idx, variant_idx, base_pn, variant_pn in changes:
+            frames.append(pd.DataFrame({
+                '变体': np.asarray(names, dtype=object)[variant_idx],
+                '位号': np.asarray(ref_names, dtype=object)[ref_idx],
+                '类型': change_type,
+                '基准料号': pn_names[base_pn],
+                '变体料号': pn_names[variant_pn],
+                '_order': ref_idx
+            }))
+        deltas = pd.concat(frames, ignore_index=True)
+        deltas['替代料'] = [bool(alt_index.get(a, set()) & alt_index.get(b, set())) if kind == '变更' else False
+                          for kind, a, b in zip(deltas['类型'], deltas['基准料号'], deltas['变体料号'])]
+        order = {name: i for i, name in enumerate(names)}
+        deltas['_variant'] = deltas['变体'].map(order)
+        deltas = deltas.sort_values(['_variant', '_order'], kind='stable').drop(columns=['_variant', '_order'])
+        return deltas.reset_index(drop=True)
+
+    def write_variant_workbook(self, result, file_path):
+        """将多变体对比结果写入多工作表Excel
+
+        工作表：汇总、位号矩阵、物料矩阵、差异明细、通用物料
+        """
+        names = result['names']
+        part_info = result['part_info']
+
+        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+            summary = result['summary'].copy()
+            summary['基准'] = ['是' if name == result['baseline'] else '' for name in names]
+            summary.to_excel(writer, sheet_name="汇总", index=False)
+
+            result['ref_matrix'].sparse.to_dense().to_excel(writer, sheet_name="位号矩阵")
+
+            part_matrix = result['part_matrix'].sparse.to_dense()
+            part_matrix.insert(0, '描述', [part_info.get(pn, ('', ''))[0] for pn in part_matrix.index])
+            part_matrix.insert(1, 'MPN', [part_info.get(pn, ('', ''))[1] for pn in part_matrix.index])
+            part_matrix.to_excel(writer, sheet_name="物料矩阵")
+
+            deltas = result['deltas'].copy()
+            deltas['替代料'] = deltas['替代料'].map({True: '是', False: ''})
+            deltas.to_excel(writer, sheet_name="差异明细", index=False)
+
+            common = pd.DataFrame({'P/N': result['common_parts']})
+            common['描述'] = [part_info.get(pn, ('', ''))[0] for pn in common['P/N']]
+            common['MPN'] = [part_info.get(pn, ('', ''))[1] for pn in common['P/N']]
+            common.to_excel(writer, sheet_name="通用物料", index=False)
+
+        logger.info("变体矩阵已保存: %s", file_path)
 
     def create_bom_table(self, parent_frame, is_bom_a=True):
         """创建BOM数据显示表格"""
@@ -1299,7 +3596,7 @@ class BOMComparer:
 
     def highlight_material_in_both_trees(self, pn):
         """在两个BOM树中高亮显示指定物料编号的行"""
-        print(f"在两个BOM树中高亮显示物料: {pn}")
+        logger.debug("在两个BOM树中高亮显示物料: %s", pn)
 
         # 确保父窗口存在
         if not self.parent_window:
@@ -1311,6 +3608,58 @@ class BOMComparer:
 
         return False
 
+def write_report_workbook(content, target):
+    """将对比报告文本写入Excel工作簿（每行报告一行，标题分隔线不写入）
+
+    Args:
+        content: 对比报告文本
+        target: 文件路径或可写的二进制文件对象
+    """
+    data = []
+    for line in content.strip().split('\n'):
+        # 空行保留，使各部分之间有间隔
+        if not line.strip():
+            data.append({"内容": ""})
+            continue
+
+        # 跳过标题分隔线（===或---样式）
+        if line.startswith('==') or line.startswith('--') or line.endswith('==') or line.endswith('--'):
+            continue
+
+        # 分节标题前添加一个空行，使标题与上下内容分开
+        if line.startswith('【') and line.endswith('】') and data and data[-1]["内容"] != "":
+            data.append({"内容": ""})
+        data.append({"内容": line})
+
+    with pd.ExcelWriter(target, engine='openpyxl') as writer:
+        pd.DataFrame(data, columns=["内容"]).to_excel(writer, sheet_name="BOM对比结果", index=False)
+        # 只有一列，设置A列宽度
+        writer.sheets['BOM对比结果'].column_dimensions['A'].width = 100
+
+def load_bom_sheet(file_path, sheet_name, field_mappings, projection, header_entries=None):
+    """加载单个工作表（多工作表模式在子进程中调用）
+
+    子进程不能弹出对话框，未能识别必要字段时不报错，而是把缺少的字段返回给主进程，
+    由主进程重新加载该工作表（界面中可手动选择列）。子进程使用主进程传入的表头签名缓存，
+    命中或新识别的表头返回给主进程合并（HeaderSignatureCache.merge_entries）。
+
+    Args:
+        header_entries: 主进程表头签名缓存中的条目 {签名: 条目}
+
+    Returns:
+        tuple: (标准化的DataFrame, 该工作表识别出的替代料映射, 缺少的必要字段, 命中或新增的表头缓存条目)，
+        缺少必要字段时DataFrame为None
+    """
+    comparer = BOMComparer()
+    comparer.interactive = False
+    comparer.set_field_mappings(field_mappings)
+    comparer.header_cache.entries.update(header_entries or {})
+    try:
+        bom_df = comparer.load_bom(file_path, projection=projection, sheet_name=sheet_name)
+    except MissingFieldsError as e:
+        return None, {}, e.fields, comparer.header_cache.touched_entries()
+    return bom_df, comparer.alternative_map, [], comparer.header_cache.touched_entries()
+
 class BOMComparerGUI:
     def __init__(self, root):
         """初始化GUI"""
@@ -1363,9 +3712,9 @@ class BOMComparerGUI:
         self.root.update_idletasks()  # 处理所有待处理的窗口事件，确保几何管理器已完成布局计算
 
         # 打印调试信息
-        print(f"屏幕尺寸: {screen_width}x{screen_height}")
-        print(f"窗口尺寸: {window_width}x{window_height}")
-        print(f"窗口位置: +{x}+{y}")
+        logger.debug("屏幕尺寸: %sx%s", screen_width, screen_height)
+        logger.debug("窗口尺寸: %sx%s", window_width, window_height)
+        logger.debug("窗口位置: +%s+%s", x, y)
 
         # 将窗口置于前台
         self.root.lift()
@@ -1385,6 +3734,14 @@ class BOMComparerGUI:
         # 文件选择的路径（两个文件选择共享一个路径）
         self.last_dir = os.path.expanduser("~")  # 默认为用户主目录
 
+        # 日志设置（调试日志、写入日志文件），用于排查用户问题
+        self.debug_logging = False
+        self.log_to_file = False
+
+        # 监视模式：BOM文件保存后自动重新加载并对比
+        self.file_watcher = FileWatcher()
+        self.watch_job = None
+
         # 清理配置文件中的无效字段
         self.clean_config_files()
 
@@ -1392,6 +3749,7 @@ class BOMComparerGUI:
         self.load_config_from_file()
 
         # 检查更新相关方法
+        self.update_cache = UpdateCheckCache()
         self.check_updates_manually = self._check_updates_manually
         self.check_updates_on_startup = self._check_updates_on_startup
 
@@ -1410,16 +3768,24 @@ class BOMComparerGUI:
         threading.Thread(target=self._check_updates, args=(True,), daemon=True).start()
 
     def _check_updates_on_startup(self):
-        """启动时自动检查更新"""
-        # 等待一些时间再检查，避免影响程序启动速度
-        time.sleep(2)
-        self._check_updates(False)
+        """启动时自动检查更新（在主线程中调用）
+
+        不需要访问网络时（见UpdateCheckCache.is_due）直接使用缓存的版本信息，不启动后台线程；
+        否则在后台线程中请求，不影响界面。
+        """
+        self.update_cache.load(os.path.join(get_app_dir(), UPDATE_CACHE_FILE))
+        if self.update_cache.is_due():
+            threading.Thread(target=self._check_updates, args=(False,), daemon=True).start()
+        else:
+            self._check_updates(False)
 
     def _check_updates(self, is_manual_check=False):
         """检查更新的实际实现"""
         try:
-            # 检查更新
-            has_update, latest_version, download_url, changelog, is_exe_update = check_for_updates(APP_VERSION)
+            # 检查更新（手动检查时忽略检查间隔）
+            has_update, latest_version, download_url, changelog, is_exe_update = check_for_updates(
+                APP_VERSION, self.update_cache, os.path.join(get_app_dir(), UPDATE_CACHE_FILE),
+                force=is_manual_check)
 
             # 如果是手动检查，更新进度条
             if is_manual_check:
@@ -1434,7 +3800,7 @@ class BOMComparerGUI:
                 self.root.after(0, lambda: messagebox.showinfo("检查更新",
                                                             f"当前版本 {APP_VERSION} 已是最新版本。"))
         except Exception as e:
-            print(f"检查更新时出错: {str(e)}")
+            logger.warning("检查更新时出错: %s", str(e))
             if is_manual_check:
                 self.update_progress(100, "检查更新失败")
                 self.root.after(0, lambda: messagebox.showerror("检查更新失败",
@@ -1538,9 +3904,13 @@ class BOMComparerGUI:
             # 在新线程中下载
             def download_thread():
                 try:
-                    # 下载文件
+                    # 下载文件，发布了SHA-256校验值时下载后校验
+                    expected_sha256 = find_release_checksum(self.update_cache.release, download_url)
+                    if not expected_sha256:
+                        logger.info("未找到发布的校验值，跳过文件校验")
                     success = download_with_resume(download_url, download_path,
-                                                 update_progress_callback, status_callback)
+                                                 update_progress_callback, status_callback,
+                                                 expected_sha256=expected_sha256)
 
                     # 如果下载成功
                     if success:
@@ -1797,10 +4167,22 @@ class BOMComparerGUI:
                                     activebackground="#d9d9d9", activeforeground="#1d1d1f")
         self.save_button.pack(side="left")
 
+        # 监视文件变化，在Excel中修改并保存BOM后自动重新对比
+        self.watch_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(left_buttons, text="监视文件变化", variable=self.watch_var,
+                        command=self.toggle_watch).pack(side="left", padx=(10, 0))
+
         # 右侧辅助按钮
         right_buttons = ttk.Frame(actions_frame)
         right_buttons.pack(side="right")
 
+        # 列投影模式下，按需加载完整表格
+        self.full_sheet_button = tk.Button(right_buttons, text="显示全部列", command=self.show_full_sheet,
+                                          bg="#e6e6e6", fg="#1d1d1f", font=self.default_font,
+                                          relief="flat", padx=8, pady=3,
+                                          activebackground="#d9d9d9", activeforeground="#1d1d1f")
+        self.full_sheet_button.pack(side="right")
+
         # 结果显示区域
         result_card = ttk.LabelFrame(bottom_frame, text="对比结果")
         result_card.pack(fill="both", expand=True, pady=1)  # 从2减小到1
@@ -1845,7 +4227,8 @@ class BOMComparerGUI:
         self.result_text.insert(tk.END, welcome_text)
 
         # 添加文本标签的悬停效果
-        for button in [self.help_button, self.about_button, self.compare_button, self.save_button, self.settings_button, self.update_button]:
+        for button in [self.help_button, self.about_button, self.compare_button, self.save_button, self.settings_button, self.update_button,
+                       self.full_sheet_button]:
             button.bind("<Enter>", self.on_button_hover)
             button.bind("<Leave>", self.on_button_leave)
 
@@ -1901,70 +4284,22 @@ class BOMComparerGUI:
 
     def select_file_a(self):
         """选择基准BOM文件"""
-        file_path = filedialog.askopenfilename(
-            title="选择基准BOM文件",
-            filetypes=[("Excel文件", "*.xlsx;*.xls"), ("所有文件", "*.*")],
-            initialdir=self.last_dir
-        )
-        if file_path:
-            self.file_a_entry.delete(0, tk.END)
-            self.file_a_entry.insert(0, file_path)
-            self.last_dir = os.path.dirname(file_path)
-
-            try:
-                self.update_progress(0, "加载BOM A文件...")
-                # 加载BOM数据并显示在表格中
-                bom_data = self.comparer.load_bom(file_path)
-
-                # 清空已有数据和列
-                for item in self.bom_a_tree.get_children():
-                    self.bom_a_tree.delete(item)
-
-                # 重新配置列 - 动态创建以匹配原始数据
-                columns = list(bom_data.columns)
-
-                # 更新表格列配置
-                self.bom_a_tree.configure(columns=columns)
-
-                # 清除所有表头
-                for col in self.bom_a_tree["columns"]:
-                    self.bom_a_tree.heading(col, text="")
-
-                # 设置新的表头
-                for col in columns:
-                    self.bom_a_tree.heading(col, text=col)
-                    # 预设列宽 - 根据列名长度设置初始宽度，为Item和Quantity列设置较小的宽度
-                    if col == 'Item' or col == 'Quantity':
-                        width = 80  # 为Item和Quantity列设置固定宽度
-                    else:
-                        width = max(100, tk_font.Font().measure(str(col)) + 20)
-                    self.bom_a_tree.column(col, width=width, anchor="center", stretch=True, minwidth=80)
-
-                # 添加数据到表格 - 使用循环分批添加，避免大文件导致的卡顿
-                total_rows = len(bom_data)
-                batch_size = 200
-                batches = (total_rows + batch_size - 1) // batch_size  # 计算需要多少批
-
-                for batch in range(batches):
-                    start_idx = batch * batch_size
-                    end_idx = min((batch + 1) * batch_size, total_rows)
-                    batch_data = bom_data.iloc[start_idx:end_idx]
-
-                    for i, row in batch_data.iterrows():
-                        values = [str(row.get(col, "")) for col in columns]
-                        # 交替行颜色样式
-                        tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-                        self.bom_a_tree.insert("", "end", values=values, tags=(tag,))
-
-                    # 更新进度
-                    progress = int((batch + 1) / batches * 100)
-                    self.update_progress(progress, f"加载BOM A文件... ({end_idx}/{total_rows})")
-
-                    # 允许GUI刷新
-                    self.root.update_idletasks()
+        file_path = filedialog.askopenfilename(
+            title="选择基准BOM文件",
+            filetypes=[("BOM文件", "*.xlsx;*.xls;*.csv;*.tsv;*.txt;*.parquet"), ("Excel文件", "*.xlsx;*.xls"),
+                       ("CSV文件", "*.csv;*.tsv;*.txt"), ("所有文件", "*.*")],
+            initialdir=self.last_dir
+        )
+        if file_path:
+            self.file_a_entry.delete(0, tk.END)
+            self.file_a_entry.insert(0, file_path)
+            self.last_dir = os.path.dirname(file_path)
 
-                # 优化列宽
-                self.comparer.optimize_column_widths(self.bom_a_tree, bom_data, columns)
+            try:
+                self.update_progress(0, "加载BOM A文件...")
+                # 加载BOM数据并显示在表格中
+                bom_data = self.comparer.load_bom(file_path)
+                self._populate_bom_tree(self.bom_a_tree, bom_data, "BOM A")
 
                 # 保存BOM数据
                 self.comparer.bom_a = bom_data
@@ -1973,6 +4308,9 @@ class BOMComparerGUI:
                 if hasattr(self.comparer, 'bom_b') and self.comparer.bom_b is not None:
                     self.sync_column_widths()
 
+                # 保存新识别的表头，下次加载同一模板的文件时直接复用
+                self.save_header_cache()
+
                 self.update_progress(100, "BOM A文件加载完成")
 
             except Exception as e:
@@ -1992,7 +4330,8 @@ class BOMComparerGUI:
         """选择对比BOM文件"""
         file_path = filedialog.askopenfilename(
             title="选择对比BOM文件",
-            filetypes=[("Excel文件", "*.xlsx;*.xls"), ("所有文件", "*.*")],
+            filetypes=[("BOM文件", "*.xlsx;*.xls;*.csv;*.tsv;*.txt;*.parquet"), ("Excel文件", "*.xlsx;*.xls"),
+                       ("CSV文件", "*.csv;*.tsv;*.txt"), ("所有文件", "*.*")],
             initialdir=self.last_dir
         )
         if file_path:
@@ -2004,56 +4343,7 @@ class BOMComparerGUI:
                 self.update_progress(0, "加载BOM B文件...")
                 # 加载BOM数据并显示在表格中
                 bom_data = self.comparer.load_bom(file_path)
-
-                # 清空已有数据和列
-                for item in self.bom_b_tree.get_children():
-                    self.bom_b_tree.delete(item)
-
-                # 重新配置列 - 动态创建以匹配原始数据
-                columns = list(bom_data.columns)
-
-                # 更新表格列配置
-                self.bom_b_tree.configure(columns=columns)
-
-                # 清除所有表头
-                for col in self.bom_b_tree["columns"]:
-                    self.bom_b_tree.heading(col, text="")
-
-                # 设置新的表头
-                for col in columns:
-                    self.bom_b_tree.heading(col, text=col)
-                    # 预设列宽 - 根据列名长度设置初始宽度，为Item和Quantity列设置较小的宽度
-                    if col == 'Item' or col == 'Quantity':
-                        width = 80  # 为Item和Quantity列设置固定宽度
-                    else:
-                        width = max(100, tk_font.Font().measure(str(col)) + 20)
-                    self.bom_b_tree.column(col, width=width, anchor="center", stretch=True, minwidth=80)
-
-                # 添加数据到表格 - 使用循环分批添加，避免大文件导致的卡顿
-                total_rows = len(bom_data)
-                batch_size = 200
-                batches = (total_rows + batch_size - 1) // batch_size  # 计算需要多少批
-
-                for batch in range(batches):
-                    start_idx = batch * batch_size
-                    end_idx = min((batch + 1) * batch_size, total_rows)
-                    batch_data = bom_data.iloc[start_idx:end_idx]
-
-                    for i, row in batch_data.iterrows():
-                        values = [str(row.get(col, "")) for col in columns]
-                        # 交替行颜色样式
-                        tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-                        self.bom_b_tree.insert("", "end", values=values, tags=(tag,))
-
-                    # 更新进度
-                    progress = int((batch + 1) / batches * 100)
-                    self.update_progress(progress, f"加载BOM B文件... ({end_idx}/{total_rows})")
-
-                    # 允许GUI刷新
-                    self.root.update_idletasks()
-
-                # 优化列宽
-                self.comparer.optimize_column_widths(self.bom_b_tree, bom_data, columns)
+                self._populate_bom_tree(self.bom_b_tree, bom_data, "BOM B")
 
                 # 保存BOM数据
                 self.comparer.bom_b = bom_data
@@ -2062,6 +4352,9 @@ class BOMComparerGUI:
                 if hasattr(self.comparer, 'bom_a') and self.comparer.bom_a is not None:
                     self.sync_column_widths()
 
+                # 保存新识别的表头，下次加载同一模板的文件时直接复用
+                self.save_header_cache()
+
                 self.update_progress(100, "BOM B文件加载完成")
 
             except Exception as e:
@@ -2077,6 +4370,207 @@ class BOMComparerGUI:
                 # 重置进度条
                 self.update_progress(0)
 
+    def _populate_bom_tree(self, tree, bom_data, label):
+        """将BOM数据显示到表格中
+
+        Args:
+            tree: BOM表格树控件
+            bom_data: BOM数据DataFrame
+            label: 进度信息中显示的名称，如"BOM A"
+        """
+        # 清空已有数据和列
+        for item in tree.get_children():
+            tree.delete(item)
+
+        # 重新配置列 - 动态创建以匹配原始数据
+        columns = list(bom_data.columns)
+
+        # 更新表格列配置
+        tree.configure(columns=columns)
+
+        # 清除所有表头
+        for col in tree["columns"]:
+            tree.heading(col, text="")
+
+        # 设置新的表头
+        for col in columns:
+            tree.heading(col, text=col)
+            # 预设列宽 - 根据列名长度设置初始宽度，为Item和Quantity列设置较小的宽度
+            if col == 'Item' or col == 'Quantity':
+                width = 80  # 为Item和Quantity列设置固定宽度
+            else:
+                width = max(100, tk_font.Font().measure(str(col)) + 20)
+            tree.column(col, width=width, anchor="center", stretch=True, minwidth=80)
+
+        # 添加数据到表格 - 使用循环分批添加，避免大文件导致的卡顿
+        total_rows = len(bom_data)
+        batch_size = 200
+        batches = (total_rows + batch_size - 1) // batch_size  # 计算需要多少批
+
+        for batch in range(batches):
+            start_idx = batch * batch_size
+            end_idx = min((batch + 1) * batch_size, total_rows)
+            batch_data = bom_data.iloc[start_idx:end_idx]
+
+            for i, row in batch_data.iterrows():
+                values = [str(row.get(col, "")) for col in columns]
+                # 交替行颜色样式
+                tag = 'evenrow' if i % 2 == 0 else 'oddrow'
+                tree.insert("", "end", values=values, tags=(tag,))
+
+            # 更新进度
+            progress = int((batch + 1) / batches * 100)
+            self.update_progress(progress, f"加载{label}文件... ({end_idx}/{total_rows})")
+
+            # 允许GUI刷新
+            self.root.update_idletasks()
+
+        # 优化列宽
+        self.comparer.optimize_column_widths(tree, bom_data, columns)
+
+    def _update_bom_tree(self, tree, old_data, new_data, label):
+        """增量更新BOM表格：按行哈希对比新旧数据，只修改、插入或删除有变化的行
+
+        列发生变化或表格内容与旧数据不对应时重新填充整个表格。
+
+        Returns:
+            int: 修改的行数
+        """
+        columns = list(new_data.columns)
+        items = tree.get_children()
+        if list(old_data.columns) != columns or list(tree["columns"]) != columns or len(items) != len(old_data):
+            self._populate_bom_tree(tree, new_data, label)
+            return len(new_data)
+
+        def row_values(row_idx):
+            row = new_data.iloc[row_idx]
+            return [str(row.get(col, "")) for col in columns]
+
+        matcher = difflib.SequenceMatcher(None, row_hashes(old_data).tolist(), row_hashes(new_data).tolist(),
+                                          autojunk=False)
+        touched = 0
+        # 从后向前处理，前面的行位置不受插入和删除影响
+        for op, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if op == 'equal':
+                continue
+            common = min(i2 - i1, j2 - j1)
+            for k in range(common):
+                tree.item(items[i1 + k], values=row_values(j1 + k))
+            if i2 - i1 > common:
+                tree.delete(*items[i1 + common:i2])
+            for k in range(j1 + common, j2):
+                tag = 'evenrow' if k % 2 == 0 else 'oddrow'
+                tree.insert("", i1 + k - j1, values=row_values(k), tags=(tag,))
+            touched += max(i2 - i1, j2 - j1)
+
+        logger.info("%s表格增量更新: %s行", label, touched)
+        return touched
+
+    def toggle_watch(self):
+        """开启或关闭监视模式"""
+        if self.watch_job is not None:
+            self.root.after_cancel(self.watch_job)
+            self.watch_job = None
+        self.file_watcher.clear()
+
+        if self.watch_var.get():
+            self.status_var.set("正在监视BOM文件变化...")
+            self.watch_job = self.root.after(WATCH_POLL_INTERVAL_MS, self.poll_watched_files)
+        else:
+            self.status_var.set("已停止监视BOM文件")
+
+    def poll_watched_files(self):
+        """监视模式：定时检查BOM文件，文件保存完成后重新加载并自动对比"""
+        self.watch_job = None
+        if not self.watch_var.get():
+            return
+
+        # 正在对比时推迟检查，文件变化会在下次检查时处理
+        compare_thread = getattr(self, 'compare_thread', None)
+        if compare_thread is None or not compare_thread.is_alive():
+            paths = {'bom_a': self.file_a_entry.get().strip(), 'bom_b': self.file_b_entry.get().strip()}
+
+            # 重新选择文件后以新文件的当前状态为基准
+            watched = {path for path in paths.values() if path}
+            for path in set(self.file_watcher.signatures) - watched:
+                self.file_watcher.unwatch(path)
+            for path in watched - set(self.file_watcher.signatures):
+                self.file_watcher.watch(path)
+
+            changed = self.file_watcher.poll()
+            if changed:
+                self.reload_changed_files(paths, changed)
+
+        self.watch_job = self.root.after(WATCH_POLL_INTERVAL_MS, self.poll_watched_files)
+
+    def reload_changed_files(self, paths, changed):
+        """重新加载已修改的BOM文件，增量更新表格并重新对比
+
+        Args:
+            paths: {'bom_a': 路径, 'bom_b': 路径}
+            changed: FileWatcher.poll返回的已修改文件
+        """
+        targets = (('bom_a', self.bom_a_tree, "BOM A"), ('bom_b', self.bom_b_tree, "BOM B"))
+        reloaded = False
+        for attr, tree, label in targets:
+            if paths[attr] not in changed:
+                continue
+            try:
+                self.update_progress(0, f"{label}文件已修改，重新加载...")
+                bom_data = self.comparer.load_bom(paths[attr])
+            except Exception as e:
+                # 文件可能仍被占用或内容不完整，下次保存后重试
+                logger.warning("重新加载%s失败: %s", label, e)
+                self.update_progress(0, f"重新加载{label}失败: {e}")
+                continue
+
+            old_data = getattr(self.comparer, attr, None)
+            if old_data is None:
+                self._populate_bom_tree(tree, bom_data, label)
+            else:
+                self._update_bom_tree(tree, old_data, bom_data, label)
+            setattr(self.comparer, attr, bom_data)
+            reloaded = True
+
+        if not reloaded:
+            return
+
+        self.save_header_cache()
+        self.update_progress(100, "BOM文件已重新加载")
+        if getattr(self.comparer, 'bom_a', None) is not None and getattr(self.comparer, 'bom_b', None) is not None:
+            self.start_compare(keep_view=True)
+
+    def show_full_sheet(self):
+        """按需加载完整表格（包括未映射的列）并显示在BOM数据区
+
+        仅用于查看，对比仍使用已加载的关键列数据。
+        """
+        targets = [
+            (self.file_a_entry.get().strip(), self.bom_a_tree, "BOM A"),
+            (self.file_b_entry.get().strip(), self.bom_b_tree, "BOM B")
+        ]
+
+        loaded = False
+        for file_path, tree, label in targets:
+            if not file_path or not os.path.exists(file_path):
+                continue
+            try:
+                self.update_progress(0, f"加载{label}完整表格...")
+                full_data = self.comparer.load_bom(file_path, projection=False)
+                self._populate_bom_tree(tree, full_data, label)
+                loaded = True
+            except Exception as e:
+                self.show_error(f"加载{label}完整表格失败: {str(e)}")
+                self.update_progress(0)
+                return
+
+        if not loaded:
+            messagebox.showinfo("提示", "请先选择BOM文件")
+            return
+
+        self.sync_column_widths()
+        self.update_progress(100, "完整表格加载完成")
+
     def sync_column_widths(self):
         """同步两个BOM表格的列宽，以便更好地对比"""
         # 确保两个表都已加载
@@ -2128,8 +4622,12 @@ class BOMComparerGUI:
             self.status_var.set(message)
         self.root.update_idletasks()
 
-    def start_compare(self):
-        """开始比较两个BOM文件"""
+    def start_compare(self, keep_view=False):
+        """开始比较两个BOM文件
+
+        Args:
+            keep_view: 为True时（监视模式自动重新对比）对比期间保留旧结果，完成后保持结果的滚动位置
+        """
         # 获取文件路径
         file_a = self.file_a_entry.get().strip()
         file_b = self.file_b_entry.get().strip()
@@ -2146,9 +4644,10 @@ class BOMComparerGUI:
         self.compare_button["state"] = "disabled"
 
         # 清空之前的结果
-        self.result_text.config(state="normal")
-        self.result_text.delete(1.0, tk.END)
-        self.result_text.config(state="disabled")
+        if not keep_view:
+            self.result_text.config(state="normal")
+            self.result_text.delete(1.0, tk.END)
+            self.result_text.config(state="disabled")
 
         # 重置进度条
         self.progress_var.set(0)
@@ -2161,11 +4660,11 @@ class BOMComparerGUI:
         self.progress_text.config(text="比较中...")
 
         # 在单独的线程中执行比较操作，以避免阻塞GUI
-        self.compare_thread = threading.Thread(target=self.run_compare)
+        self.compare_thread = threading.Thread(target=self.run_compare, args=(keep_view,))
         self.compare_thread.daemon = True  # 设置为守护线程，这样主程序退出时线程也会结束
         self.compare_thread.start()
 
-    def run_compare(self):
+    def run_compare(self, keep_view=False):
         """在单独的线程中执行比较操作"""
         try:
             # 获取文件路径
@@ -2173,40 +4672,40 @@ class BOMComparerGUI:
             file_b = self.file_b_entry.get().strip()
 
             # 输出调试信息
-            print(f"开始比较文件: \nA: {file_a}\nB: {file_b}")
+            logger.info("开始比较文件: \nA: %s\nB: %s", file_a, file_b)
 
             # 检查是否已经有加载好的BOM数据
             if hasattr(self.comparer, 'bom_a') and hasattr(self.comparer, 'bom_b') and \
                self.comparer.bom_a is not None and self.comparer.bom_b is not None:
                 # 使用已加载的数据进行比较
-                print("使用已加载的数据进行比较...")
-                print(f"BOM A 数据行数: {len(self.comparer.bom_a)}")
-                print(f"BOM B 数据行数: {len(self.comparer.bom_b)}")
+                logger.debug("使用已加载的数据进行比较...")
+                logger.debug("BOM A 数据行数: %s", len(self.comparer.bom_a))
+                logger.debug("BOM B 数据行数: %s", len(self.comparer.bom_b))
                 self.update_progress(10, "使用已加载的数据进行比较...")
                 result = self.comparer.compare(self.comparer.bom_a, self.comparer.bom_b, is_dataframe=True)
             else:
                 # 从文件加载数据进行比较
-                print("从文件加载数据进行比较...")
+                logger.debug("从文件加载数据进行比较...")
                 self.update_progress(10, "从文件加载数据...")
                 result = self.comparer.compare(file_a, file_b)
 
             # 检查结果是否为空
             if not result or len(result.strip()) == 0:
                 error_message = "比较结果为空，请检查BOM文件是否有内容"
-                print(error_message)
+                logger.error("%s", error_message)
                 self.root.after(0, lambda: self.show_error(error_message))
                 return
 
-            print(f"比较完成，结果长度: {len(result)}")
+            logger.info("比较完成，结果长度: %s", len(result))
             # 输出结果的前100个字符，帮助调试
-            print(f"结果预览: {result[:100]}...")
+            logger.debug("结果预览: %s...", result[:100])
 
             # 在主线程中显示结果
-            self.root.after(0, lambda: self.show_result(result))
+            self.root.after(0, lambda: self.show_result(result, keep_view))
 
         except Exception as e:
             error_message = f"比较过程中出错: {str(e)}"
-            print(f"错误详情: {error_message}")
+            logger.error("错误详情: %s", error_message)
             traceback.print_exc()
             # 在主线程中显示错误
             self.root.after(0, lambda: self.show_error(error_message))
@@ -2214,8 +4713,15 @@ class BOMComparerGUI:
             # 恢复按钮状态
             self.root.after(0, lambda: self.compare_button.config(state="normal"))
 
-    def show_result(self, result):
-        """显示比较结果"""
+    def show_result(self, result, keep_view=False):
+        """显示比较结果
+
+        Args:
+            result: 对比报告文本
+            keep_view: 为True时保持原来的滚动位置（监视模式自动重新对比）
+        """
+        view_top = self.result_text.yview()[0] if keep_view else 0.0
+
         # 确保文本控件处于可编辑状态
         self.result_text.config(state="normal")
 
@@ -2223,9 +4729,9 @@ class BOMComparerGUI:
         self.result_text.delete(1.0, tk.END)
 
         # 打印调试信息
-        print(f"显示结果，长度: {len(result)}")
-        print(f"结果包含新增位号信息: {'新增位号' in result}")
-        print(f"结果包含移除位号信息: {'移除位号' in result}")
+        logger.debug("显示结果，长度: %s", len(result))
+        logger.debug("结果包含新增位号信息: %s", '新增位号' in result)
+        logger.debug("结果包含移除位号信息: %s", '移除位号' in result)
 
         if not result:
             self.result_text.insert(tk.END, "未生成有效的比较结果，请检查输入文件")
@@ -2243,8 +4749,11 @@ class BOMComparerGUI:
         # 为不同部分设置不同的文本颜色
         self.highlight_text()
 
-        # 滚动到顶部
-        self.result_text.see("1.0")
+        # 滚动到顶部（或恢复原来的位置）
+        if keep_view:
+            self.result_text.yview_moveto(view_top)
+        else:
+            self.result_text.see("1.0")
 
         # 保持文本可见但禁止编辑
         self.result_text.config(state="disabled")
@@ -2452,56 +4961,10 @@ class BOMComparerGUI:
             content (str): 对比结果文本内容
         """
         try:
-            # 需要导入pandas库
-            import pandas as pd
             # 引用全局os和subprocess模块
             global os, subprocess
 
-            # 创建Excel写入器
-            with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-                # 将文本内容按行分割
-                lines = content.strip().split('\n')
-
-                # 创建数据列表，用于存储行数据
-                data = []
-
-                # 当前处理的部分标题
-                current_section = ""
-
-                # 处理每一行
-                for line in lines:
-                    # 跳过空行
-                    if not line.strip():
-                        # 添加空行
-                        data.append({"内容": ""})
-                        continue
-
-                    # 检查是否为标题行（通常是以===或者大标题样式显示的）
-                    if line.startswith('==') or line.startswith('--') or line.endswith('==') or line.endswith('--'):
-                        continue
-
-                    # 检查是否为分节标题
-                    if line.startswith('【') and line.endswith('】'):
-                        # 添加一个空行，使标题与上下内容分开
-                        if data and data[-1]["内容"] != "":
-                            data.append({"内容": ""})
-
-                        current_section = line
-                        data.append({"内容": line})
-                    # 正常内容行
-                    else:
-                        data.append({"内容": line})
-
-                # 创建DataFrame并写入Excel
-                df = pd.DataFrame(data)
-                df.to_excel(writer, sheet_name="BOM对比结果", index=False)
-
-                # 获取工作表并调整列宽
-                workbook = writer.book
-                worksheet = writer.sheets['BOM对比结果']
-
-                # 设置列宽 - 只有一列，所以设置A列宽度
-                worksheet.column_dimensions['A'].width = 100
+            write_report_workbook(content, file_path)
 
             self.status_var.set(f"结果已保存至Excel文件: {file_path}")
             messagebox.showinfo("成功", "对比结果已成功保存为Excel文件")
@@ -2642,8 +5105,8 @@ class BOMComparerGUI:
 
 基本步骤:
 1. 选择基准BOM(A)和对比BOM(B)文件
-   - 使用"浏览"按钮选择Excel格式的BOM文件
-   - 支持的格式: .xlsx, .xls
+   - 使用"浏览"按钮选择BOM文件
+   - 支持的格式: .xlsx, .xls, .csv, .tsv, .parquet
 
 2. 点击"开始对比"按钮
    - 系统将自动分析两个文件的差异
@@ -2817,6 +5280,10 @@ class BOMComparerGUI:
                 ttk.Label(field_frame, text="描述", foreground="#777").grid(row=0, column=2, sticky="w")
             elif field == 'MPN':
                 ttk.Label(field_frame, text="厂家料号", foreground="#777").grid(row=0, column=2, sticky="w")
+            elif field == 'Level':
+                ttk.Label(field_frame, text="层级（多层级BOM，可选）", foreground="#777").grid(row=0, column=2, sticky="w")
+            elif field == 'Quantity':
+                ttk.Label(field_frame, text="用量（无位号物料，可选）", foreground="#777").grid(row=0, column=2, sticky="w")
 
             row += 1
 
@@ -2837,6 +5304,41 @@ class BOMComparerGUI:
         mpn_help_text = "说明：取消勾选此项将在报告中隐藏物料料号(MPN)信息，使报告更简洁。"
         ttk.Label(report_frame, text=mpn_help_text, wraplength=500, foreground="#555", justify="left").pack(anchor=tk.W, pady=5)
 
+        # 列投影选项
+        self.column_projection_var = tk.BooleanVar(value=self.comparer.column_projection)
+        projection_check = ttk.Checkbutton(report_frame, text="仅加载关键列（加快大型BOM的加载）", variable=self.column_projection_var)
+        projection_check.pack(anchor=tk.W, pady=5)
+
+        projection_help_text = "说明：勾选后只读取料号、位号、描述、MPN和序号列，可通过\"显示全部列\"按钮查看完整表格。"
+        ttk.Label(report_frame, text=projection_help_text, wraplength=500, foreground="#555", justify="left").pack(anchor=tk.W, pady=5)
+
+        # 多工作表选项
+        self.multi_sheet_var = tk.BooleanVar(value=self.comparer.multi_sheet)
+        multi_sheet_check = ttk.Checkbutton(report_frame, text="读取所有BOM工作表（SMT、DIP、结构件分表的工作簿）", variable=self.multi_sheet_var)
+        multi_sheet_check.pack(anchor=tk.W, pady=5)
+
+        # 内存预算选项
+        budget_frame = ttk.Frame(report_frame)
+        budget_frame.pack(anchor=tk.W, pady=5)
+        ttk.Label(budget_frame, text="内存预算(MB):").pack(side=tk.LEFT)
+        self.memory_budget_var = tk.StringVar(value=str(self.comparer.memory_budget_mb))
+        ttk.Entry(budget_frame, textvariable=self.memory_budget_var, width=8).pack(side=tk.LEFT, padx=5)
+
+        budget_help_text = "说明：预计内存占用超出预算时，对比改用临时磁盘文件进行（速度较慢，但可避免内存不足），0表示不限制。"
+        ttk.Label(report_frame, text=budget_help_text, wraplength=500, foreground="#555", justify="left").pack(anchor=tk.W, pady=5)
+
+        # 日志选项
+        self.debug_logging_var = tk.BooleanVar(value=self.debug_logging)
+        debug_check = ttk.Checkbutton(report_frame, text="输出调试日志", variable=self.debug_logging_var)
+        debug_check.pack(anchor=tk.W, pady=5)
+
+        self.log_to_file_var = tk.BooleanVar(value=self.log_to_file)
+        log_file_check = ttk.Checkbutton(report_frame, text=f"将日志写入文件（{LOG_FILE}）", variable=self.log_to_file_var)
+        log_file_check.pack(anchor=tk.W, pady=5)
+
+        log_help_text = "说明：调试日志会记录双击定位、高亮等操作的详细过程，仅在排查问题时开启，开启后大型BOM的操作会变慢。"
+        ttk.Label(report_frame, text=log_help_text, wraplength=500, foreground="#555", justify="left").pack(anchor=tk.W, pady=5)
+
         # 底部按钮区域
         button_frame = ttk.Frame(settings_window)
         button_frame.pack(fill="x", padx=20, pady=15)
@@ -2882,22 +5384,47 @@ class BOMComparerGUI:
                     'P/N': ['P/N', '料号', '物料编码', '物料编号', 'Part Number', '型号'],
                     'Reference': ['Reference', 'Ref', 'ref', '位号'],
                     'Description': ['Description', '描述', '物料描述'],
-                    'MPN': ['Manufacturer P/N', 'MPN', '制造商料号', '厂家料号', '生产商料号']
+                    'MPN': ['Manufacturer P/N', 'MPN', '制造商料号', '厂家料号', '生产商料号'],
+                    'Level': ['Level', 'BOM Level', '层级', '阶层'],
+                    'Quantity': ['Quantity', 'Qty', '数量', '用量']
                 }
                 new_field_mappings[field] = default_mappings.get(field, [])
 
         # 更新比较器的字段映射
         self.comparer.set_field_mappings(new_field_mappings)
 
-        # 保存MPN显示设置
+        # 保存MPN显示设置（只影响报告显示，差异结果可以复用）
+        show_mpn_changed = self.comparer.show_mpn_in_report != self.show_mpn_var.get()
         self.comparer.show_mpn_in_report = self.show_mpn_var.get()
 
+        # 保存列投影设置
+        self.comparer.column_projection = self.column_projection_var.get()
+
+        # 保存多工作表设置
+        self.comparer.multi_sheet = self.multi_sheet_var.get()
+
+        # 保存内存预算设置（无效输入时保持原值）
+        try:
+            self.comparer.memory_budget_mb = max(0, int(self.memory_budget_var.get().strip() or 0))
+        except ValueError:
+            logger.warning("无效的内存预算: %s", self.memory_budget_var.get())
+
+        # 保存并应用日志设置
+        self.debug_logging = self.debug_logging_var.get()
+        self.log_to_file = self.log_to_file_var.get()
+        setup_logging(self.debug_logging, self.log_to_file)
+
         # 保存到配置文件
         self.save_config_to_file()
 
         # 直接关闭窗口，不显示确认对话框
         window.destroy()
 
+        # 已有对比结果时按新的显示设置重新生成报告（命中对比结果缓存，无需重新计算差异）
+        if show_mpn_changed and str(self.save_button['state']) == tk.NORMAL and \
+           self.comparer.bom_a is not None and self.comparer.bom_b is not None:
+            self.start_compare()
+
     def reset_default_mappings(self):
         """重置为默认的字段映射"""
         default_mappings = {
@@ -2905,7 +5432,9 @@ class BOMComparerGUI:
             'P/N': ['P/N', '料号', '物料编码', '物料编号', 'Part Number', '型号'],
             'Reference': ['Reference', 'Ref', 'ref', '位号'],
             'Description': ['Description', '描述', '物料描述'],
-            'MPN': ['Manufacturer P/N', 'MPN', '制造商料号', '厂家料号', '生产商料号']
+            'MPN': ['Manufacturer P/N', 'MPN', '制造商料号', '厂家料号', '生产商料号'],
+            'Level': ['Level', 'BOM Level', '层级', '阶层'],
+            'Quantity': ['Quantity', 'Qty', '数量', '用量']
         }
 
         # 重置输入框的内容
@@ -2932,6 +5461,13 @@ class BOMComparerGUI:
             config_data = {
                 "field_mappings": self.comparer.field_mappings,
                 "show_mpn_in_report": self.comparer.show_mpn_in_report,
+                "column_projection": self.comparer.column_projection,
+                "multi_sheet": self.comparer.multi_sheet,
+                "profile_mode": self.comparer.profile_mode,
+                "memory_budget_mb": self.comparer.memory_budget_mb,
+                "http_timeouts": dict(HTTP_TIMEOUTS),
+                "debug_logging": self.debug_logging,
+                "log_to_file": self.log_to_file,
                 "last_dir": self.last_dir
             }
 
@@ -2939,12 +5475,20 @@ class BOMComparerGUI:
             with open(config_file, "w", encoding="utf-8") as f:
                 json.dump(config_data, f, ensure_ascii=False, indent=4)
 
-            print(f"配置已保存到 {config_file}")
+            # 保存表头签名缓存
+            self.save_header_cache()
+
+            logger.info("配置已保存到 %s", config_file)
             return True
         except Exception as e:
-            print(f"保存配置文件失败: {e}")
+            logger.error("保存配置文件失败: %s", e)
             return False
 
+    def save_header_cache(self):
+        """保存表头签名缓存（仅在有修改时写入文件）"""
+        if self.comparer.header_cache.dirty:
+            self.comparer.header_cache.save(os.path.join(get_app_dir(), HEADER_CACHE_FILE))
+
     def load_config_from_file(self):
         """从文件加载配置"""
         try:
@@ -2959,19 +5503,22 @@ class BOMComparerGUI:
             # 配置文件路径（从程序目录加载）
             config_file = os.path.join(script_dir, "config.json")
 
+            # 加载表头签名缓存（与配置文件在同一目录，没有配置文件或配置文件损坏时也加载）
+            self.comparer.header_cache.load(os.path.join(script_dir, HEADER_CACHE_FILE))
+
             # 读取配置文件
             if os.path.exists(config_file):
                 with open(config_file, 'r', encoding='utf-8') as f:
                     config_data = json.load(f)
-                print(f"配置已从 {config_file} 加载")
+                logger.info("配置已从 %s 加载", config_file)
             else:
-                print(f"未找到配置文件 {config_file}，使用默认设置")
+                logger.info("未找到配置文件 %s，使用默认设置", config_file)
                 return
 
             # 设置字段映射
             if "field_mappings" in config_data:
                 # 定义有效的字段列表
-                valid_fields = ['Item', 'P/N', 'Reference', 'Description', 'MPN']
+                valid_fields = ['Item', 'P/N', 'Reference', 'Description', 'MPN', 'Level', 'Quantity']
                 new_field_mappings = {}
 
                 # 处理配置文件中的字段映射
@@ -2992,12 +5539,41 @@ class BOMComparerGUI:
             if "show_mpn_in_report" in config_data:
                 self.comparer.show_mpn_in_report = config_data["show_mpn_in_report"]
 
+            # 设置列投影选项
+            if "column_projection" in config_data:
+                self.comparer.column_projection = config_data["column_projection"]
+
+            # 设置多工作表选项
+            if "multi_sheet" in config_data:
+                self.comparer.multi_sheet = config_data["multi_sheet"]
+
+            # 设置内存预算
+            if "memory_budget_mb" in config_data:
+                self.comparer.memory_budget_mb = config_data["memory_budget_mb"]
+
+            # 设置更新相关网络请求的超时
+            if "http_timeouts" in config_data:
+                try:
+                    set_http_timeouts(**config_data["http_timeouts"])
+                except (TypeError, ValueError) as e:
+                    logger.warning("无效的网络超时设置: %s", e)
+
+            # 设置性能分析模式（None、"cprofile"或"tracemalloc"）
+            if "profile_mode" in config_data:
+                self.comparer.profile_mode = config_data["profile_mode"]
+
+            # 设置日志选项
+            self.debug_logging = config_data.get("debug_logging", False)
+            self.log_to_file = config_data.get("log_to_file", False)
+            if self.debug_logging or self.log_to_file:
+                setup_logging(self.debug_logging, self.log_to_file)
+
             # 设置最后打开的目录
             if "last_dir" in config_data:
                 self.last_dir = config_data["last_dir"]
 
         except Exception as e:
-            print(f"加载配置时出错: {str(e)}")
+            logger.error("加载配置时出错: %s", str(e))
             # 这里不弹出错误消息，因为这不是关键功能
 
     def on_close(self):
@@ -3029,12 +5605,12 @@ class BOMComparerGUI:
                     # 清理后保存到程序目录
                     self._clean_config_file(user_config_file)
                     os.remove(user_config_file)
-                    print(f"已移除旧配置文件: {user_config_file}")
+                    logger.info("已移除旧配置文件: %s", user_config_file)
                 except:
                     pass
 
         except Exception as e:
-            print(f"清理配置文件时出错: {str(e)}")
+            logger.error("清理配置文件时出错: %s", str(e))
 
     def _clean_config_file(self, file_path):
         """清理指定的配置文件"""
@@ -3046,7 +5622,7 @@ class BOMComparerGUI:
             # 如果包含字段映射
             if "field_mappings" in config_data:
                 # 定义有效的字段列表
-                valid_fields = ['Item', 'P/N', 'Reference', 'Description', 'MPN']
+                valid_fields = ['Item', 'P/N', 'Reference', 'Description', 'MPN', 'Level', 'Quantity']
                 new_field_mappings = {}
 
                 # 处理配置文件中的字段映射
@@ -3062,9 +5638,9 @@ class BOMComparerGUI:
                 with open(file_path, 'w', encoding='utf-8') as f:
                     json.dump(config_data, f, ensure_ascii=False, indent=4)
 
-                print(f"已清理配置文件: {file_path}")
+                logger.info("已清理配置文件: %s", file_path)
         except Exception as e:
-            print(f"清理配置文件 {file_path} 时出错: {str(e)}")
+            logger.error("清理配置文件 %s 时出错: %s", file_path, str(e))
 
     def create_bom_table(self, parent_frame, is_bom_a=True):
         """创建BOM数据显示表格"""
@@ -3143,7 +5719,7 @@ class BOMComparerGUI:
             return False
 
         # 打印调试信息
-        print(f"检查料号是否有效: {pn}")
+        logger.debug("检查料号是否有效: %s", pn)
 
         # 在A中查找该料号，使用精确匹配
         found_a = (self.comparer.bom_a['P/N'].astype(str) == pn).any()
@@ -3158,7 +5734,7 @@ class BOMComparerGUI:
             found_b = self.comparer.bom_b['P/N'].astype(str).str.contains(pn, regex=False).any()
 
         result = found_a or found_b
-        print(f"料号{pn}在BOM中{'存在' if result else '不存在'}")
+        logger.debug("料号%s在BOM中%s", pn, '存在' if result else '不存在')
         return result
 
     def is_valid_mpn(self, mpn):
@@ -3204,8 +5780,8 @@ class BOMComparerGUI:
         line_end = f"{line_num}.end"
         line_text = self.result_text.get(line_start, line_end)
 
-        print(f"双击的行文本: {line_text}")
-        print(f"双击的位置: 行={line_num}, 列={col}")
+        logger.debug("双击的行文本: %s", line_text)
+        logger.debug("双击的位置: 行=%s, 列=%s", line_num, col)
 
         # 检查是否为新增、移除或变更位号的行
         is_added_ref = "新增:" in line_text or "新增位号:" in line_text
@@ -3226,7 +5802,7 @@ class BOMComparerGUI:
 
         # 特殊处理替代料行 - 高亮双击的特定料号
         if is_alternative:
-            print("检测到替代料行")
+            logger.debug("检测到替代料行")
             # 提取所有料号
             pn_matches = re.findall(pn_pattern, line_text)
 
@@ -3241,7 +5817,7 @@ class BOMComparerGUI:
                     if start_idx != -1:
                         # 计算与光标的距离
                         distance = abs(start_idx - col)
-                        print(f"料号: {pn}, 位置: {start_idx}, 距离光标: {distance}")
+                        logger.debug("料号: %s, 位置: %s, 距离光标: %s", pn, start_idx, distance)
                         if distance < min_distance:
                             min_distance = distance
                             closest_pn = pn
@@ -3249,7 +5825,7 @@ class BOMComparerGUI:
             # 如果找到了最接近的料号，使用它
             if closest_pn and min_distance < 15:  # 使用稍大的距离阈值
                 found_pn = closest_pn
-                print(f"在替代料行中找到最接近光标的料号: {found_pn}, 距离: {min_distance}")
+                logger.debug("在替代料行中找到最接近光标的料号: %s, 距离: %s", found_pn, min_distance)
 
                 # 直接高亮这个料号
                 self.clear_tree_highlights()  # 确保清除之前的高亮
@@ -3315,10 +5891,10 @@ class BOMComparerGUI:
                             found_in_b = True
 
                 if found_in_a or found_in_b:
-                    print(f"成功高亮显示替代料号: {found_pn}")
+                    logger.debug("成功高亮显示替代料号: %s", found_pn)
                     return
                 else:
-                    print(f"未能在任何树中找到并高亮替代料号: {found_pn}")
+                    logger.debug("未能在任何树中找到并高亮替代料号: %s", found_pn)
 
         # 特殊处理位号行 - 优先提取位号，然后查找对应物料信息
         if is_positions:
@@ -3408,7 +5984,7 @@ class BOMComparerGUI:
                 info_b, _ = self.find_reference_info(self.comparer.bom_b, found_ref)
                 if info_b:
                     actual_pn_b = info_b.get('P/N', '')
-                    print(f"位号{found_ref}在B BOM中的料号: {actual_pn_b}")
+                    logger.debug("位号%s在B BOM中的料号: %s", found_ref, actual_pn_b)
                     # 查找A中是否有相同料号的物料
                     info_a = self.find_pn_info(self.comparer.bom_a, actual_pn_b)
                     # 高亮显示
@@ -3419,7 +5995,7 @@ class BOMComparerGUI:
                 info_a, _ = self.find_reference_info(self.comparer.bom_a, found_ref)
                 if info_a:
                     actual_pn_a = info_a.get('P/N', '')
-                    print(f"位号{found_ref}在A BOM中的料号: {actual_pn_a}")
+                    logger.debug("位号%s在A BOM中的料号: %s", found_ref, actual_pn_a)
                     # 查找B中是否有相同料号的物料
                     info_b = self.find_pn_info(self.comparer.bom_b, actual_pn_a)
                     # 高亮显示
@@ -3433,11 +6009,11 @@ class BOMComparerGUI:
             # 如果位号在A中存在
             if info_a:
                 actual_pn_a = info_a.get('P/N', '')
-                print(f"位号{found_ref}在A BOM中的料号: {actual_pn_a}")
+                logger.debug("位号%s在A BOM中的料号: %s", found_ref, actual_pn_a)
                 # 如果位号在B中也存在
                 if info_b:
                     actual_pn_b = info_b.get('P/N', '')
-                    print(f"位号{found_ref}在B BOM中的料号: {actual_pn_b}")
+                    logger.debug("位号%s在B BOM中的料号: %s", found_ref, actual_pn_b)
                     # 高亮显示，使用实际料号
                     self.highlight_reference_in_trees(found_ref, actual_pn_a, actual_pn_b)
                 else:
@@ -3446,7 +6022,7 @@ class BOMComparerGUI:
             # 如果位号只在B中存在
             elif info_b:
                 actual_pn_b = info_b.get('P/N', '')
-                print(f"位号{found_ref}在B BOM中的料号: {actual_pn_b}")
+                logger.debug("位号%s在B BOM中的料号: %s", found_ref, actual_pn_b)
                 # 高亮B中的料号
                 self.highlight_reference_in_trees(found_ref, None, actual_pn_b)
             else:
@@ -3454,7 +6030,7 @@ class BOMComparerGUI:
                 self.highlight_reference_in_trees(found_ref)
         elif found_pn:
             # 双击料号时，高亮对应的特定料号（直接使用双击的料号）
-            print(f"高亮显示用户双击的料号: {found_pn}")
+            logger.debug("高亮显示用户双击的料号: %s", found_pn)
             self.highlight_material_in_both_trees(found_pn)
         elif found_mpn:
             # 查找包含该MPN的物料并高亮显示
@@ -3476,7 +6052,7 @@ class BOMComparerGUI:
 
     def clear_tree_highlights(self):
         """清除所有树视图中的高亮显示"""
-        print("清除所有高亮显示")
+        logger.debug("清除所有高亮显示")
 
         # 清除BOM A树视图中的高亮显示
         for item in self.bom_a_tree.get_children():
@@ -3495,14 +6071,14 @@ class BOMComparerGUI:
                     elif tag.startswith('ref_highlight_bom_b_'):
                         self.bom_b_tree.tag_configure(tag, background='')
                 except Exception as e:
-                    print(f"清除标签配置时出错: {e}")
+                    logger.warning("清除标签配置时出错: %s", e)
 
             # 清除标签列表
             self.highlight_tags.clear()
 
         # 恢复原始值
         if hasattr(self, 'original_values') and self.original_values:
-            print(f"恢复原始值，共{len(self.original_values)}个值")
+            logger.debug("恢复原始值，共%s个值", len(self.original_values))
             for key, value in list(self.original_values.items()):
                 try:
                     # 解析键值 - 新的键值格式是 id(tree).item.Reference.ref
@@ -3522,7 +6098,7 @@ class BOMComparerGUI:
                         if tree and item_id in tree.get_children():
                             # 恢复原始值
                             tree.set(item_id, column, value)
-                            print(f"恢复原始值: {item_id}.{column} = {value}")
+                            logger.debug("恢复原始值: %s.%s = %s", item_id, column, value)
                     elif len(parts) >= 3:  # 兼容旧格式
                         tree_name = parts[0]
                         item_id = parts[1]
@@ -3538,9 +6114,9 @@ class BOMComparerGUI:
                         if tree and item_id in tree.get_children():
                             # 恢复原始值
                             tree.set(item_id, column, value)
-                            print(f"恢复原始值: {item_id}.{column} = {value}")
+                            logger.debug("恢复原始值: %s.%s = %s", item_id, column, value)
                 except Exception as e:
-                    print(f"恢复原始值时出错: {e}")
+                    logger.warning("恢复原始值时出错: %s", e)
 
             # 清除存储的原始值
             self.original_values.clear()
@@ -3570,7 +6146,7 @@ class BOMComparerGUI:
             return False
 
         # 打印调试信息
-        print(f"检查料号是否有效: {pn}")
+        logger.debug("检查料号是否有效: %s", pn)
 
         # 在A中查找该料号，使用精确匹配
         found_a = (self.comparer.bom_a['P/N'].astype(str) == pn).any()
@@ -3585,7 +6161,7 @@ class BOMComparerGUI:
             found_b = self.comparer.bom_b['P/N'].astype(str).str.contains(pn, regex=False).any()
 
         result = found_a or found_b
-        print(f"料号{pn}在BOM中{'存在' if result else '不存在'}")
+        logger.debug("料号%s在BOM中%s", pn, '存在' if result else '不存在')
         return result
 
     def is_valid_mpn(self, mpn):
@@ -3611,8 +6187,8 @@ class BOMComparerGUI:
             pn_a: 可选的A BOM中的料号，用于精确匹配
             pn_b: 可选的B BOM中的料号，用于精确匹配
         """
-        print(f"高亮显示位号: {ref}")
-        print(f"指定的料号: A={pn_a}, B={pn_b}")
+        logger.debug("高亮显示位号: %s", ref)
+        logger.debug("指定的料号: A=%s, B=%s", pn_a, pn_b)
 
         # 先彻底清除之前的高亮，确保之前的标记被清除
         self.clear_tree_highlights()
@@ -3624,7 +6200,7 @@ class BOMComparerGUI:
 
         # 如果两个BOM中都没有找到该位号，则返回
         if info_a is None and info_b is None:
-            print(f"未找到位号: {ref}")
+            logger.debug("未找到位号: %s", ref)
             return
 
         # 初始化标签列表，如果不存在
@@ -3633,37 +6209,37 @@ class BOMComparerGUI:
 
         # 在BOM A中高亮显示对应行并标红位号
         if info_a is not None:
-            print(f"在BOM A中找到位号: {ref}")
+            logger.debug("在BOM A中找到位号: %s", ref)
             # 如果没有指定料号，使用位号对应的料号
             if pn_a is None:
                 pn_a = info_a.get('P/N', '')
-            print(f"在BOM A中使用料号: {pn_a}")
+            logger.debug("在BOM A中使用料号: %s", pn_a)
             self.highlight_reference_cell(self.bom_a_tree, ref, pn_a)
 
         # 在BOM B中高亮显示对应行并标红位号
         if info_b is not None:
-            print(f"在BOM B中找到位号: {ref}")
+            logger.debug("在BOM B中找到位号: %s", ref)
             # 如果没有指定料号，使用位号对应的料号
             if pn_b is None:
                 pn_b = info_b.get('P/N', '')
-            print(f"在BOM B中使用料号: {pn_b}")
+            logger.debug("在BOM B中使用料号: %s", pn_b)
             self.highlight_reference_cell(self.bom_b_tree, ref, pn_b)
 
         # 处理位号移除或新增的情况
         if info_a is not None and info_b is None:
             # 位号在A中存在但在B中不存在，说明该位号被移除
-            print(f"位号{ref}在B中被移除，尝试高亮对应的物料行")
+            logger.debug("位号%s在B中被移除，尝试高亮对应的物料行", ref)
             self.highlight_corresponding_material_row(ref, info_a, 'A_to_B')
         elif info_a is None and info_b is not None:
             # 位号在A中不存在但在B中存在，说明该位号是新增的
-            print(f"位号{ref}在B中是新增的，尝试高亮对应的物料行")
+            logger.debug("位号%s在B中是新增的，尝试高亮对应的物料行", ref)
             self.highlight_corresponding_material_row(ref, info_b, 'B_to_A')
         elif info_a is not None and info_b is not None:
             # 位号在A和B中都存在，检查是否物料变更
             pn_a = info_a.get('P/N', '')
             pn_b = info_b.get('P/N', '')
             if pn_a != pn_b:
-                print(f"位号{ref}的物料发生变更: {pn_a} -> {pn_b}")
+                logger.debug("位号%s的物料发生变更: %s -> %s", ref, pn_a, pn_b)
 
     def highlight_corresponding_material_row(self, ref, info, direction):
         """高亮显示与指定位号对应的物料行
@@ -3676,7 +6252,7 @@ class BOMComparerGUI:
         # 获取物料编号
         pn = info.get('P/N', '')
         if not pn:
-            print(f"无法获取位号{ref}对应的物料编号")
+            logger.debug("无法获取位号%s对应的物料编号", ref)
             return
 
         # 确定目标树和源树
@@ -3730,10 +6306,10 @@ class BOMComparerGUI:
                     # 滚动到该行
                     target_tree.see(item)
                     found = True
-                    print(f"在{tree_name}中找到并高亮显示了物料 {pn}")
+                    logger.debug("在%s中找到并高亮显示了物料 %s", tree_name, pn)
 
         if not found:
-            print(f"在目标树中未找到物料 {pn}")
+            logger.debug("在目标树中未找到物料 %s", pn)
 
             # 尝试查找替代料或相似物料
             # 直接检查当前料号的替代料
@@ -3744,7 +6320,7 @@ class BOMComparerGUI:
                 for alt_pn in alt_pns:
                     # 在目标BOM中查找该替代料
                     if alt_pn in target_bom['P/N'].values:
-                        print(f"在目标树中找到替代料 {alt_pn}")
+                        logger.debug("在目标树中找到替代料 %s", alt_pn)
                         # 高亮显示该替代料
                         self.highlight_material_in_tree(target_tree, alt_pn)
                         alt_found = True
@@ -3757,7 +6333,7 @@ class BOMComparerGUI:
                         # 如果当前料号是其他料号的替代料
                         # 先检查主料号
                         if other_pn in target_bom['P/N'].values:
-                            print(f"在目标树中找到主料号 {other_pn}")
+                            logger.debug("在目标树中找到主料号 %s", other_pn)
                             self.highlight_material_in_tree(target_tree, other_pn)
                             alt_found = True
                             break
@@ -3765,7 +6341,7 @@ class BOMComparerGUI:
                         # 再检查其他替代料
                         for alt_pn in alt_pns:
                             if alt_pn != pn and alt_pn in target_bom['P/N'].values:
-                                print(f"在目标树中找到替代料 {alt_pn}")
+                                logger.debug("在目标树中找到替代料 %s", alt_pn)
                                 self.highlight_material_in_tree(target_tree, alt_pn)
                                 alt_found = True
                                 break
@@ -3781,7 +6357,7 @@ class BOMComparerGUI:
             ref: 要高亮的位号
             pn: 物料编号，用于精确匹配行
         """
-        print(f"在树中高亮显示位号: {ref}, 料号: {pn}")
+        logger.debug("在树中高亮显示位号: %s, 料号: %s", ref, pn)
         found = False
 
         # 清除树视图的选择状态，避免蓝色高亮与黄色高亮同时存在
@@ -3817,7 +6393,7 @@ class BOMComparerGUI:
 
                 # 如果位号和料号都匹配
                 if ref_match and pn_match:
-                    print(f"找到匹配的位号和料号: {ref}, {pn}")
+                    logger.debug("找到匹配的位号和料号: %s, %s", ref, pn)
                     found = True
 
                     # 定义一个特殊的标签，用于标记这一行
@@ -3843,14 +6419,14 @@ class BOMComparerGUI:
 
         # 如果没有找到，确保清除所有选择，避免用户困惑
         if not found:
-            print(f"未找到匹配的位号和料号: {ref}, {pn}")
+            logger.debug("未找到匹配的位号和料号: %s, %s", ref, pn)
             tree.selection_remove(tree.selection())
 
         return found
 
     def highlight_material_in_tree(self, tree, pn):
         """在指定的树视图中高亮显示指定物料编号的行"""
-        print(f"在树中查找并高亮料号: {pn}")
+        logger.debug("在树中查找并高亮料号: %s", pn)
         found = False
 
         # 清除树视图的选择状态，避免蓝色高亮与黄色高亮同时存在
@@ -3878,7 +6454,7 @@ class BOMComparerGUI:
 
                 # 精确匹配料号
                 if cell_value == pn:
-                    print(f"找到精确匹配的料号: {pn}")
+                    logger.debug("找到精确匹配的料号: %s", pn)
                     found = True
 
                     # 定义一个特殊的标签，用于标记这一行
@@ -3918,7 +6494,7 @@ class BOMComparerGUI:
 
     def highlight_material_in_both_trees(self, pn):
         """在两个BOM树中高亮显示指定物料编号的行"""
-        print(f"在两个BOM树中高亮显示物料: {pn}")
+        logger.debug("在两个BOM树中高亮显示物料: %s", pn)
 
         # 先清除之前的高亮显示
         self.clear_tree_highlights()
@@ -3932,16 +6508,16 @@ class BOMComparerGUI:
         # 在A树中高亮显示
         found_a = self.highlight_material_in_tree(self.bom_a_tree, pn)
         if found_a:
-            print(f"在BOM A中找到并高亮显示了物料 {pn}")
+            logger.debug("在BOM A中找到并高亮显示了物料 %s", pn)
 
         # 在B树中高亮显示
         found_b = self.highlight_material_in_tree(self.bom_b_tree, pn)
         if found_b:
-            print(f"在BOM B中找到并高亮显示了物料 {pn}")
+            logger.debug("在BOM B中找到并高亮显示了物料 %s", pn)
 
         # 如果两个BOM中都没有找到该物料，输出提示信息
         if not found_a and not found_b:
-            print(f"在两个BOM中都未找到物料 {pn}")
+            logger.debug("在两个BOM中都未找到物料 %s", pn)
 
         return found_a or found_b
 
@@ -3957,7 +6533,7 @@ class BOMComparerGUI:
         Returns:
             bool: 是否找到并高亮了符合条件的行
         """
-        print(f"在树中查找并高亮: 列={search_column}, 值={search_value}")
+        logger.debug("在树中查找并高亮: 列=%s, 值=%s", search_column, search_value)
         found = False
 
         # 获取所有行
@@ -3979,7 +6555,7 @@ class BOMComparerGUI:
 
                 # 检查是否匹配
                 if cell_value == search_value:
-                    print(f"找到匹配的行: {search_value}")
+                    logger.debug("找到匹配的行: %s", search_value)
                     found = True
 
                     # 将标签应用于该行
@@ -4337,165 +6913,599 @@ class FieldMappingDialog:
         self.dialog.destroy()
 
 # 更新检测相关函数
-def check_for_updates(current_version):
+class UpdateCheckCache:
+    """检查更新结果缓存
+
+    记录上次成功检查和上次尝试检查的时间以及最新版本的发布信息。距上次成功检查不足
+    UPDATE_CHECK_INTERVAL天时直接使用缓存的发布信息；检查失败（如离线）后
+    UPDATE_RETRY_HOURS小时内不再访问网络。
+    """
+
+    def __init__(self):
+        self.checked_at = None      # 上次成功检查的时间戳
+        self.attempted_at = None    # 上次尝试检查的时间戳
+        self.release = None         # 缓存的发布信息（只保留用到的字段）
+        self.etag = None            # 发布信息的ETag，再次检查时用If-None-Match发送条件请求
+
+    def is_due(self, now=None):
+        """是否需要访问网络检查更新"""
+        now = time.time() if now is None else now
+        if self.checked_at is not None and 0 <= now - self.checked_at < UPDATE_CHECK_INTERVAL * 86400:
+            return False
+        if self.attempted_at is not None and 0 <= now - self.attempted_at < UPDATE_RETRY_HOURS * 3600:
+            return False
+        return True
+
+    def record_attempt(self, release=None, etag=None, now=None):
+        """记录一次检查，release不为None表示检查成功"""
+        now = time.time() if now is None else now
+        self.attempted_at = now
+        if release is not None:
+            self.checked_at = now
+            self.etag = etag
+            self.release = {
+                'tag_name': release.get('tag_name', ''),
+                'body': release.get('body'),
+                'zipball_url': release.get('zipball_url', ''),
+                'assets': [{key: asset.get(key) for key in ('name', 'browser_download_url', 'size', 'digest')}
+                           for asset in release.get('assets', [])]
+            }
+
+    def load(self, file_path):
+        """从文件加载缓存，文件不存在或损坏时保持为空"""
+        try:
+            if not os.path.exists(file_path):
+                return
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.checked_at = data.get('checked_at')
+            self.attempted_at = data.get('attempted_at')
+            self.release = data.get('release')
+            self.etag = data.get('etag')
+        except Exception as e:
+            logger.warning("加载更新缓存失败: %s", e)
+
+    def save(self, file_path):
+        """保存缓存到文件"""
+        try:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump({'checked_at': self.checked_at, 'attempted_at': self.attempted_at, 'etag': self.etag,
+                           'release': self.release}, f, ensure_ascii=False, indent=2)
+            return True
+        except Exception as e:
+            logger.warning("保存更新缓存失败: %s", e)
+            return False
+
+def set_http_timeouts(connect=None, read=None, download=None):
+    """修改更新相关网络请求的超时（秒），为None的项保持不变"""
+    for name, value in (('connect', connect), ('read', read), ('download', download)):
+        if value is not None:
+            if value <= 0:
+                raise ValueError(f"超时必须大于0: {name}={value}")
+            HTTP_TIMEOUTS[name] = value
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def create_http_session(pool_size=DOWNLOAD_PARALLEL_PARTS):
+    """创建带连接池的会话，连接池大小不小于并行下载的连接数"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers["User-Agent"] = f"BOM-Comparer/{APP_VERSION}"
+    return session
+
+def get_http_session():
+    """检查更新和下载共用的会话（首次调用时创建），同一服务器的请求复用keep-alive连接"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = create_http_session()
+        return _http_session
+
+def fetch_latest_release(api_url=None, etag=None, session=None):
+    """请求最新版本的发布信息（GitHub releases/latest接口格式）
+
+    连接超时为HTTP_TIMEOUTS['connect']秒，离线时很快失败。提供etag时发送条件请求，
+    发布信息没有变化时服务器只返回304。
+
+    Returns:
+        tuple: (发布信息, ETag)，发布信息没有变化（304）时发布信息为None
+
+    Raises:
+        requests.RequestException: 网络错误或HTTP状态码不是200/304
+    """
+    headers = {
+        "User-Agent": "BOM-Comparer-Update-Checker"
+    }
+    if etag:
+        headers["If-None-Match"] = etag
+    response = (session or get_http_session()).get(api_url or UPDATE_API_URL, headers=headers,
+                                                   timeout=(HTTP_TIMEOUTS['connect'], HTTP_TIMEOUTS['read']))
+    if response.status_code == 304:
+        return None, etag
+    response.raise_for_status()
+    return response.json(), response.headers.get('ETag')
+
+def parse_release(data, current_version):
+    """从发布信息中取出更新信息
+
+    Returns:
+        tuple: (是否有更新, 最新版本, 下载链接, 更新日志, 是否为exe更新)
+    """
+    if not data or not data.get("tag_name"):
+        return False, current_version, "", "", False
+
+    latest_version = data["tag_name"].lstrip("v")
+    logger.info("发现版本: %s", latest_version)
+
+    # 使用packaging.version进行版本比较
+    if pkg_version.parse(latest_version) <= pkg_version.parse(current_version):
+        return False, current_version, "", "", False
+    logger.info("发现新版本: %s", latest_version)
+
+    # 查找exe资源文件
+    download_url = ""
+    is_exe_update = False
+
+    for asset in data.get("assets", []):
+        if asset["name"].endswith(".exe"):
+            download_url = asset["browser_download_url"]
+            is_exe_update = True
+            logger.info("找到exe更新: %s", asset['name'])
+            break
+
+    # 如果没有资源文件，使用源代码下载链接
+    if not download_url:
+        download_url = data["zipball_url"]
+        logger.info("使用源代码链接作为备用")
+
+    # 获取更新日志
+    changelog = data.get("body") or "无可用的更新日志"
+
+    return True, latest_version, download_url, changelog, is_exe_update
+
+def check_for_updates(current_version, cache=None, cache_path=None, force=False, api_url=None):
     """
     检查GitHub上是否有新版本
 
     Args:
         current_version: 当前版本号
+        cache: UpdateCheckCache，为None时每次都访问网络
+        cache_path: 缓存文件路径，不为None时检查后保存缓存
+        force: 是否忽略检查间隔（手动检查时）
+        api_url: 发布信息地址，为None时使用UPDATE_API_URL
 
     Returns:
         tuple: (是否有更新, 最新版本, 下载链接, 更新日志, 是否为exe更新)
     """
     try:
-        print(f"检查更新，当前版本: {current_version}")
+        logger.info("检查更新，当前版本: %s", current_version)
 
-        # 设置请求头，避免API限制
-        headers = {
-            "User-Agent": "BOM-Comparer-Update-Checker"
-        }
+        if cache is not None and not force and not cache.is_due():
+            logger.info("距上次检查不足%s天，使用缓存的版本信息", UPDATE_CHECK_INTERVAL)
+            return parse_release(cache.release, current_version)
+
+        # 有缓存的发布信息时发送条件请求，没有变化时只需一次304往返
+        etag = cache.etag if cache is not None and cache.release else None
+        try:
+            data, etag = fetch_latest_release(api_url, etag)
+        except Exception as e:
+            if cache is None:
+                raise
+            # 检查失败时记录尝试时间，并继续使用上次缓存的版本信息
+            logger.warning("检查更新失败，使用缓存的版本信息: %s", str(e))
+            cache.record_attempt()
+            data = cache.release
+        else:
+            if data is None:
+                logger.info("发布信息没有变化（304），使用缓存的版本信息")
+                data = cache.release
+            if cache is not None:
+                cache.record_attempt(data, etag)
+
+        if cache is not None and cache_path:
+            cache.save(cache_path)
+        return parse_release(data, current_version)
+    except Exception as e:
+        logger.warning("检查更新失败: %s", str(e))
+        return False, current_version, "", "", False
 
-        # 添加超时设置，避免长时间等待
-        response = requests.get(GITHUB_API_URL, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+class RangeNotSupportedError(Exception):
+    """服务器不支持按字节范围下载（对Range请求返回了完整内容）"""
 
-        if response.status_code == 200:
-            data = response.json()
-            latest_version = data["tag_name"].lstrip("v")
-            print(f"发现版本: {latest_version}")
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-            # 使用packaging.version进行版本比较
-            if pkg_version.parse(latest_version) > pkg_version.parse(current_version):
-                print(f"发现新版本: {latest_version}")
+def find_release_checksum(release, download_url, session=None):
+    """查找发布文件的SHA-256校验值
 
-                # 查找exe资源文件
-                download_url = ""
-                is_exe_update = False
+    优先使用发布信息中资源文件的digest字段（"sha256:..."），其次下载同时发布的
+    "<文件名>.sha256"或SHA256SUMS文件。
 
-                for asset in data.get("assets", []):
-                    if asset["name"].endswith(".exe"):
-                        download_url = asset["browser_download_url"]
-                        is_exe_update = True
-                        print(f"找到exe更新: {asset['name']}")
-                        break
+    Returns:
+        str: 十六进制校验值，未发布时返回None
+    """
+    if not release:
+        return None
+    assets = release.get('assets') or []
+    asset = next((item for item in assets if item.get('browser_download_url') == download_url), None)
+    if asset is None:
+        return None
+    digest = asset.get('digest') or ''
+    if digest.lower().startswith('sha256:'):
+        return digest.split(':', 1)[1].strip().lower()
+
+    names = {f"{asset['name']}.sha256", "SHA256SUMS", "SHA256SUMS.txt", "sha256sums.txt"}
+    for item in assets:
+        if item.get('name') not in names:
+            continue
+        try:
+            response = (session or get_http_session()).get(item['browser_download_url'],
+                                                           timeout=(HTTP_TIMEOUTS['connect'], HTTP_TIMEOUTS['read']))
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.warning("获取校验文件失败: %s", e)
+            continue
+        # 每行为"校验值  文件名"，单文件的.sha256也可能只有校验值
+        for line in response.text.splitlines():
+            fields = line.split()
+            if fields and (len(fields) == 1 or fields[-1].lstrip('*') == asset['name']):
+                return fields[0].lower()
+    return None
+
+class RangedDownload:
+    """按字节范围并行下载
+
+    目标文件先按总大小预分配，各连接把自己的范围直接写入对应位置。每个连接从待下载
+    范围中依次领取一段，段大小按该连接上一段的速度调整（DOWNLOAD_PART_MIN_BYTES到
+    DOWNLOAD_PART_MAX_BYTES之间）。已完成的范围保存在状态文件中，中断后再次下载时
+    只请求剩余部分；服务器上的文件变化（ETag/Last-Modified不同）时重新下载。
+    """
 
-                # 如果没有资源文件，使用源代码下载链接
-                if not download_url:
-                    download_url = data["zipball_url"]
-                    print("使用源代码链接作为备用")
+    def __init__(self, session, url, dest_file, file_size, validator='', parts=DOWNLOAD_PARALLEL_PARTS,
+                 progress_callback=None, status_callback=None):
+        self.session = session
+        self.url = url
+        self.dest_file = dest_file
+        self.state_file = dest_file + DOWNLOAD_STATE_SUFFIX
+        self.file_size = file_size
+        self.validator = validator
+        self.parts = parts
+        self.progress_callback = progress_callback
+        self.status_callback = status_callback
+
+        self.lock = threading.Lock()
+        self.pending = []       # 待下载的范围 [[开始, 结束)]
+        self.done = []          # 已完成的范围
+        self.downloaded = 0
+        self.error = None
+        self.failed = threading.Event()
+
+    def run(self):
+        """执行下载
 
-                # 获取更新日志
-                changelog = data["body"] if "body" in data else "无可用的更新日志"
+        Returns:
+            bool: 是否下载完成（失败时保留状态文件，可再次调用继续下载）
 
-                return True, latest_version, download_url, changelog, is_exe_update
+        Raises:
+            RangeNotSupportedError: 服务器不支持Range请求
+        """
+        self._prepare()
+        if not self.pending:
+            self._remove_state()
+            return True
 
-        # 如果没有新版本或请求失败
-        return False, current_version, "", "", False
-    except Exception as e:
-        print(f"检查更新失败: {str(e)}")
-        return False, current_version, "", "", False
+        workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.parts)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        if isinstance(self.error, RangeNotSupportedError):
+            raise self.error
+        if self.error is not None:
+            logger.error("分段下载失败: %s", self.error)
+            return False
+        self._remove_state()
+        return True
+
+    def _prepare(self):
+        """读取状态文件，确定待下载的范围"""
+        state = None
+        if os.path.exists(self.state_file) and os.path.exists(self.dest_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except Exception as e:
+                logger.warning("读取下载状态失败: %s", e)
+
+        if (state and state.get('url') == self.url and state.get('size') == self.file_size
+                and state.get('validator') == self.validator and os.path.getsize(self.dest_file) == self.file_size):
+            self.done = [list(item) for item in state.get('done', [])]
+        elif state is None and os.path.exists(self.dest_file) and os.path.getsize(self.dest_file) == self.file_size:
+            # 没有状态文件且大小一致，视为已下载完成
+            if self.status_callback:
+                self.status_callback("文件已存在，跳过下载")
+            return
+        else:
+            with open(self.dest_file, 'wb') as f:
+                f.truncate(self.file_size)
+            self.done = []
+
+        position = 0
+        for start, end in self.done:
+            if start > position:
+                self.pending.append([position, start])
+            position = max(position, end)
+        if position < self.file_size:
+            self.pending.append([position, self.file_size])
+
+        self.downloaded = self.file_size - sum(end - start for start, end in self.pending)
+        if self.downloaded and self.status_callback:
+            self.status_callback(f"继续下载，已完成: {self.downloaded / self.file_size * 100:.1f}%")
+        self._save_state()
+
+    def _claim(self, size):
+        """领取下一段待下载的范围，没有剩余时返回None"""
+        with self.lock:
+            if not self.pending or self.failed.is_set():
+                return None
+            gap = self.pending[0]
+            start, end = gap[0], min(gap[1], gap[0] + size)
+            gap[0] = end
+            if gap[0] >= gap[1]:
+                self.pending.pop(0)
+            return start, end
+
+    def _complete(self, start, end):
+        """记录已完成的范围（合并相邻范围）并保存状态"""
+        with self.lock:
+            merged = []
+            for item in sorted(self.done + [[start, end]]):
+                if merged and item[0] <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], item[1])
+                else:
+                    merged.append(item)
+            self.done = merged
+            self._save_state()
+
+    def _add_progress(self, size):
+        with self.lock:
+            self.downloaded += size
+            downloaded = self.downloaded
+        if self.progress_callback:
+            self.progress_callback(downloaded, self.file_size, downloaded / self.file_size)
+
+    def _worker(self):
+        part_size = DOWNLOAD_PART_MIN_BYTES
+        try:
+            with open(self.dest_file, 'r+b') as f:
+                while True:
+                    claimed = self._claim(part_size)
+                    if claimed is None:
+                        return
+                    start, end = claimed
+                    started = time.perf_counter()
+                    self._fetch_range(f, start, end)
+                    self._complete(start, end)
+
+                    # 按本段的速度调整下一段的大小
+                    rate = (end - start) / max(time.perf_counter() - started, 1e-3)
+                    part_size = int(min(DOWNLOAD_PART_MAX_BYTES,
+                                        max(DOWNLOAD_PART_MIN_BYTES, rate * DOWNLOAD_PART_SECONDS)))
+        except Exception as e:
+            with self.lock:
+                if self.error is None:
+                    self.error = e
+            self.failed.set()
+
+    def _fetch_range(self, f, start, end):
+        """下载[start, end)并写入文件，连接中断时从已写入的位置重试"""
+        position = start
+        retries = 0
+        while True:
+            try:
+                headers = {'Range': f"bytes={position}-{end - 1}"}
+                with self.session.get(self.url, headers=headers, stream=True,
+                                      timeout=(HTTP_TIMEOUTS['connect'], HTTP_TIMEOUTS['download'])) as response:
+                    if response.status_code == 200:
+                        raise RangeNotSupportedError()
+                    if response.status_code != 206:
+                        raise requests.exceptions.HTTPError(f"下载失败，HTTP状态码: {response.status_code}")
+                    f.seek(position)
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        chunk = chunk[:end - position]
+                        f.write(chunk)
+                        position += len(chunk)
+                        self._add_progress(len(chunk))
+                        if position >= end:
+                            break
+                if position >= end:
+                    return
+                raise IOError(f"连接提前关闭（{position}/{end}）")
+            except (requests.exceptions.RequestException, IOError) as e:
+                retries += 1
+                if retries >= DOWNLOAD_MAX_RETRIES or self.failed.is_set():
+                    raise
+                if self.status_callback:
+                    self.status_callback(f"下载出错，正在重试 ({retries}/{DOWNLOAD_MAX_RETRIES}): {str(e)}")
+                time.sleep(2 * retries)  # 指数退避
+
+    def _save_state(self):
+        try:
+            with open(self.state_file, 'w', encoding='utf-8') as f:
+                json.dump({'url': self.url, 'size': self.file_size, 'validator': self.validator, 'done': self.done}, f)
+        except OSError as e:
+            logger.warning("保存下载状态失败: %s", e)
 
-def download_with_resume(url, dest_file, progress_callback=None, status_callback=None):
+    def _remove_state(self):
+        if os.path.exists(self.state_file):
+            os.remove(self.state_file)
+
+def download_with_resume(url, dest_file, progress_callback=None, status_callback=None, expected_sha256=None,
+                         session=None, parts=DOWNLOAD_PARALLEL_PARTS):
     """
     支持断点续传的下载函数
 
+    文件不小于DOWNLOAD_PARALLEL_MIN_BYTES且服务器支持Range时用parts个连接并行分段下载（见RangedDownload），
+    否则使用单连接断点续传。
+
     Args:
         url: 下载链接
         dest_file: 目标文件路径
         progress_callback: 进度回调函数，接收三个参数(已下载大小, 总大小, 进度百分比)
         status_callback: 状态回调函数，接收一个参数(状态消息)
+        expected_sha256: 发布的SHA-256校验值，提供时下载完成后校验，不一致时删除文件
+        session: requests会话，为None时使用共用的会话（get_http_session）
+        parts: 并行连接数，为1时不分段
 
     Returns:
         bool: 下载是否成功
     """
     try:
-        # 设置请求头
-        headers = {
-            "User-Agent": "BOM-Comparer-Updater"
-        }
+        session = session or get_http_session()
+        headers = {"User-Agent": "BOM-Comparer-Updater"}
 
-        # 获取文件大小
-        response = requests.head(url, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+        # 获取文件大小（跟随重定向，GitHub的下载链接会跳转到存储服务器）
+        response = session.head(url, headers=headers, timeout=(HTTP_TIMEOUTS['connect'], HTTP_TIMEOUTS['read']),
+                                allow_redirects=True)
         file_size = int(response.headers.get('content-length', 0))
+        accept_ranges = response.headers.get('accept-ranges', '').lower() == 'bytes'
+        validator = response.headers.get('etag') or response.headers.get('last-modified') or ''
 
-        # 已下载的大小
-        downloaded = 0
+        success = None
+        if parts > 1 and accept_ranges and file_size >= DOWNLOAD_PARALLEL_MIN_BYTES:
+            try:
+                success = RangedDownload(session, url, dest_file, file_size, validator, parts,
+                                         progress_callback, status_callback).run()
+                if not success and status_callback:
+                    status_callback("下载失败，超过最大重试次数")
+            except RangeNotSupportedError:
+                logger.info("服务器不支持分段下载，改用单连接下载")
+                if status_callback:
+                    status_callback("服务器不支持分段下载，改用单连接下载")
+
+        if success is None:
+            # 分段下载预分配的文件不能用于单连接续传
+            state_file = dest_file + DOWNLOAD_STATE_SUFFIX
+            if os.path.exists(state_file):
+                os.remove(state_file)
+                if os.path.exists(dest_file):
+                    os.remove(dest_file)
+            success = _download_single(session, url, dest_file, file_size, progress_callback, status_callback)
+
+        if success and expected_sha256:
+            if status_callback:
+                status_callback("正在校验文件...")
+            actual = file_sha256(dest_file)
+            if actual != expected_sha256.lower():
+                logger.error("下载文件校验失败: 期望 %s，实际 %s", expected_sha256, actual)
+                os.remove(dest_file)
+                if status_callback:
+                    status_callback("文件校验失败，已删除下载的文件")
+                return False
+            if status_callback:
+                status_callback("下载完成，校验通过")
+        return success
 
-        # 检查是否存在部分下载的文件
-        if os.path.exists(dest_file):
-            downloaded = os.path.getsize(dest_file)
+    except Exception as e:
+        if status_callback:
+            status_callback(f"下载过程中发生错误: {str(e)}")
+        logger.error("下载错误: %s", str(e))
+        return False
 
-            # 如果文件已经下载完成，直接返回成功
-            if downloaded == file_size:
-                if status_callback:
-                    status_callback("文件已存在，跳过下载")
-                return True
+def _download_single(session, url, dest_file, file_size, progress_callback=None, status_callback=None):
+    """单连接下载，已存在部分文件时用Range请求续传"""
+    headers = {}
 
-            # 如果文件大小不匹配，设置断点续传的请求头
-            if downloaded < file_size:
-                headers['Range'] = f'bytes={downloaded}-'
-                if status_callback:
-                    status_callback(f"继续下载，已完成: {downloaded/file_size*100:.1f}%")
-            else:
-                # 文件大小超过预期，可能是损坏的，重新下载
-                downloaded = 0
-                if status_callback:
-                    status_callback("文件可能损坏，重新下载")
+    # 已下载的大小
+    downloaded = 0
 
-        # 打开文件，如果是断点续传则追加，否则覆盖
-        mode = 'ab' if downloaded > 0 else 'wb'
+    # 检查是否存在部分下载的文件
+    if os.path.exists(dest_file):
+        downloaded = os.path.getsize(dest_file)
 
-        # 重试计数器
-        retries = 0
+        # 如果文件已经下载完成，直接返回成功
+        if downloaded == file_size:
+            if status_callback:
+                status_callback("文件已存在，跳过下载")
+            return True
 
-        while retries < DOWNLOAD_MAX_RETRIES:
-            try:
-                # 发起请求
-                response = requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT)
+        # 如果文件大小不匹配，设置断点续传的请求头
+        if downloaded < file_size:
+            headers['Range'] = f'bytes={downloaded}-'
+            if status_callback:
+                status_callback(f"继续下载，已完成: {downloaded/file_size*100:.1f}%")
+        else:
+            # 文件大小超过预期，可能是损坏的，重新下载
+            downloaded = 0
+            if status_callback:
+                status_callback("文件可能损坏，重新下载")
 
-                # 检查响应状态
-                if response.status_code not in [200, 206]:
-                    raise Exception(f"下载失败，HTTP状态码: {response.status_code}")
+    # 重试计数器
+    retries = 0
 
-                # 获取文件总大小
-                if 'content-length' in response.headers:
-                    file_size = int(response.headers['content-length']) + downloaded
+    while retries < DOWNLOAD_MAX_RETRIES:
+        try:
+            # 发起请求
+            response = session.get(url, headers=headers, stream=True,
+                                   timeout=(HTTP_TIMEOUTS['connect'], HTTP_TIMEOUTS['download']))
 
-                # 打开文件并写入
-                with open(dest_file, mode) as f:
-                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded += len(chunk)
+            # 检查响应状态
+            if response.status_code not in [200, 206]:
+                raise Exception(f"下载失败，HTTP状态码: {response.status_code}")
 
-                            # 更新进度
-                            if progress_callback and file_size > 0:
-                                progress = downloaded / file_size
-                                progress_callback(downloaded, file_size, progress)
+            # 服务器忽略Range返回完整内容时从头写入
+            if response.status_code == 200:
+                downloaded = 0
 
-                # 下载完成
-                if status_callback:
-                    status_callback("下载完成")
-                return True
+            # 获取文件总大小
+            if 'content-length' in response.headers:
+                file_size = int(response.headers['content-length']) + downloaded
+
+            # 打开文件，如果是断点续传则追加，否则覆盖
+            mode = 'ab' if downloaded > 0 else 'wb'
+            with open(dest_file, mode) as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    if chunk:
+                        f.write(chunk)
+                        downloaded += len(chunk)
+
+                        # 更新进度
+                        if progress_callback and file_size > 0:
+                            progress = downloaded / file_size
+                            progress_callback(downloaded, file_size, progress)
+
+            # 下载完成
+            if status_callback:
+                status_callback("下载完成")
+            return True
 
-            except (requests.exceptions.RequestException, IOError) as e:
-                retries += 1
-                if status_callback:
-                    status_callback(f"下载出错，正在重试 ({retries}/{DOWNLOAD_MAX_RETRIES}): {str(e)}")
+        except (requests.exceptions.RequestException, IOError) as e:
+            retries += 1
+            if status_callback:
+                status_callback(f"下载出错，正在重试 ({retries}/{DOWNLOAD_MAX_RETRIES}): {str(e)}")
 
-                # 如果不是最后一次重试，等待一段时间再重试
-                if retries < DOWNLOAD_MAX_RETRIES:
-                    time.sleep(2 * retries)  # 指数退避
+            # 中断后从已写入的位置继续
+            if os.path.exists(dest_file):
+                downloaded = os.path.getsize(dest_file)
+                headers['Range'] = f'bytes={downloaded}-'
 
-        # 超过最大重试次数
-        if status_callback:
-            status_callback("下载失败，超过最大重试次数")
-        return False
+            # 如果不是最后一次重试，等待一段时间再重试
+            if retries < DOWNLOAD_MAX_RETRIES:
+                time.sleep(2 * retries)  # 指数退避
 
-    except Exception as e:
-        if status_callback:
-            status_callback(f"下载过程中发生错误: {str(e)}")
-        print(f"下载错误: {str(e)}")
-        return False
+    # 超过最大重试次数
+    if status_callback:
+        status_callback("下载失败，超过最大重试次数")
+    return False
 
 def show_update_notification(parent, current_version, latest_version, changelog, download_url, is_exe_update):
     """
@@ -4642,11 +7652,112 @@ def _get_updated_filename(original_filename, new_version):
     # 如果没有找到版本号模式，返回原始文件名
     return original_filename
 
-def main():
+class StartupTimer:
+    """启动计时：记录各阶段距程序开始（STARTUP_TIME）的毫秒数和后台预热中各模块的导入耗时"""
+
+    def __init__(self, start=STARTUP_TIME):
+        self.start = start
+        self.marks = OrderedDict()
+        self.imports = OrderedDict()
+
+    def mark(self, name):
+        self.marks[name] = round((time.perf_counter() - self.start) * 1000, 1)
+
+    def to_dict(self):
+        return {
+            'version': APP_VERSION,
+            'frozen': bool(getattr(sys, 'frozen', False)),
+            'marks_ms': dict(self.marks),
+            'imports_ms': dict(self.imports)
+        }
+
+    def report(self, output=None):
+        """输出计时结果，output不为空时同时保存为JSON"""
+        labels = {'imports': "模块导入", 'window': "创建窗口", 'gui': "创建界面", 'first_paint': "首次绘制",
+                  'warm_up': "后台预热完成"}
+        lines = [f"{labels.get(name, name)}: {ms}ms" for name, ms in self.marks.items()]
+        lines += [f"  导入 {name}: {ms}ms" for name, ms in self.imports.items()]
+        logger.info("启动计时:\n%s", "\n".join(lines))
+        print("\n".join(lines))
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+def warm_up_imports(timings=None):
+    """预先导入WARMUP_MODULES（在后台线程中调用），首次对比时无需再等待导入
+
+    Args:
+        timings: 不为None时记录各模块的导入耗时（毫秒）
+    """
+    for name in WARMUP_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.debug("预热导入失败 %s: %s", name, e)
+            continue
+        if timings is not None:
+            timings[name] = round((time.perf_counter() - start) * 1000, 1)
+    for module in (pd, np, requests, pkg_version):
+        if isinstance(module, LazyModule):
+            module.load()
+
+def after_first_paint(root, callback):
+    """主窗口首次显示并绘制完成后调用callback（只调用一次）"""
+    state = {'called': False}
+
+    def on_map(event):
+        if event.widget is root and not state['called']:
+            state['called'] = True
+            root.after_idle(callback)
+
+    root.bind('<Map>', on_map, add='+')
+
+def start_warm_up(root, timer=None, on_done=None):
+    """窗口绘制完成后在后台线程中预热导入
+
+    Args:
+        root: 主窗口
+        timer: StartupTimer，不为None时记录首次绘制时间和各模块导入耗时
+        on_done: 预热完成后在主线程中调用
+    """
+    def warm_up():
+        warm_up_imports(timer.imports if timer else None)
+        if timer:
+            timer.mark('warm_up')
+        if on_done:
+            root.after(0, on_done)
+
+    def on_first_paint():
+        if timer:
+            timer.mark('first_paint')
+        threading.Thread(target=warm_up, name="warm-up-imports", daemon=True).start()
+
+    after_first_paint(root, on_first_paint)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="BOM对比工具")
+    parser.add_argument('--startup-timing', nargs='?', const='', metavar="JSON文件",
+                        help="启动计时模式：输出模块导入、首次绘制和后台预热的耗时后退出，可选保存为JSON")
+    # 忽略未知参数（如打包后的子进程参数）
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+def main(argv=None):
     """主函数"""
+    # 打包为exe时，多工作表并行解析的子进程需要在这里接管
+    multiprocessing.freeze_support()
+    args = parse_args(argv)
+    timing = args.startup_timing is not None
+    timer = StartupTimer() if timing else None
+    if timer:
+        timer.mark('imports')
+    setup_logging()
     try:
         # 创建主窗口
         root = tk.Tk()
+        if timer:
+            timer.mark('window')
 
         # 设置应用图标
         try:
@@ -4682,23 +7793,33 @@ def main():
         root.geometry(f"{default_width}x{default_height}+{x}+{y}")
 
         # 打印调试信息
-        print(f"屏幕尺寸: {screen_width}x{screen_height}")
-        print(f"任务栏高度: {taskbar_height}")
-        print(f"可用高度: {available_height}")
-        print(f"窗口尺寸: {default_width}x{default_height}")
-        print(f"窗口位置: +{x}+{y}")
+        logger.debug("屏幕尺寸: %sx%s", screen_width, screen_height)
+        logger.debug("任务栏高度: %s", taskbar_height)
+        logger.debug("可用高度: %s", available_height)
+        logger.debug("窗口尺寸: %sx%s", default_width, default_height)
+        logger.debug("窗口位置: +%s+%s", x, y)
 
         # 创建应用
         app = BOMComparerGUI(root)
 
-        # 启动后自动检查更新
-        threading.Thread(target=app.check_updates_on_startup, daemon=True).start()
+        if timer:
+            timer.mark('gui')
+
+            # 计时模式下预热完成后输出结果并退出，不检查更新
+            def finish_timing():
+                timer.report(args.startup_timing)
+                root.destroy()
+
+            start_warm_up(root, timer, finish_timing)
+        else:
+            # 窗口显示后在后台导入pandas等模块，完成后检查更新
+            start_warm_up(root, on_done=app.check_updates_on_startup)
 
         root.mainloop()
     except Exception as e:
         import traceback
         error_msg = f"发生错误: {str(e)}\n\n{traceback.format_exc()}"
-        print(error_msg)
+        logger.error("%s", error_msg)
 
         # 尝试写入错误日志
         try:
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+BOM版本历史库
+
+将load_bom的结果保存到本地SQLite数据库，每次导入为一个版本，
+位号按(版本, 位号, 料号)展开保存并在位号和料号上建立索引，支持：
+    - 查询某个位号在哪些版本中发生了变化
+    - 查询某个料号在所有版本中的使用位置
+    - 直接比较任意两个已保存的版本，无需重新读取Excel
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from bom_comparer import BOMComparer, explode_references, factorize_text, get_app_dir, sort_references, logger
+
+# 历史库文件（与config.json保存在同一目录）
+HISTORY_DB_FILE = "bom_history.sqlite"
+
+# 版本中保存的标准字段
+STANDARD_FIELDS = ['Item', 'P/N', 'Reference', 'Description', 'MPN']
+
+# 只有部分BOM才有的字段及其在revision_lines中的列名：保存原始值（BOM中没有该列时为NULL），
+# 读取版本时只恢复有值的列，与load_bom的结果一致
+OPTIONAL_FIELDS = {'Quantity': 'quantity', 'Level': 'level'}
+
+# revision_lines的列（按插入顺序）
+LINE_COLUMNS = ['revision_id', 'line_no', 'item', 'pn', 'reference', 'description', 'mpn'] + list(OPTIONAL_FIELDS.values())
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS revisions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    product TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL,
+    source_file TEXT,
+    file_hash TEXT,
+    imported_at TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    ref_count INTEGER NOT NULL,
+    alternative_map TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_revisions_product ON revisions(product, id);
+CREATE INDEX IF NOT EXISTS idx_revisions_hash ON revisions(product, file_hash);
+
+CREATE TABLE IF NOT EXISTS revision_lines (
+    revision_id INTEGER NOT NULL REFERENCES revisions(id) ON DELETE CASCADE,
+    line_no INTEGER NOT NULL,
+    item TEXT,
+    pn TEXT,
+    reference TEXT,
+    description TEXT,
+    mpn TEXT,
+    quantity TEXT,
+    level TEXT,
+    PRIMARY KEY (revision_id, line_no)
+);
+
+CREATE TABLE IF NOT EXISTS revision_refs (
+    revision_id INTEGER NOT NULL REFERENCES revisions(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    ref TEXT NOT NULL,
+    pn TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_revision_refs_ref ON revision_refs(ref, revision_id);
+CREATE INDEX IF NOT EXISTS idx_revision_refs_pn ON revision_refs(pn, revision_id);
+"""
+
+def file_sha1(file_path, chunk_size=1024 * 1024):
+    """计算文件内容的SHA1，用于识别重复导入"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class BOMHistoryStore:
+    """BOM版本历史库"""
+
+    def __init__(self, db_path=None):
+        """打开（不存在时创建）历史库
+
+        Args:
+            db_path: 数据库文件路径，为None时使用程序目录下的HISTORY_DB_FILE
+        """
+        self.db_path = db_path or os.path.join(get_app_dir(), HISTORY_DB_FILE)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.migrate()
+        self.conn.commit()
+
+    def migrate(self):
+        """为旧版本创建的数据库补充新增的列（已保存版本的新列为NULL）"""
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(revision_lines)")}
+        for column in OPTIONAL_FIELDS.values():
+            if column not in existing:
+                logger.info("历史库升级: revision_lines增加%s列", column)
+                self.conn.execute(f"ALTER TABLE revision_lines ADD COLUMN {column} TEXT")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def add_revision(self, bom_df, name, product='', source_file=None, file_hash=None, alternative_map=None):
+        """保存一个版本
+
+        Args:
+            bom_df: load_bom返回的标准化DataFrame
+            name: 版本名称，如文件名或版本号
+            product: 产品名称，版本历史按产品分组
+            source_file: 来源文件路径
+            file_hash: 来源文件的SHA1，同一产品下相同内容的文件不会重复保存
+            alternative_map: 替代料映射，只保存本版本中出现的料号
+
+        Returns:
+            int: 版本id
+        """
+        if file_hash:
+            existing = self.find_revision(product, file_hash)
+            if existing is not None:
+                logger.info("版本已存在（内容相同）: %s", existing['name'])
+                return existing['id']
+
+        columns = {}
+        for field in STANDARD_FIELDS:
+            if field in bom_df.columns:
+                texts, codes = factorize_text(bom_df[field])
+                columns[field] = np.asarray(texts, dtype=object)[codes]
+            else:
+                columns[field] = np.full(len(bom_df), '', dtype=object)
+        for field in OPTIONAL_FIELDS:
+            if field in bom_df.columns:
+                values = bom_df[field].astype(object)
+                columns[field] = values.where(values.notna(), None).to_numpy()
+            else:
+                columns[field] = np.full(len(bom_df), None, dtype=object)
+
+        ref_table = explode_references(bom_df['Reference'])
+        refs = ref_table['ref'].tolist()
+        ref_pns = columns['P/N'][ref_table['row'].to_numpy()].tolist()
+
+        pns_in_revision = set(columns['P/N'].tolist())
+        alternatives = {pn: list(alts) for pn, alts in (alternative_map or {}).items() if pn in pns_in_revision}
+
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO revisions (product, name, source_file, file_hash, imported_at, row_count, ref_count, alternative_map) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (product, name, source_file, file_hash, datetime.now().isoformat(timespec='seconds'),
+                 len(bom_df), len(set(refs)), json.dumps(alternatives, ensure_ascii=False))
+            )
+            revision_id = cursor.lastrowid
+            self.conn.executemany(
+                f"INSERT INTO revision_lines ({', '.join(LINE_COLUMNS)}) VALUES ({', '.join('?' * len(LINE_COLUMNS))})",
+                zip([revision_id] * len(bom_df), range(len(bom_df)),
+                    *(columns[field] for field in STANDARD_FIELDS + list(OPTIONAL_FIELDS)))
+            )
+            self.conn.executemany(
+                "INSERT INTO revision_refs VALUES (?, ?, ?, ?)",
+                zip([revision_id] * len(refs), range(len(refs)), refs, ref_pns)
+            )
+
+        logger.info("已保存版本 %s (id=%s): %s行, %s个位号", name, revision_id, len(bom_df), len(set(refs)))
+        return revision_id
+
+    def import_file(self, file_path, comparer=None, name=None, product=''):
+        """读取BOM文件并保存为新版本
+
+        Args:
+            file_path: BOM文件路径
+            comparer: 用于读取文件的BOMComparer（使用其字段映射和表头缓存），为None时新建
+            name: 版本名称，默认为文件名
+            product: 产品名称
+
+        Returns:
+            int: 版本id
+        """
+        file_hash = file_sha1(file_path)
+        existing = self.find_revision(product, file_hash)
+        if existing is not None:
+            logger.info("版本已存在（内容相同）: %s", existing['name'])
+            return existing['id']
+
+        comparer = comparer or BOMComparer()
+        bom_df = comparer.load_bom(file_path, projection=True)
+        return self.add_revision(bom_df, name or os.path.basename(file_path), product=product,
+                                 source_file=os.path.abspath(file_path), file_hash=file_hash,
+                                 alternative_map=comparer.alternative_map)
+
+    def find_revision(self, product, file_hash):
+        """按内容哈希查找已保存的版本"""
+        row = self.conn.execute(
+            "SELECT id, name FROM revisions WHERE product = ? AND file_hash = ? ORDER BY id LIMIT 1",
+            (product, file_hash)
+        ).fetchone()
+        return {'id': row[0], 'name': row[1]} if row else None
+
+    def list_revisions(self, product=None):
+        """列出版本（按导入顺序）
+
+        Returns:
+            list: 每个版本的信息字典
+        """
+        sql = "SELECT id, product, name, source_file, imported_at, row_count, ref_count FROM revisions"
+        params = ()
+        if product is not None:
+            sql += " WHERE product = ?"
+            params = (product,)
+        keys = ('id', 'product', 'name', 'source_file', 'imported_at', 'row_count', 'ref_count')
+        return [dict(zip(keys, row)) for row in self.conn.execute(sql + " ORDER BY id", params)]
+
+    def get_revision(self, revision_id):
+        """获取版本信息，版本不存在时抛出ValueError"""
+        row = self.conn.execute(
+            "SELECT id, product, name, alternative_map FROM revisions WHERE id = ?", (revision_id,)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"版本不存在: {revision_id}")
+        return {'id': row[0], 'product': row[1], 'name': row[2], 'alternative_map': json.loads(row[3])}
+
+    def load_revision(self, revision_id):
+        """读取版本的BOM数据
+
+        Returns:
+            DataFrame: 与load_bom返回格式相同的标准化数据
+        """
+        self.get_revision(revision_id)
+        rows = self.conn.execute(
+            f"SELECT {', '.join(LINE_COLUMNS[2:])} FROM revision_lines WHERE revision_id = ? ORDER BY line_no",
+            (revision_id,)
+        ).fetchall()
+        bom_df = pd.DataFrame(rows, columns=STANDARD_FIELDS + list(OPTIONAL_FIELDS))
+        for field in OPTIONAL_FIELDS:
+            if bom_df[field].isna().all():
+                bom_df = bom_df.drop(columns=field)
+        for field in ('P/N', 'MPN', 'Description'):
+            bom_df[field] = bom_df[field].astype('category')
+        return bom_df
+
+    def delete_revision(self, revision_id):
+        """删除版本及其展开数据"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM revisions WHERE id = ?", (revision_id,))
+
+    def reference_history(self, ref, product=None):
+        """查询位号在哪些版本中发生了变化
+
+        按导入顺序逐个版本比较该位号对应的料号（重复位号以最后一行为准），
+        返回位号首次出现、料号变更和被移除的版本。
+
+        Returns:
+            list: [{'revision_id', 'revision', 'change', 'pn_before', 'pn_after'}]，
+                change为'added'、'changed'或'removed'
+        """
+        pn_by_revision = {
+            revision_id: pn for revision_id, pn in self.conn.execute(
+                "SELECT r.revision_id, r.pn FROM revision_refs r "
+                "JOIN (SELECT revision_id, MAX(seq) AS seq FROM revision_refs WHERE ref = ? GROUP BY revision_id) last "
+                "ON r.revision_id = last.revision_id AND r.seq = last.seq WHERE r.ref = ?",
+                (ref, ref)
+            )
+        }
+
+        changes = []
+        previous = None
+        for revision in self.list_revisions(product):
+            current = pn_by_revision.get(revision['id'])
+            if current != previous:
+                if previous is None:
+                    change = 'added'
+                elif current is None:
+                    change = 'removed'
+                else:
+                    change = 'changed'
+                changes.append({
+                    'revision_id': revision['id'],
+                    'revision': revision['name'],
+                    'change': change,
+                    'pn_before': previous,
+                    'pn_after': current
+                })
+            previous = current
+        return changes
+
+    def where_used(self, pn, product=None):
+        """查询料号在各版本中的使用位置
+
+        Returns:
+            list: [{'revision_id', 'revision', 'refs'}]，按导入顺序排列，refs按自然顺序排序
+        """
+        sql = ("SELECT v.id, v.name, r.ref FROM revision_refs r JOIN revisions v ON v.id = r.revision_id "
+               "WHERE r.pn = ?")
+        params = [pn]
+        if product is not None:
+            sql += " AND v.product = ?"
+            params.append(product)
+
+        usage = {}
+        names = {}
+        for revision_id, name, ref in self.conn.execute(sql, params):
+            usage.setdefault(revision_id, set()).add(ref)
+            names[revision_id] = name
+
+        return [{'revision_id': revision_id, 'revision': names[revision_id], 'refs': sort_references(usage[revision_id])}
+                for revision_id in sorted(usage)]
+
+    def compare_revisions(self, revision_a, revision_b, comparer=None):
+        """比较两个已保存的版本
+
+        Args:
+            revision_a: 基准版本id
+            revision_b: 对比版本id
+            comparer: 用于比较的BOMComparer（使用其报告设置），为None时新建
+
+        Returns:
+            CompareReport: 对比报告
+        """
+        comparer = comparer or BOMComparer()
+        info_a = self.get_revision(revision_a)
+        info_b = self.get_revision(revision_b)
+
+        # 两个版本保存的替代料关系只用于本次对比，不留在comparer中
+        with comparer.extra_alternatives(info_a['alternative_map'], info_b['alternative_map']):
+            return comparer.compare(self.load_revision(revision_a), self.load_revision(revision_b), is_dataframe=True)
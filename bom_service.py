@@ -0,0 +1,817 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+BOM对比服务
+
+在本机启动HTTP服务，供其他工具调用BOM对比（不依赖数据库服务器等外部服务）：
+
+    POST /compare   multipart/form-data，file_a、file_b字段为两个BOM文件
+    POST /compare   application/json，{"revision_a": 1, "revision_b": 2}，比较版本历史库中已保存的版本
+                    查询参数 format=json（默认，返回差异数据和报告文本）或 format=xlsx（返回Excel报告），
+                    mpn=0 时报告中不显示MPN
+    POST /jobs      请求体和参数与/compare相同，立即返回任务id（202），对比在后台执行
+    GET  /jobs/<id>         任务状态和当前进度
+    GET  /jobs/<id>/events  以server-sent events推送进度，任务结束时推送done/failed事件
+    GET  /jobs/<id>/result  任务结果（格式与/compare的返回相同）
+    GET  /health    服务状态（工作进程数、正在处理的任务数、缓存的BOM数）
+
+对比在固定大小的进程池中执行，正在执行和排队的任务总数达到上限时返回503，
+单个任务超过时限返回504。已解析的BOM按文件内容缓存在服务进程内存中，所有请求共享，
+同一文件再次提交时无需重新解析。任务由asyncio事件循环管理，已完成任务的结果保留一段时间后清除。
+
+用法:
+    python bom_service.py --port 8765 --workers 2 --queue 8 --timeout 120
+"""
+
+import os
+import io
+import sys
+import json
+import math
+import time
+import uuid
+import signal
+import asyncio
+import hashlib
+import argparse
+import tempfile
+import threading
+import multiprocessing
+import email.policy
+from email.parser import BytesParser
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+from bom_comparer import (BOMComparer, CompareReport, SUPPORTED_BOM_EXTENSIONS, APP_VERSION, get_app_dir,
+                          merge_alternative_maps, sort_references, write_report_workbook, setup_logging, logger)
+from bom_history import BOMHistoryStore
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+DEFAULT_QUEUE_SIZE = 8          # 工作进程都在忙时最多排队的任务数
+DEFAULT_JOB_TIMEOUT = 120       # 单个任务的时限（秒）
+DEFAULT_MAX_UPLOAD_MB = 100     # 单个请求体的大小上限
+PARSED_CACHE_ENTRIES = 32       # 内存中保留的已解析BOM个数
+DEFAULT_JOB_TTL = 600           # 已完成任务的状态和结果保留时间（秒）
+JOB_EVICT_INTERVAL = 30         # 清除过期任务的间隔（秒）
+SSE_KEEPALIVE_SECONDS = 15      # 进度推送连接在没有新进度时发送保活注释的间隔（秒）
+
+# 工作进程中用SIGALRM中断超时的任务（Linux/macOS），其他平台只在等待结果时计时
+ALARM_SUPPORTED = hasattr(signal, 'SIGALRM')
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+class ServiceBusyError(Exception):
+    """正在执行和排队的任务已达到上限"""
+
+class JobTimeoutError(BaseException):
+    """任务超过时限
+
+    继承BaseException，避免在工作进程中被对比流程的异常处理（except Exception）捕获而无法中断任务。
+    """
+
+def _raise_job_timeout(signum, frame):
+    raise JobTimeoutError()
+
+def create_comparer(field_mappings=None):
+    """创建无界面使用的BOMComparer（不弹出对话框，不缓存对比结果）"""
+    comparer = BOMComparer()
+    comparer.interactive = False
+    comparer.compare_cache.max_entries = 0
+    if field_mappings:
+        comparer.set_field_mappings(field_mappings)
+    return comparer
+
+def parse_bom_bytes(file_name, data, field_mappings=None):
+    """解析上传的BOM文件内容
+
+    Returns:
+        tuple: (标准化的DataFrame, 该文件识别出的替代料映射)
+    """
+    suffix = os.path.splitext(file_name)[1].lower()
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        comparer = create_comparer(field_mappings)
+        bom_df = comparer.load_bom(path, projection=True)
+        return bom_df, comparer.alternative_map
+    finally:
+        os.remove(path)
+
+def exploded_diff_to_dict(exploded_a, exploded_b, diff):
+    """将展开后的差异结果转换为可JSON序列化的字典（料号为文本，位号按自然顺序排列）"""
+    names = exploded_a.pool.names
+    ref_changed = diff['ref_changed']
+
+    quantity_changes = []
+    for pn in sorted(diff['pn_common'] | diff['pn_added'] | diff['pn_removed'], key=names.__getitem__):
+        qty_a = exploded_a.quantity(pn)
+        qty_b = exploded_b.quantity(pn)
+        if qty_a != qty_b:
+            quantity_changes.append({'pn': names[pn], 'qty_a': qty_a, 'qty_b': qty_b})
+
+    return {
+        'summary': {
+            'parts_a': int(exploded_a.part_count()),
+            'refs_a': int(exploded_a.ref_count()),
+            'parts_b': int(exploded_b.part_count()),
+            'refs_b': int(exploded_b.ref_count())
+        },
+        'pn_added': sorted(names[pn] for pn in diff['pn_added']),
+        'pn_removed': sorted(names[pn] for pn in diff['pn_removed']),
+        'ref_added': [{'ref': ref, 'pn': names[exploded_b.ref_to_pn[ref]]}
+                      for ref in sort_references(diff['ref_added'])],
+        'ref_removed': [{'ref': ref, 'pn': names[exploded_a.ref_to_pn[ref]]}
+                        for ref in sort_references(diff['ref_removed'])],
+        'ref_changed': [{'ref': ref, 'pn_a': names[ref_changed[ref][0]], 'pn_b': names[ref_changed[ref][1]],
+                         'alternative': ref_changed[ref][2]}
+                        for ref in sort_references(ref_changed)],
+        'quantity_changes': quantity_changes
+    }
+
+def result_to_dict(compare_result):
+    """将BOMComparer.last_result转换为可JSON序列化的字典"""
+    if compare_result['kind'] == 'hierarchy':
+        hierarchy = compare_result['diff']
+        return {
+            'kind': 'hierarchy',
+            'assemblies': [dict(exploded_diff_to_dict(exploded_a, exploded_b, diff), path=path)
+                           for path, exploded_a, exploded_b, diff in hierarchy['assemblies']],
+            'added': [{'path': path, 'rows': rows} for path, rows in hierarchy['added']],
+            'removed': [{'path': path, 'rows': rows} for path, rows in hierarchy['removed']],
+            'skipped': hierarchy['skipped'],
+            'skipped_rows': hierarchy['skipped_rows']
+        }
+    return dict(exploded_diff_to_dict(compare_result['a'], compare_result['b'], compare_result['diff']), kind='flat')
+
+def run_compare_job(sources, options, timeout=None, progress_queue=None, job_id=None):
+    """在工作进程中执行一次对比
+
+    Args:
+        sources: 两个BOM的来源，每项为 ('frame', DataFrame, 替代料映射) 或 ('file', 文件名, 文件内容)
+        options: {'format': 'json'或'xlsx', 'show_mpn': bool, 'field_mappings': 字段映射或None}
+        timeout: 时限（秒），超过时抛出JobTimeoutError（仅支持SIGALRM的平台）
+        progress_queue: 进度队列，对比进度以(job_id, 进度, 信息)放入队列
+        job_id: 任务id
+
+    Returns:
+        tuple: (输出内容, 本次解析的BOM [(来源序号, DataFrame, 替代料映射)])，
+            json格式的输出为字典，xlsx格式为工作簿的字节内容
+    """
+    use_alarm = bool(timeout) and ALARM_SUPPORTED
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_job_timeout)
+        signal.alarm(math.ceil(timeout))
+    try:
+        def report_progress(progress, message=""):
+            if progress_queue is not None:
+                progress_queue.put((job_id, progress, message))
+
+        report_progress(0, "开始对比")
+        comparer = create_comparer(options.get('field_mappings'))
+        comparer.show_mpn_in_report = options.get('show_mpn', True)
+
+        frames = []
+        alternative_maps = []
+        parsed = []
+        for index, source in enumerate(sources):
+            if source[0] == 'frame':
+                bom_df, alternatives = source[1], source[2]
+            else:
+                report_progress(0, f"解析文件: {source[1]}")
+                bom_df, alternatives = parse_bom_bytes(source[1], source[2], options.get('field_mappings'))
+                parsed.append((index, bom_df, alternatives))
+            frames.append(bom_df)
+            alternative_maps.append(alternatives)
+        comparer.set_alternative_map(merge_alternative_maps(*alternative_maps))
+
+        comparer.set_progress_callback(report_progress)
+        report = comparer.compare(frames[0], frames[1], is_dataframe=True)
+        if not isinstance(report, CompareReport):
+            # run_compare出错时返回错误信息文本
+            raise RuntimeError(report)
+
+        if options.get('format') == 'xlsx':
+            buffer = io.BytesIO()
+            write_report_workbook(report, buffer)
+            output = buffer.getvalue()
+        else:
+            output = {'report': str(report), 'timings': report.timings, 'diff': result_to_dict(comparer.last_result)}
+        return output, parsed
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+class ParsedBOMCache:
+    """已解析BOM的内存缓存，所有请求共享
+
+    上传的文件以(内容SHA1, 扩展名)为键，历史库版本以('revision', 数据库路径, 版本id)为键，
+    按最近使用顺序淘汰。
+    """
+
+    def __init__(self, max_entries=PARSED_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """返回(DataFrame, 替代料映射)，不存在时返回None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, bom_df, alternatives):
+        with self.lock:
+            self.entries[key] = (bom_df, alternatives)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+class CompareJob:
+    """对比任务的状态、进度和结果"""
+
+    def __init__(self, output_format):
+        self.id = uuid.uuid4().hex
+        self.output_format = output_format
+        self.status = 'queued'      # queued、running、done、failed、timeout
+        self.progress = 0
+        self.message = "排队中"
+        self.events = []            # 进度事件 [(进度, 信息)]，按顺序推送
+        self.output = None
+        self.error = None           # 失败时的异常
+        self.created = time.time()
+        self.finished = None
+        self.changed = None         # asyncio.Event，进度或状态变化时触发后替换为新的Event
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed', 'timeout')
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'error': None if self.error is None else str(self.error),
+            'created': self.created,
+            'finished': self.finished
+        }
+
+class JobManager:
+    """基于asyncio的对比任务管理
+
+    事件循环在独立线程中运行，HTTP处理线程通过线程安全的方法提交和查询任务。
+    任务在服务的进程池中执行，工作进程通过共享队列回传进度；
+    已完成的任务保留 ttl 秒后清除。
+    """
+
+    def __init__(self, service, ttl=DEFAULT_JOB_TTL):
+        self.service = service
+        self.ttl = ttl
+        self.jobs = {}
+        self._tasks = set()
+
+        self.loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._run_loop, name="bom-job-loop", daemon=True)
+        self._loop_thread.start()
+
+        # 进度队列由manager进程托管，可传给进程池中的工作进程
+        self._progress_manager = multiprocessing.get_context('spawn').Manager()
+        self.progress_queue = self._progress_manager.Queue()
+        self._progress_thread = threading.Thread(target=self._read_progress, name="bom-job-progress", daemon=True)
+        self._progress_thread.start()
+
+        self._call(self._start_eviction())
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _call(self, coro, timeout=None):
+        """在事件循环中执行协程并等待结果（供其他线程调用）"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def close(self):
+        try:
+            self.progress_queue.put(None)
+        except (EOFError, OSError):
+            pass
+        self._progress_manager.shutdown()
+        self._call(self._cancel_tasks())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def _cancel_tasks(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _read_progress(self):
+        """读取工作进程回传的进度并转交事件循环"""
+        while True:
+            try:
+                item = self.progress_queue.get()
+            except (EOFError, OSError):
+                break
+            if item is None:
+                break
+            self.loop.call_soon_threadsafe(self._on_progress, *item)
+
+    def _notify(self, job):
+        job.changed.set()
+        job.changed = asyncio.Event()
+
+    def _on_progress(self, job_id, progress, message):
+        job = self.jobs.get(job_id)
+        if job is None or job.done:
+            return
+        job.status = 'running'
+        job.progress = progress
+        job.message = message or job.message
+        job.events.append((progress, job.message))
+        self._notify(job)
+
+    def _finish(self, job, status, output=None, error=None):
+        job.status = status
+        job.output = output
+        job.error = error
+        job.finished = time.time()
+        if status == 'done':
+            job.progress = 100
+            job.message = "对比完成"
+        else:
+            job.message = str(error)
+        self._notify(job)
+
+    def submit(self, sources, keys, options):
+        """提交对比任务，立即返回
+
+        Raises:
+            ServiceBusyError: 正在执行和排队的任务已达到上限
+        """
+        if not self.service.slots.acquire(blocking=False):
+            raise ServiceBusyError()
+        try:
+            return self._call(self._submit(sources, keys, options))
+        except BaseException:
+            self.service.slots.release()
+            raise
+
+    async def _submit(self, sources, keys, options):
+        job = CompareJob(options['format'])
+        job.changed = asyncio.Event()
+        self.jobs[job.id] = job
+        task = asyncio.create_task(self._run(job, sources, keys, options))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job, sources, keys, options):
+        service = self.service
+        executor = service.executor
+        service.active_jobs += 1
+        try:
+            future = self.loop.run_in_executor(executor, run_compare_job, sources, options,
+                                               service.job_timeout, self.progress_queue, job.id)
+            # 支持SIGALRM时由工作进程自己中断超时任务，否则在这里停止等待（任务会继续占用工作进程）
+            wait_timeout = None if ALARM_SUPPORTED or not service.job_timeout else service.job_timeout
+            output, parsed = await asyncio.wait_for(future, wait_timeout)
+        except (JobTimeoutError, asyncio.TimeoutError):
+            self._finish(job, 'timeout', error=JobTimeoutError(f"对比超过时限（{service.job_timeout}秒）"))
+        except BrokenProcessPool as e:
+            # 工作进程异常退出（如内存不足被系统结束），重建进程池
+            service.restart_executor(executor)
+            self._finish(job, 'failed', error=e)
+        except Exception as e:
+            self._finish(job, 'failed', error=e)
+        else:
+            for index, bom_df, alternatives in parsed:
+                service.cache.put(keys[index], bom_df, alternatives)
+            self._finish(job, 'done', output=output)
+        finally:
+            service.active_jobs -= 1
+            service.completed_jobs += 1
+            service.slots.release()
+
+    def get(self, job_id):
+        """返回任务，不存在（或已过期清除）时返回None"""
+        return self.jobs.get(job_id)
+
+    def wait_events(self, job, seen, timeout=None):
+        """等待任务产生第seen个之后的进度事件或结束
+
+        Returns:
+            list: 新的进度事件，超时时为空列表
+        """
+        return self._call(self._wait_events(job, seen, timeout))
+
+    async def _wait_events(self, job, seen, timeout):
+        if len(job.events) <= seen and not job.done:
+            try:
+                await asyncio.wait_for(job.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job.events[seen:]
+
+    def wait_done(self, job):
+        """阻塞直到任务结束"""
+        while not job.done:
+            self.wait_events(job, len(job.events))
+
+    def discard(self, job_id):
+        self.loop.call_soon_threadsafe(self.jobs.pop, job_id, None)
+
+    async def _start_eviction(self):
+        task = asyncio.create_task(self._evict_periodically())
+        self._tasks.add(task)
+
+    async def _evict_periodically(self):
+        while True:
+            await asyncio.sleep(JOB_EVICT_INTERVAL)
+            self.evict_expired()
+
+    def evict_expired(self, now=None):
+        """清除结束超过ttl秒的任务（在事件循环中调用）"""
+        now = time.time() if now is None else now
+        expired = [job_id for job_id, job in self.jobs.items() if job.done and now - job.finished > self.ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
+        if expired:
+            logger.debug("清除过期任务: %s个", len(expired))
+
+    def counts(self):
+        counts = {}
+        for job in list(self.jobs.values()):
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+class BOMCompareService:
+    """对比服务：进程池、排队上限、任务时限、任务管理和已解析BOM缓存"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE, job_timeout=DEFAULT_JOB_TIMEOUT,
+                 history_db=None, field_mappings=None, job_ttl=DEFAULT_JOB_TTL):
+        """
+        Args:
+            workers: 工作进程数
+            queue_size: 工作进程都在忙时最多排队的任务数
+            job_timeout: 单个任务的时限（秒），0表示不限制
+            history_db: 版本历史库路径，为None时使用程序目录下的默认历史库
+            field_mappings: 字段映射，为None时使用默认映射
+            job_ttl: 已完成任务的状态和结果保留时间（秒）
+        """
+        self.workers = workers
+        self.queue_size = queue_size
+        self.job_timeout = job_timeout
+        self.history_db = history_db
+        self.field_mappings = field_mappings
+        self.cache = ParsedBOMCache()
+
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.lock = threading.Lock()
+        self.active_jobs = 0        # 只在任务管理的事件循环中修改
+        self.completed_jobs = 0
+        self._history = None
+        self.executor = self._create_executor()
+        self.jobs = JobManager(self, job_ttl)
+
+    def _create_executor(self):
+        # HTTP服务是多线程的，使用spawn启动工作进程，避免fork时复制其他线程持有的锁
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def close(self):
+        self.jobs.close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self._history is not None:
+            self._history.close()
+
+    def file_source(self, file_name, data):
+        """上传文件的来源：已缓存时直接使用解析结果
+
+        Returns:
+            tuple: (来源, 缓存键)
+        """
+        if not data:
+            raise ValueError(f"文件为空: {file_name}")
+        suffix = os.path.splitext(file_name)[1].lower()
+        if suffix not in SUPPORTED_BOM_EXTENSIONS:
+            raise ValueError(f"不支持的文件格式: {file_name}")
+        key = (hashlib.sha1(data).hexdigest(), suffix)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return ('frame', cached[0], cached[1]), key
+        return ('file', file_name, data), key
+
+    def revision_source(self, revision_id):
+        """历史库版本的来源（在服务进程中读取，读取后缓存）"""
+        with self.lock:
+            if self._history is None:
+                self._history = BOMHistoryStore(self.history_db)
+            key = ('revision', self._history.db_path, revision_id)
+            cached = self.cache.get(key)
+            if cached is None:
+                info = self._history.get_revision(revision_id)
+                cached = (self._history.load_revision(revision_id), info['alternative_map'])
+                self.cache.put(key, *cached)
+        return ('frame', cached[0], cached[1]), key
+
+    def submit(self, sources, keys, output_format='json', show_mpn=True):
+        """提交对比任务，立即返回CompareJob
+
+        Raises:
+            ServiceBusyError: 正在执行和排队的任务已达到上限
+        """
+        options = {'format': output_format, 'show_mpn': show_mpn, 'field_mappings': self.field_mappings}
+        return self.jobs.submit(sources, keys, options)
+
+    def compare(self, sources, keys, output_format='json', show_mpn=True):
+        """执行对比，阻塞直到完成
+
+        Raises:
+            ServiceBusyError: 正在执行和排队的任务已达到上限
+            JobTimeoutError: 任务超过时限
+        """
+        job = self.submit(sources, keys, output_format, show_mpn)
+        self.jobs.wait_done(job)
+        self.jobs.discard(job.id)
+        if job.status != 'done':
+            raise job.error
+        return job.output
+
+    def restart_executor(self, broken):
+        with self.lock:
+            if self.executor is broken:
+                logger.warning("工作进程异常退出，重建进程池")
+                self.executor = self._create_executor()
+                broken.shutdown(wait=False, cancel_futures=True)
+
+    def status(self):
+        return {
+            'version': APP_VERSION,
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'active_jobs': self.active_jobs,
+            'completed_jobs': self.completed_jobs,
+            'jobs': self.jobs.counts(),
+            'cached_boms': len(self.cache),
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses
+        }
+
+def parse_multipart(content_type, body):
+    """解析multipart/form-data请求体
+
+    Returns:
+        dict: {字段名: (文件名, 内容)}
+    """
+    message = BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode('latin-1') + b"\r\n\r\n" + body)
+    if not message.is_multipart():
+        raise ValueError("请求体不是有效的multipart/form-data")
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if name:
+            fields[name] = (part.get_filename() or '', part.get_payload(decode=True) or b'')
+    return fields
+
+class CompareRequestHandler(BaseHTTPRequestHandler):
+    """对比服务的HTTP请求处理"""
+
+    server_version = f"BOMCompareService/{APP_VERSION}"
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message, headers=None):
+        self.send_json(status, {'error': message}, headers)
+
+    def send_output(self, output_format, output):
+        if output_format == 'xlsx':
+            self.send_response(200)
+            self.send_header("Content-Type", XLSX_CONTENT_TYPE)
+            self.send_header("Content-Disposition", 'attachment; filename="bom_compare.xlsx"')
+            self.send_header("Content-Length", str(len(output)))
+            self.end_headers()
+            self.wfile.write(output)
+        else:
+            self.send_json(200, output)
+
+    def send_compare_error(self, error):
+        """按异常类型返回对应的错误状态码"""
+        if isinstance(error, ServiceBusyError):
+            self.send_error_json(503, "服务繁忙，请稍后重试", {"Retry-After": "5"})
+        elif isinstance(error, JobTimeoutError):
+            self.send_error_json(504, f"对比超过时限（{self.server.service.job_timeout}秒）")
+        elif isinstance(error, ValueError):
+            self.send_error_json(400, str(error))
+        else:
+            self.send_error_json(500, str(error))
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/health':
+            self.send_json(200, self.server.service.status())
+            return
+
+        parts = path.strip('/').split('/')
+        if parts[0] != 'jobs' or len(parts) not in (2, 3):
+            self.send_error_json(404, "未知的路径")
+            return
+        job = self.server.service.jobs.get(parts[1])
+        if job is None:
+            self.send_error_json(404, "任务不存在或已过期")
+            return
+
+        if len(parts) == 2:
+            self.send_json(200, job.to_dict())
+        elif parts[2] == 'events':
+            self.stream_job_events(job)
+        elif parts[2] == 'result':
+            if not job.done:
+                self.send_json(409, job.to_dict())
+            elif job.status == 'done':
+                self.send_output(job.output_format, job.output)
+            else:
+                self.send_compare_error(job.error)
+        else:
+            self.send_error_json(404, "未知的路径")
+
+    def stream_job_events(self, job):
+        """以server-sent events推送任务进度，任务结束后关闭连接"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        jobs = self.server.service.jobs
+        seen = 0
+        try:
+            while True:
+                events = jobs.wait_events(job, seen, SSE_KEEPALIVE_SECONDS)
+                for progress, message in events:
+                    self.write_event('progress', {'progress': progress, 'message': message})
+                seen += len(events)
+                if job.done and seen >= len(job.events):
+                    self.write_event(job.status, job.to_dict())
+                    break
+                if not events:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            logger.debug("进度推送连接已断开: %s", job.id)
+
+    def write_event(self, event, data):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+    def read_compare_request(self):
+        """读取请求体中的两个BOM
+
+        Returns:
+            tuple: (来源列表, 缓存键列表)，请求无效时返回None（已发送错误响应）
+        """
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > self.server.max_upload_bytes:
+            self.send_error_json(413, "请求体过大")
+            return None
+        body = self.rfile.read(length)
+
+        service = self.server.service
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            fields = parse_multipart(content_type, body)
+            if 'file_a' not in fields or 'file_b' not in fields:
+                raise ValueError("需要上传file_a和file_b两个文件")
+            resolved = [service.file_source(*fields[name]) for name in ('file_a', 'file_b')]
+        elif content_type.startswith('application/json'):
+            payload = json.loads(body or b'{}')
+            if 'revision_a' not in payload or 'revision_b' not in payload:
+                raise ValueError("需要提供revision_a和revision_b")
+            resolved = [service.revision_source(int(payload[name])) for name in ('revision_a', 'revision_b')]
+        else:
+            self.send_error_json(415, "请使用multipart/form-data上传文件或application/json指定版本")
+            return None
+        return [source for source, _ in resolved], [key for _, key in resolved]
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path not in ('/compare', '/jobs'):
+            self.send_error_json(404, "未知的路径")
+            return
+
+        params = parse_qs(url.query)
+        output_format = params.get('format', ['json'])[0]
+        if output_format not in ('json', 'xlsx'):
+            self.send_error_json(400, "format只能为json或xlsx")
+            return
+        show_mpn = params.get('mpn', ['1'])[0].lower() not in ('0', 'false', 'no')
+
+        service = self.server.service
+        try:
+            request = self.read_compare_request()
+            if request is None:
+                return
+            sources, keys = request
+            if url.path == '/jobs':
+                job = service.submit(sources, keys, output_format, show_mpn)
+            else:
+                output = service.compare(sources, keys, output_format, show_mpn)
+        except (ServiceBusyError, JobTimeoutError, ValueError) as e:
+            self.send_compare_error(e)
+            return
+        except Exception as e:
+            logger.exception("处理对比请求出错")
+            self.send_compare_error(e)
+            return
+
+        if url.path == '/jobs':
+            self.send_json(202, {
+                'job_id': job.id,
+                'status_url': f"/jobs/{job.id}",
+                'events_url': f"/jobs/{job.id}/events",
+                'result_url': f"/jobs/{job.id}/result"
+            }, {"Location": f"/jobs/{job.id}"})
+        else:
+            self.send_output(output_format, output)
+
+def load_field_mappings(config_path):
+    """从GUI的配置文件读取字段映射，文件不存在或没有字段映射时返回None"""
+    if not config_path or not os.path.exists(config_path):
+        return None
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('field_mappings')
+
+def create_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, max_upload_mb=DEFAULT_MAX_UPLOAD_MB):
+    """创建HTTP服务（调用serve_forever开始处理请求）"""
+    server = ThreadingHTTPServer((host, port), CompareRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.max_upload_bytes = max_upload_mb * 1024 * 1024
+    return server
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="BOM对比HTTP服务")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="监听地址，默认只接受本机请求")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="监听端口")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="工作进程数")
+    parser.add_argument('--queue', type=int, default=DEFAULT_QUEUE_SIZE, help="工作进程都在忙时最多排队的任务数")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_JOB_TIMEOUT, help="单个任务的时限（秒），0表示不限制")
+    parser.add_argument('--job-ttl', type=float, default=DEFAULT_JOB_TTL, help="已完成任务的结果保留时间（秒）")
+    parser.add_argument('--max-upload-mb', type=int, default=DEFAULT_MAX_UPLOAD_MB, help="请求体大小上限（MB）")
+    parser.add_argument('--history-db', help="版本历史库路径，默认使用程序目录下的历史库")
+    parser.add_argument('--config', default=os.path.join(get_app_dir(), "config.json"),
+                        help="读取字段映射的配置文件（与GUI共用）")
+    parser.add_argument('--debug', action='store_true', help="输出调试日志")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging(args.debug)
+
+    service = BOMCompareService(workers=args.workers, queue_size=args.queue, job_timeout=args.timeout,
+                                history_db=args.history_db, field_mappings=load_field_mappings(args.config),
+                                job_ttl=args.job_ttl)
+    server = create_server(service, args.host, args.port, args.max_upload_mb)
+    logger.info("BOM对比服务已启动: http://%s:%s (工作进程: %s, 排队上限: %s)",
+                args.host, args.port, args.workers, args.queue)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+BOM对比服务压力测试
+
+生成合成BOM（与bom_benchmark.py使用相同的生成方法），以指定的并发数向对比服务提交请求，
+统计吞吐量、延迟分位数和各状态码的数量。--pairs小于请求数时同一对文件会重复提交，
+可用于观察已解析BOM缓存的效果。
+
+用法示例:
+    python bom_service.py --port 8765 --workers 2 &
+    python bom_service_loadtest.py --url http://127.0.0.1:8765 --rows 2000 --requests 50 --concurrency 8
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bom_benchmark import generate_bom, mutate_bom, write_bom, format_available
+
+def percentile(values, pct):
+    """按最近秩法计算分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def prepare_pairs(args, work_dir):
+    """生成用于提交的BOM文件对"""
+    pairs = []
+    for pair in range(args.pairs):
+        bom_a = generate_bom(args.rows, seed=args.seed + pair)
+        bom_b = mutate_bom(bom_a, change_pct=args.change_pct, seed=args.seed + pair)
+        paths = []
+        for name, bom_df in (('a', bom_a), ('b', bom_b)):
+            path = os.path.join(work_dir, f"pair{pair}_{name}.{args.file_format}")
+            write_bom(bom_df, path, args.file_format)
+            paths.append(path)
+        pairs.append(paths)
+    return pairs
+
+def submit(session_local, url, paths, output_format, timeout):
+    """提交一次对比请求
+
+    Returns:
+        tuple: (状态码或异常类型名, 耗时秒数)
+    """
+    session = getattr(session_local, 'session', None)
+    if session is None:
+        session = session_local.session = requests.Session()
+
+    start = time.perf_counter()
+    try:
+        with open(paths[0], 'rb') as file_a, open(paths[1], 'rb') as file_b:
+            files = {
+                'file_a': (os.path.basename(paths[0]), file_a),
+                'file_b': (os.path.basename(paths[1]), file_b)
+            }
+            response = session.post(f"{url}/compare", params={'format': output_format}, files=files, timeout=timeout)
+        status = response.status_code
+    except requests.RequestException as e:
+        status = type(e).__name__
+    return status, time.perf_counter() - start
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="BOM对比服务压力测试")
+    parser.add_argument('--url', default="http://127.0.0.1:8765", help="对比服务地址")
+    parser.add_argument('--rows', type=int, default=2000, help="每个BOM的行数")
+    parser.add_argument('--change-pct', type=float, default=5.0, help="A/B之间变更的行百分比")
+    parser.add_argument('--pairs', type=int, default=4, help="不同的文件对个数")
+    parser.add_argument('--requests', type=int, default=40, help="请求总数")
+    parser.add_argument('--concurrency', type=int, default=8, help="并发请求数")
+    parser.add_argument('--format', dest='output_format', default='json', choices=['json', 'xlsx'], help="返回格式")
+    parser.add_argument('--file-format', default='xlsx', choices=['xlsx', 'csv', 'tsv', 'parquet'], help="提交的文件格式")
+    parser.add_argument('--timeout', type=float, default=300, help="单个请求的超时（秒）")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--output', help="结果JSON文件")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not format_available(args.file_format):
+        print(f"缺少写出{args.file_format}文件所需的库")
+        return 1
+
+    try:
+        health = requests.get(f"{args.url}/health", timeout=5).json()
+    except requests.RequestException as e:
+        print(f"无法连接对比服务 {args.url}: {e}")
+        return 1
+    print(f"服务状态: {health}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        pairs = prepare_pairs(args, work_dir)
+        session_local = threading.local()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            futures = [executor.submit(submit, session_local, args.url, pairs[index % len(pairs)],
+                                       args.output_format, args.timeout)
+                       for index in range(args.requests)]
+            outcomes = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+
+    statuses = Counter(str(status) for status, _ in outcomes)
+    latencies = [seconds for status, seconds in outcomes if status == 200]
+    results = {
+        'url': args.url,
+        'rows': args.rows,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_per_second': round(len(latencies) / elapsed, 3) if elapsed else None,
+        'statuses': dict(statuses),
+        'latency_seconds': {
+            'p50': percentile(latencies, 50),
+            'p90': percentile(latencies, 90),
+            'p99': percentile(latencies, 99),
+            'max': max(latencies) if latencies else None
+        },
+        'server': requests.get(f"{args.url}/health", timeout=5).json()
+    }
+
+    print(f"请求数: {args.requests}, 并发: {args.concurrency}, 总耗时: {elapsed:.2f}秒, "
+          f"吞吐量: {results['throughput_per_second']}次/秒")
+    print(f"状态码: {dict(statuses)}")
+    latency = results['latency_seconds']
+    if latencies:
+        print(f"延迟: p50={latency['p50']:.3f}s p90={latency['p90']:.3f}s "
+              f"p99={latency['p99']:.3f}s max={latency['max']:.3f}s")
+    print(f"服务端缓存: 命中{results['server']['cache_hits']}次, 未命中{results['server']['cache_misses']}次")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
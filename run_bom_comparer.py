@@ -7,12 +7,15 @@ BOM对比工具启动脚本
 
 import os
 import sys
-import traceback
-from bom_comparer import BOMComparerGUI
+import multiprocessing
+from bom_comparer import BOMComparerGUI, setup_logging, start_warm_up, logger
 import tkinter as tk
 
 def main():
     """主函数"""
+    # 打包为exe时，多工作表并行解析的子进程需要在这里接管
+    multiprocessing.freeze_support()
+    setup_logging()
     try:
         # 创建主窗口
         root = tk.Tk()
@@ -48,18 +51,20 @@ def main():
         root.geometry(f"{default_width}x{default_height}+{x}+{y}")
 
         # 打印调试信息
-        print(f"屏幕尺寸: {screen_width}x{screen_height}")
-        print(f"窗口尺寸: {default_width}x{default_height}")
-        print(f"窗口位置: +{x}+{y}")
+        logger.debug("屏幕尺寸: %sx%s", screen_width, screen_height)
+        logger.debug("窗口尺寸: %sx%s", default_width, default_height)
+        logger.debug("窗口位置: +%s+%s", x, y)
 
         # 创建应用
         app = BOMComparerGUI(root)
 
+        # 窗口显示后在后台导入pandas等模块
+        start_warm_up(root)
+
         # 运行应用
         root.mainloop()
     except Exception as e:
-        print(f"程序启动出错: {str(e)}")
-        traceback.print_exc()
+        logger.exception("程序启动出错: %s", e)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""测试用的本地HTTP服务器和共用的发布信息"""
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 更新检查测试共用的发布信息，以及check_for_updates对应的返回值
+RELEASE = {
+    'tag_name': 'v99.0',
+    'body': '更新日志',
+    'zipball_url': 'https://example.com/zipball',
+    'assets': [{'name': 'BOM_Comparer_v99.0.exe', 'browser_download_url': 'https://example.com/BOM_Comparer_v99.0.exe',
+                'size': 10}],
+}
+UPDATE_RESULT = (True, '99.0', 'https://example.com/BOM_Comparer_v99.0.exe', '更新日志', True)
+
+
+class LocalServer(ThreadingHTTPServer):
+    """在后台线程运行的本地HTTP服务器，记录收到的请求和建立的连接数"""
+
+    daemon_threads = True
+
+    def __init__(self, handler_class):
+        super().__init__(('127.0.0.1', 0), handler_class)
+        self.lock = threading.Lock()
+        self.requests = []      # [(方法, 路径, 请求头)]
+        self.connections = 0
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def url(self, path='/'):
+        return f"http://127.0.0.1:{self.server_port}{path}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    """记录请求的处理器，使用HTTP/1.1保持连接"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def parse_request(self):
+        if not super().parse_request():
+            return False
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path, self.headers))
+        return True
+
+    def send_body(self, body, status=200, headers=None):
+        """发送响应，body为bytes"""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,171 @@
+"""download_with_resume的测试：本地HTTP服务器按Range返回文件内容"""
+import hashlib
+import json
+import os
+import re
+import socket
+import tempfile
+import unittest
+from unittest import mock
+
+import bom_comparer as bc
+from tests.local_server import LocalServer, RecordingHandler
+
+DATA = os.urandom(512 * 1024 + 123)
+DATA_SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+class RangeHandler(RecordingHandler):
+    """返回DATA的处理器
+
+    服务器属性：advertise_ranges（HEAD是否声明Accept-Ranges）、honor_ranges（是否按Range返回206）、
+    byte_budget（GET最多还能发送的字节数，用完后发送部分内容并断开连接，None为不限制）、
+    sent_bytes（GET已发送的字节数）。
+    """
+
+    def do_HEAD(self):
+        headers = {'ETag': '"v1"'}
+        if self.server.advertise_ranges:
+            headers['Accept-Ranges'] = 'bytes'
+        self.send_body(DATA, headers=headers)
+
+    def do_GET(self):
+        server = self.server
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match and server.honor_ranges:
+            start = int(match.group(1))
+            end = int(match.group(2)) + 1 if match.group(2) else len(DATA)
+            body, status = DATA[start:end], 206
+            headers = {'Content-Range': f"bytes {start}-{end - 1}/{len(DATA)}"}
+        else:
+            body, status, headers = DATA, 200, {}
+
+        with server.lock:
+            size = len(body) if server.byte_budget is None else min(len(body), server.byte_budget)
+            if server.byte_budget is not None:
+                server.byte_budget -= size
+            server.sent_bytes += size
+
+        if size == len(body):
+            self.send_body(body, status, headers)
+            return
+        # 模拟连接中断：声明完整长度，只发送一部分后断开
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body[:size])
+        self.wfile.flush()
+        self.close_connection = True
+        self.connection.shutdown(socket.SHUT_RDWR)
+
+
+class DownloadWithResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        # 缩小分段大小，使几百KB的文件也按多段并行下载
+        for name, value in (('DOWNLOAD_PARALLEL_MIN_BYTES', 64 * 1024),
+                            ('DOWNLOAD_PART_MIN_BYTES', 16 * 1024),
+                            ('DOWNLOAD_PART_MAX_BYTES', 64 * 1024)):
+            patcher = mock.patch.object(bc, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.server = LocalServer(RangeHandler)
+        self.server.advertise_ranges = True
+        self.server.honor_ranges = True
+        self.server.byte_budget = None
+        self.server.sent_bytes = 0
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__)
+
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.dest = os.path.join(temp_dir.name, 'BOM_Comparer.exe')
+        self.state_file = self.dest + bc.DOWNLOAD_STATE_SUFFIX
+
+        self.session = bc.create_http_session()
+        self.addCleanup(self.session.close)
+        self.messages = []
+
+    def download(self, **kwargs):
+        return bc.download_with_resume(self.server.url('/BOM_Comparer.exe'), self.dest,
+                                       status_callback=self.messages.append, session=self.session, **kwargs)
+
+    def get_requests(self):
+        return [headers for method, path, headers in self.server.requests if method == 'GET']
+
+    def read_dest(self):
+        with open(self.dest, 'rb') as f:
+            return f.read()
+
+    def test_parallel_ranged_download(self):
+        self.assertTrue(self.download(expected_sha256=DATA_SHA256))
+
+        self.assertEqual(self.read_dest(), DATA)
+        self.assertFalse(os.path.exists(self.state_file))
+        gets = self.get_requests()
+        self.assertGreater(len(gets), bc.DOWNLOAD_PARALLEL_PARTS)
+        self.assertTrue(all(headers.get('Range') for headers in gets))
+        self.assertGreater(self.server.connections, 1)
+        self.assertEqual(self.server.sent_bytes, len(DATA))
+        self.assertIn("下载完成，校验通过", self.messages)
+
+    def test_resume_after_interruption(self):
+        # 发送三分之一后所有连接都被中断，不重试
+        self.server.byte_budget = len(DATA) // 3
+        with mock.patch.object(bc, 'DOWNLOAD_MAX_RETRIES', 1):
+            self.assertFalse(self.download(expected_sha256=DATA_SHA256))
+
+        self.assertTrue(os.path.exists(self.dest))
+        with open(self.state_file, 'r', encoding='utf-8') as f:
+            done = json.load(f)['done']
+        completed = sum(end - start for start, end in done)
+        self.assertGreater(completed, 0)
+        self.assertLess(completed, len(DATA))
+
+        # 恢复后只请求未完成的范围
+        self.server.byte_budget = None
+        self.server.sent_bytes = 0
+        self.assertTrue(self.download(expected_sha256=DATA_SHA256))
+
+        self.assertEqual(self.read_dest(), DATA)
+        self.assertFalse(os.path.exists(self.state_file))
+        self.assertEqual(self.server.sent_bytes, len(DATA) - completed)
+        self.assertTrue(any(message.startswith("继续下载") for message in self.messages))
+
+    def test_fallback_when_server_ignores_range(self):
+        # 声明支持Range，但总是返回200和完整内容
+        self.server.honor_ranges = False
+        self.assertTrue(self.download(expected_sha256=DATA_SHA256))
+
+        self.assertEqual(self.read_dest(), DATA)
+        self.assertFalse(os.path.exists(self.state_file))
+        self.assertIn("服务器不支持分段下载，改用单连接下载", self.messages)
+        self.assertNotIn('Range', self.get_requests()[-1])
+
+    def test_single_stream_when_range_not_advertised(self):
+        self.server.advertise_ranges = False
+        self.assertTrue(self.download(expected_sha256=DATA_SHA256))
+
+        self.assertEqual(self.read_dest(), DATA)
+        gets = self.get_requests()
+        self.assertEqual(len(gets), 1)
+        self.assertNotIn('Range', gets[0])
+
+    def test_checksum_mismatch_removes_file(self):
+        for advertise_ranges in (True, False):
+            with self.subTest(advertise_ranges=advertise_ranges):
+                self.server.advertise_ranges = advertise_ranges
+                self.messages.clear()
+
+                self.assertFalse(self.download(expected_sha256='0' * 64))
+
+                self.assertFalse(os.path.exists(self.dest))
+                self.assertFalse(os.path.exists(self.state_file))
+                self.assertIn("文件校验失败，已删除下载的文件", self.messages)
+
+
+if __name__ == '__main__':
+    unittest.main()
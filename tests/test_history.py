@@ -0,0 +1,131 @@
+"""BOMHistoryStore的测试：保存的版本与直接读取文件的对比结果一致"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import pandas as pd
+
+import bom_comparer as bc
+from bom_history import BOMHistoryStore
+
+COLUMNS = ['Item', 'P/N', 'Reference', 'Qty', 'Description']
+
+
+def flat_bom(screw_quantity):
+    """有位号的电阻和没有位号、只有用量的螺丝"""
+    return pd.DataFrame([(1, 'RES-10K', 'R1,R2', 2, '电阻'),
+                         (2, 'SCREW-M3', ' ', screw_quantity, '螺丝')], columns=COLUMNS)
+
+
+def hierarchical_bom(board_pn):
+    """整机下有一块电路板和一个结构件"""
+    return pd.DataFrame([('1', '0', 'TOP-001', '', '整机'),
+                         ('2', '1', 'PCBA-001', '', '电路板'),
+                         ('3', '2', board_pn, 'R1,R2', '电阻'),
+                         ('4', '1', 'MECH-001', '', '结构件'),
+                         ('5', '2', 'SCREW-M3', '', '螺丝')], columns=['Item', 'Level', 'P/N', 'Reference', 'Description'])
+
+
+def report_body(report):
+    """去掉报告开头的处理时间统计"""
+    return report.split('\n')[5:]
+
+
+class HistoryStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+        self.db_path = os.path.join(self.temp_dir, 'history.sqlite')
+
+    def write(self, name, bom_df):
+        path = os.path.join(self.temp_dir, name)
+        bom_df.to_excel(path, index=False)
+        return path
+
+    def new_comparer(self):
+        comparer = bc.BOMComparer()
+        comparer.interactive = False
+        return comparer
+
+    def test_quantity_change_survives_store(self):
+        path_a = self.write('a.xlsx', flat_bom(4))
+        path_b = self.write('b.xlsx', flat_bom(6))
+        direct = self.new_comparer().compare(path_a, path_b)
+        self.assertIn("SCREW-M3 (MPN: ) : 4 → 6", direct)
+
+        with BOMHistoryStore(self.db_path) as store:
+            revision_a = store.import_file(path_a, self.new_comparer())
+            revision_b = store.import_file(path_b, self.new_comparer())
+            self.assertIn('Quantity', store.load_revision(revision_a).columns)
+            report = store.compare_revisions(revision_a, revision_b, self.new_comparer())
+
+        self.assertIn("SCREW-M3 (MPN: ) : 4 → 6", report)
+
+    def test_hierarchical_revisions_compare_by_assembly(self):
+        path_a = self.write('a.xlsx', hierarchical_bom('RES-10K'))
+        path_b = self.write('b.xlsx', hierarchical_bom('RES-22K'))
+        direct = self.new_comparer().compare(path_a, path_b)
+
+        with BOMHistoryStore(self.db_path) as store:
+            revision_a = store.import_file(path_a, self.new_comparer())
+            revision_b = store.import_file(path_b, self.new_comparer())
+            self.assertEqual(list(store.load_revision(revision_a)['Level']), ['0', '1', '2', '1', '2'])
+            report = store.compare_revisions(revision_a, revision_b, self.new_comparer())
+
+        self.assertIn("=== 多层级BOM对比报告 ===", report)
+        self.assertEqual(report_body(report), report_body(direct))
+
+    def test_compare_revisions_keeps_comparer_alternatives(self):
+        # Item为2.1的行是2的替代料
+        bom_df = pd.DataFrame([('1', 'RES-10K', 'R1', 1, '电阻'),
+                               ('2', 'CAP-1U', 'C1', 1, '电容'),
+                               ('2.1', 'CAP-1U-ALT', 'C1', 1, '电容')], columns=COLUMNS)
+        path_a = self.write('a.xlsx', bom_df)
+        path_b = self.write('b.xlsx', bom_df.assign(Qty=2))
+        comparer = self.new_comparer()
+        comparer.set_alternative_map({'RES-10K': ['RES-10K-ALT']})
+
+        with BOMHistoryStore(self.db_path) as store:
+            revision_a = store.import_file(path_a, self.new_comparer())
+            revision_b = store.import_file(path_b, self.new_comparer())
+            self.assertEqual(store.get_revision(revision_a)['alternative_map'],
+                             {'CAP-1U': ['CAP-1U-ALT'], 'CAP-1U-ALT': ['CAP-1U']})
+            store.compare_revisions(revision_a, revision_b, comparer)
+
+        self.assertEqual(comparer.alternative_map, {'RES-10K': ['RES-10K-ALT']})
+
+    def test_bom_without_quantity_has_no_quantity_column(self):
+        path = self.write('a.xlsx', flat_bom(4).drop(columns='Qty'))
+        with BOMHistoryStore(self.db_path) as store:
+            revision = store.import_file(path, self.new_comparer())
+            self.assertNotIn('Quantity', store.load_revision(revision).columns)
+
+    def test_migrates_old_database(self):
+        # 旧版本的revision_lines没有quantity列
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript("""
+            CREATE TABLE revisions (id INTEGER PRIMARY KEY AUTOINCREMENT, product TEXT NOT NULL DEFAULT '',
+                name TEXT NOT NULL, source_file TEXT, file_hash TEXT, imported_at TEXT NOT NULL,
+                row_count INTEGER NOT NULL, ref_count INTEGER NOT NULL, alternative_map TEXT NOT NULL DEFAULT '{}');
+            CREATE TABLE revision_lines (revision_id INTEGER NOT NULL, line_no INTEGER NOT NULL, item TEXT, pn TEXT,
+                reference TEXT, description TEXT, mpn TEXT, PRIMARY KEY (revision_id, line_no));
+            INSERT INTO revisions VALUES (1, '', 'old', NULL, NULL, '2025-01-01T00:00:00', 1, 1, '{}');
+            INSERT INTO revision_lines VALUES (1, 0, '1', 'RES-10K', 'R1', '电阻', '');
+        """)
+        conn.commit()
+        conn.close()
+
+        with BOMHistoryStore(self.db_path) as store:
+            old = store.load_revision(1)
+            self.assertEqual(list(old['P/N']), ['RES-10K'])
+            self.assertNotIn('Quantity', old.columns)
+
+            revision = store.import_file(self.write('a.xlsx', flat_bom(4)), self.new_comparer())
+            self.assertEqual(list(store.load_revision(revision)['Quantity']), ['2', '4'])
+
+
+if __name__ == '__main__':
+    unittest.main()
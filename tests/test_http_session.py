@@ -0,0 +1,92 @@
+"""共用HTTP会话的测试：连接复用和ETag条件请求"""
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import bom_comparer as bc
+from tests.local_server import LocalServer, RecordingHandler, RELEASE, UPDATE_RESULT
+
+ETAG = '"release-v99.0"'
+FILE_DATA = os.urandom(32 * 1024)
+
+
+class ReleaseHandler(RecordingHandler):
+    """/releases/latest返回带ETag的发布信息，If-None-Match一致时返回304；其他路径返回FILE_DATA"""
+
+    def do_HEAD(self):
+        self.send_body(FILE_DATA)
+
+    def do_GET(self):
+        if self.path != '/releases/latest':
+            self.send_body(FILE_DATA)
+        elif self.headers.get('If-None-Match') == ETAG:
+            self.send_body(b'', 304, {'ETag': ETAG})
+        else:
+            self.send_body(json.dumps(RELEASE).encode('utf-8'), headers={'ETag': ETAG})
+
+
+class SharedSessionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer(ReleaseHandler)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.api_url = self.server.url('/releases/latest')
+
+        # 每个测试使用新的共用会话
+        patcher = mock.patch.object(bc, '_http_session', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: bc._http_session and bc._http_session.close())
+
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+        self.cache_path = os.path.join(temp_dir.name, bc.UPDATE_CACHE_FILE)
+
+    def check(self, cache):
+        return bc.check_for_updates('1.0', cache, self.cache_path, force=True, api_url=self.api_url)
+
+    def test_requests_reuse_one_connection(self):
+        cache = bc.UpdateCheckCache()
+        self.assertEqual(self.check(cache), UPDATE_RESULT)
+        self.assertEqual(self.check(cache), UPDATE_RESULT)
+        dest = os.path.join(self.temp_dir, 'BOM_Comparer_v99.0.exe')
+        self.assertTrue(bc.download_with_resume(self.server.url('/BOM_Comparer_v99.0.exe'), dest))
+
+        self.assertEqual([method for method, path, headers in self.server.requests], ['GET', 'GET', 'HEAD', 'GET'])
+        self.assertEqual(self.server.connections, 1)
+        with open(dest, 'rb') as f:
+            self.assertEqual(f.read(), FILE_DATA)
+
+    def test_second_check_sends_etag(self):
+        cache = bc.UpdateCheckCache()
+        self.check(cache)
+        self.assertEqual(cache.etag, ETAG)
+
+        self.check(cache)
+        first, second = (headers for method, path, headers in self.server.requests)
+        self.assertIsNone(first.get('If-None-Match'))
+        self.assertEqual(second.get('If-None-Match'), ETAG)
+
+    def test_not_modified_returns_cached_release(self):
+        cache = bc.UpdateCheckCache()
+        cache.record_attempt(RELEASE, ETAG, now=time.time() - 86400)
+        cache.save(self.cache_path)
+
+        self.assertEqual(bc.fetch_latest_release(self.api_url, ETAG), (None, ETAG))
+        self.assertEqual(self.check(cache), UPDATE_RESULT)
+
+        # 304也算一次成功的检查，缓存的发布信息和ETag保持不变
+        saved = bc.UpdateCheckCache()
+        saved.load(self.cache_path)
+        self.assertEqual(saved.release, cache.release)
+        self.assertEqual(saved.etag, ETAG)
+        self.assertLess(time.time() - saved.checked_at, 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+"""增量对比的测试：B修改后只重新计算B的哈希，结果与完整对比相同"""
+import logging
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+import bom_comparer as bc
+
+
+def make_bom(pns):
+    bom_df = pd.DataFrame({'Item': range(1, len(pns) + 1), 'P/N': pns,
+                           'Reference': [f"R{i}" for i in range(1, len(pns) + 1)],
+                           'Description': '电阻', 'MPN': ''})
+    for field in ('P/N', 'MPN', 'Description'):
+        bom_df[field] = bom_df[field].astype('category')
+    return bom_df
+
+
+class IncrementalDiffTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(bc.logger, 'level', logging.ERROR)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rediff_hashes_only_changed_frame(self):
+        bom_a = make_bom([f"P{i % 50}" for i in range(500)])
+        comparer = bc.BOMComparer()
+        comparer.compare(bom_a, bom_a.copy(), is_dataframe=True)
+
+        bom_b = make_bom([f"P{i % 50}" for i in range(499)] + ['P-NEW'])
+        with mock.patch.object(bc, 'row_hashes', wraps=bc.row_hashes) as row_hashes, \
+                mock.patch.object(bc, 'frame_fingerprint', wraps=bc.frame_fingerprint) as frame_fingerprint:
+            report = comparer.compare(bom_a, bom_b, is_dataframe=True)
+
+        # A与上一次是同一个对象，只计算B的行哈希和指纹
+        self.assertEqual(row_hashes.call_count, 1)
+        self.assertIs(row_hashes.call_args.args[0], bom_b)
+        self.assertEqual(frame_fingerprint.call_count, 1)
+        self.assertIn('incremental', report.timings)
+
+        full = bc.BOMComparer().compare(bom_a, bom_b, is_dataframe=True)
+        self.assertEqual(report.splitlines()[5:], full.splitlines()[5:])
+
+
+if __name__ == '__main__':
+    unittest.main()
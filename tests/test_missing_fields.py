@@ -0,0 +1,27 @@
+"""MissingFieldsError的测试：跨进程传递（pickle）后字段和消息不变"""
+import pickle
+import unittest
+
+import bom_comparer as bc
+
+
+class MissingFieldsErrorTest(unittest.TestCase):
+
+    def test_pickle_round_trip(self):
+        error = bc.MissingFieldsError(['P/N', 'Reference'], "发生未知错误，请检查文件格式和内容是否正确")
+
+        restored = pickle.loads(pickle.dumps(error))
+
+        self.assertIsInstance(restored, bc.MissingFieldsError)
+        self.assertEqual(restored.fields, ['P/N', 'Reference'])
+        self.assertEqual(str(restored), "发生未知错误，请检查文件格式和内容是否正确")
+
+    def test_pickle_round_trip_default_message(self):
+        restored = pickle.loads(pickle.dumps(bc.MissingFieldsError(['Reference'])))
+
+        self.assertEqual(restored.fields, ['Reference'])
+        self.assertEqual(str(restored), "BOM文件缺少必要字段: Reference，请检查文件格式")
+
+
+if __name__ == '__main__':
+    unittest.main()
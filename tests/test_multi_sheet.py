@@ -0,0 +1,63 @@
+"""多工作表并行加载的测试：子进程读取并返回表头签名缓存"""
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+import bom_comparer as bc
+
+
+def write_workbook(path):
+    """两个表头不同的BOM工作表，都有一个未映射的备注列"""
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({'Item': [1, 2], 'P/N': ['RES-10K', 'CAP-1U'], 'Reference': ['R1', 'C1'],
+                      'Description': ['电阻', '电容'], '备注': ['贴片', '贴片']}).to_excel(writer, sheet_name='SMT', index=False)
+        pd.DataFrame({'序号': [1], '料号': ['CONN-2P'], '位号': ['J1'],
+                      '描述': ['连接器'], '备注': ['插件']}).to_excel(writer, sheet_name='DIP', index=False)
+
+
+class ParallelSheetHeaderCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.path = os.path.join(temp_dir.name, 'bom.xlsx')
+        write_workbook(self.path)
+        for target, name, value in ((bc, 'SHEET_PARALLEL_MIN_BYTES', 0), (bc.logger, 'level', logging.ERROR)):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def new_comparer(self):
+        comparer = bc.BOMComparer()
+        comparer.interactive = False
+        comparer.multi_sheet = True
+        return comparer
+
+    def test_workers_share_header_cache(self):
+        comparer = self.new_comparer()
+        bom_df = comparer.load_bom(self.path, projection=True)
+        self.assertEqual(list(bom_df['Sheet']), ['SMT', 'SMT', 'DIP'])
+
+        # 子进程识别的两个表头都合并到主进程的缓存中
+        cache = comparer.header_cache
+        self.assertEqual(len(cache.entries), 2)
+        self.assertTrue(cache.dirty)
+
+        # 模拟用户为Description手动选择了备注列：子进程命中缓存时使用缓存的列映射
+        for entry in cache.entries.values():
+            entry['column_map']['Description'] = '备注'
+            entry['manual_fields'] = ['Description']
+        cache.dirty = False
+        comparer.header_cache = cache
+        bom_df = comparer.load_bom(self.path, projection=True)
+
+        self.assertEqual(list(bom_df['Description']), ['贴片', '贴片', '插件'])
+        self.assertFalse(cache.dirty)
+
+
+if __name__ == '__main__':
+    unittest.main()
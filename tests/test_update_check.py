@@ -0,0 +1,151 @@
+"""check_for_updates的测试：检查间隔、缓存过期、手动检查和离线时使用缓存"""
+import json
+import os
+import socket
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import bom_comparer as bc
+from tests.local_server import LocalServer, RecordingHandler, RELEASE, UPDATE_RESULT
+
+
+class ReleaseHandler(RecordingHandler):
+    def do_GET(self):
+        self.send_body(json.dumps(RELEASE).encode('utf-8'), headers={'Content-Type': 'application/json'})
+
+
+def unused_url():
+    """返回一个没有服务器监听的本地地址"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/releases/latest"
+
+
+class CheckForUpdatesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer(ReleaseHandler)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.api_url = self.server.url('/releases/latest')
+
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache_path = os.path.join(temp_dir.name, bc.UPDATE_CACHE_FILE)
+
+    def check(self, cache, **kwargs):
+        return bc.check_for_updates('1.0', cache, self.cache_path, api_url=kwargs.pop('api_url', self.api_url),
+                                    **kwargs)
+
+    def cached(self, checked_days_ago):
+        """上次成功检查在checked_days_ago天前的缓存"""
+        cache = bc.UpdateCheckCache()
+        cache.record_attempt(RELEASE, now=time.time() - checked_days_ago * 86400)
+        return cache
+
+    def test_first_check_saves_cache(self):
+        self.assertEqual(self.check(bc.UpdateCheckCache()), UPDATE_RESULT)
+
+        self.assertEqual(len(self.server.requests), 1)
+        cache = bc.UpdateCheckCache()
+        cache.load(self.cache_path)
+        self.assertEqual(cache.release['tag_name'], 'v99.0')
+        self.assertFalse(cache.is_due())
+
+    def test_within_interval_sends_no_request(self):
+        cache = self.cached(bc.UPDATE_CHECK_INTERVAL - 1)
+
+        self.assertEqual(self.check(cache), UPDATE_RESULT)
+        self.assertEqual(self.server.requests, [])
+
+    def test_expired_cache_checks_again(self):
+        cache = self.cached(bc.UPDATE_CHECK_INTERVAL + 1)
+        self.assertTrue(cache.is_due())
+
+        self.assertEqual(self.check(cache), UPDATE_RESULT)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertLess(time.time() - cache.checked_at, 60)
+        self.assertFalse(cache.is_due())
+
+    def test_force_ignores_interval(self):
+        cache = self.cached(0)
+
+        self.assertEqual(self.check(cache, force=True), UPDATE_RESULT)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_unreachable_server_uses_cached_release(self):
+        cache = self.cached(bc.UPDATE_CHECK_INTERVAL + 1)
+        checked_at = cache.checked_at
+
+        self.assertEqual(self.check(cache, api_url=unused_url()), UPDATE_RESULT)
+
+        # 成功检查的时间不变，记录失败的尝试后UPDATE_RETRY_HOURS小时内不再访问网络
+        saved = bc.UpdateCheckCache()
+        saved.load(self.cache_path)
+        self.assertEqual(saved.checked_at, checked_at)
+        self.assertEqual(saved.release['tag_name'], 'v99.0')
+        self.assertFalse(saved.is_due())
+
+    def test_unreachable_server_without_cache(self):
+        self.assertEqual(self.check(bc.UpdateCheckCache(), api_url=unused_url()), (False, '1.0', '', '', False))
+
+
+class FakeRoot:
+    """代替Tk根窗口，立即执行after的回调"""
+
+    def after(self, delay, callback):
+        callback()
+
+
+class GUIUpdateCheckTest(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        for target, name, value in ((bc, 'get_app_dir', lambda: temp_dir.name),
+                                    (bc, 'APP_VERSION', '1.0'),
+                                    (bc.messagebox, 'showerror', mock.Mock()),
+                                    (bc.messagebox, 'showinfo', mock.Mock())):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.cache_path = os.path.join(temp_dir.name, bc.UPDATE_CACHE_FILE)
+
+        self.gui = bc.BOMComparerGUI.__new__(bc.BOMComparerGUI)
+        self.gui.root = FakeRoot()
+        self.gui.update_cache = bc.UpdateCheckCache()
+        self.gui.update_progress = mock.Mock()
+        self.gui._show_update_dialog = mock.Mock()
+
+    def save_cache(self, checked_days_ago):
+        cache = bc.UpdateCheckCache()
+        cache.record_attempt(RELEASE, now=time.time() - checked_days_ago * 86400)
+        cache.save(self.cache_path)
+
+    def test_startup_within_interval_uses_cache_without_thread(self):
+        self.save_cache(1)
+        with LocalServer(ReleaseHandler) as server, \
+                mock.patch.object(bc, 'UPDATE_API_URL', server.url('/releases/latest')), \
+                mock.patch.object(bc.threading, 'Thread') as thread:
+            self.gui._check_updates_on_startup()
+
+        thread.assert_not_called()
+        self.assertEqual(server.requests, [])
+        self.gui._show_update_dialog.assert_called_once_with(*UPDATE_RESULT[1:])
+
+    def test_unreachable_server_shows_no_error(self):
+        self.save_cache(bc.UPDATE_CHECK_INTERVAL + 1)
+        self.gui.update_cache.load(self.cache_path)
+        with mock.patch.object(bc, 'UPDATE_API_URL', unused_url()):
+            self.gui._check_updates(False)
+
+        bc.messagebox.showerror.assert_not_called()
+        self.gui.update_progress.assert_not_called()
+        self.gui._show_update_dialog.assert_called_once_with(*UPDATE_RESULT[1:])
+
+
+if __name__ == '__main__':
+    unittest.main()